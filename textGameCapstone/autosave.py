@@ -0,0 +1,265 @@
+"""
+Write-behind autosave.
+The game hands each save to a background writer thread instead of waiting for
+the database, so autosaving every turn costs the player no time:
+
+* A save is captured as a SaveSnapshot (see storage.py) on the game's thread,
+  which only copies a few fields, and is written later by the writer thread.
+* Saves for the same (player_id, slot) that are still waiting are coalesced:
+  the writer holds autosaves for config.AUTOSAVE_DELAY_SECONDS, so ten quick
+  moves (or ten moves while the database is slow) become one write.
+* Autosaves are FAST (not acknowledged by MongoDB). An explicit SAVE is
+  DURABLE and waits until the database has confirmed it. A full snapshot is
+  always written DURABLE, even for an autosave: the deltas after it can only
+  tell that their document is missing if its write was confirmed.
+* flush() waits for everything queued, so nothing is lost on EXIT or EOF.
+
+One AutoSaver (one thread) serves every game in the process, so the server
+does not start a thread per player.
+"""
+
+import atexit
+import threading
+
+import config
+from storage import DURABLE, FAST, save_key
+
+
+def _key(player_id, slot):
+    """The (player_id, slot) tuple a save is queued under."""
+    key = save_key(player_id, slot)
+    return key["player_id"], key["slot"]
+
+
+class _SaveResult:
+    """
+    The outcome of one queued save, for a caller that waits for it.
+    (A minimal concurrent.futures.Future, which would import logging at startup.)
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._saved = False
+
+    def set_result(self, saved):
+        self._saved = saved
+        self._done.set()
+
+    def result(self, timeout=None):
+        """Waits for the write. Returns True if it succeeded (False on failure or timeout)."""
+        return self._done.wait(timeout) and self._saved
+
+
+class _PendingSave:
+    """A coalesced save waiting for the writer thread."""
+
+    def __init__(self, db_manager, snapshot, durability):
+        self.db_manager = db_manager  # The backend the snapshot was taken with (and is written with)
+        self.snapshot = snapshot
+        self.durability = durability
+        self.waiters = []  # _SaveResults of explicit saves waiting for this write
+
+
+class AutoSaver:
+    """
+    Queues save snapshots and writes them on one background thread.
+    The thread starts with the first save and stops on close().
+    """
+
+    def __init__(self, delay=None):
+        """
+        Args:
+            delay (float, optional): Seconds an autosave may wait for more saves to
+                merge with. Defaults to config.AUTOSAVE_DELAY_SECONDS.
+        """
+        self.delay = config.AUTOSAVE_DELAY_SECONDS if delay is None else delay
+        self._pending = {}  # (player_id, slot) -> _PendingSave, in arrival order
+        self._writing = set()  # Keys the writer thread is writing right now
+        self._needs_full_save = set()  # Keys whose last write failed: the next snapshot must be complete
+        self._condition = threading.Condition()
+        self._waiting = 0  # Callers blocked in save()/flush(): the writer skips the delay for them
+        self._thread = None
+        self._closed = False
+
+        # Counters, for monitoring
+        self.saves_queued = 0
+        self.saves_coalesced = 0  # Snapshots merged into one already waiting
+        self.saves_written = 0
+        self.saves_failed = 0
+
+    # --- Game Thread Side ---
+
+    def autosave(self, db_manager, player, game_map, player_id=None, slot=None):
+        """
+        Queues a FAST save of the game and returns at once.
+
+        Returns:
+            bool: True if something was queued (False if nothing changed since the last save).
+        """
+        return self._enqueue(db_manager, player, game_map, player_id, slot, FAST) is not None
+
+    def save(self, db_manager, player, game_map, player_id=None, slot=None, timeout=None):
+        """
+        Queues a DURABLE save (together with any autosaves still waiting for
+        the same slot) and waits until it has been written.
+
+        Returns:
+            bool: True once the database has confirmed the save.
+        """
+        saved = self._wait(self._enqueue(db_manager, player, game_map, player_id, slot, DURABLE, wait=True), timeout)
+        if not saved:
+            # The save document may be gone: retry once with the complete state
+            saved = self._wait(self._enqueue(db_manager, player, game_map, player_id, slot, DURABLE, wait=True), timeout)
+        return saved
+
+    def flush(self, player_id=None, slot=None, timeout=None):
+        """
+        Waits until the queued saves have been written: only the given slot's,
+        or everyone's if no player_id is given. Call before reading or deleting
+        a save, and before the game exits.
+
+        Returns:
+            bool: False if the timeout ran out first.
+        """
+        def done():
+            keys = set(self._pending) | self._writing
+            if player_id is None:
+                return not keys
+            return _key(player_id, slot) not in keys
+
+        with self._condition:
+            self._waiting += 1
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(done, timeout)
+            finally:
+                self._waiting -= 1
+
+    def discard(self, player_id, slot):
+        """Drops the slot's queued autosaves (e.g. before the save is deleted for a new game)."""
+        with self._condition:
+            pending = self._pending.pop(_key(player_id, slot), None)
+            self._needs_full_save.discard(_key(player_id, slot))
+        if pending is not None:
+            for future in pending.waiters:
+                future.set_result(False)
+        self.flush(player_id, slot)
+
+    def close(self, timeout=None):
+        """Writes everything still queued, then stops the writer thread."""
+        self.flush(timeout=timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _wait(self, future, timeout):
+        """Waits for a queued save, telling the writer not to hold it back."""
+        with self._condition:
+            self._waiting += 1
+            self._condition.notify_all()
+        try:
+            return future.result(timeout)
+        finally:
+            with self._condition:
+                self._waiting -= 1
+
+    def _enqueue(self, db_manager, player, game_map, player_id, slot, durability, wait=False):
+        """
+        Takes a snapshot of the game and queues it, merged with any save for the
+        same slot that is still waiting.
+
+        Returns:
+            _SaveResult: Set once the save is written (only if wait is True), otherwise None.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("AutoSaver is closed")
+
+            # The snapshot is taken under the lock, so it cannot race the writer
+            # thread reporting a failed write for this slot
+            key = _key(player_id, slot)
+            snapshot = db_manager.take_save_snapshot(player, game_map, player_id, slot,
+                                                     full=key in self._needs_full_save)
+            self._needs_full_save.discard(key)
+
+            future = _SaveResult() if wait else None
+            if snapshot.is_empty and future is None:
+                return None
+
+            # An unacknowledged delta reports success even if it matched nothing,
+            # so the document it applies to must be confirmed (see module docstring)
+            if not snapshot.is_delta:
+                durability = DURABLE
+
+            self.saves_queued += 1
+            pending = self._pending.get(key)
+            if pending is not None:
+                # Merged into the save already waiting: the writer knows about it
+                pending.snapshot.merge(snapshot)
+                self.saves_coalesced += 1
+                if durability == DURABLE:
+                    pending.durability = DURABLE
+                if future is not None:
+                    pending.waiters.append(future)
+                return future
+
+            pending = self._pending[key] = _PendingSave(db_manager, snapshot, durability)
+            if future is not None:
+                pending.waiters.append(future)
+            self._start_writer()
+            self._condition.notify_all()
+            return future
+
+    def _start_writer(self):
+        """Starts the writer thread on first use (called with the lock held)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="autosave-writer", daemon=True)
+            self._thread.start()
+
+    # --- Writer Thread Side ---
+
+    def _run(self):
+        """Writes queued saves, oldest slot first, until closed."""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return  # Closed, and nothing left to write
+
+                # Give more autosaves a moment to merge in, unless someone is waiting
+                if self.delay > 0:
+                    self._condition.wait_for(lambda: self._closed or self._waiting, self.delay)
+
+                # Take the oldest slot; newer saves for it start a new entry
+                key = next(iter(self._pending))
+                pending = self._pending.pop(key)
+                self._writing.add(key)
+
+            saved = False
+            try:
+                saved = pending.db_manager.write_save_snapshot(pending.snapshot, pending.durability)
+            except Exception as e:
+                print(f"Error autosaving game: {e}")
+
+            with self._condition:
+                self._writing.discard(key)
+                if saved:
+                    self.saves_written += 1
+                else:
+                    # The snapshots after this one were deltas on top of it
+                    self.saves_failed += 1
+                    self._needs_full_save.add(key)
+                self._condition.notify_all()
+
+            for future in pending.waiters:
+                future.set_result(saved)
+
+
+# The one autosaver shared by every game in the process
+autosaver = AutoSaver()
+
+# Write any queued saves before the interpreter exits
+atexit.register(autosaver.close)
@@ -0,0 +1,292 @@
+"""
+Benchmark suite for the game engine. No MongoDB is needed: saves go to the
+in-memory database (memory_database.py), plus the real DatabaseManager code
+on top of mongomock if it is installed.
+
+Measured:
+* generate_<size>:   GameMap.create_layout() for worlds of several sizes
+* validate_<size>:   the BFS validation of a finished layout
+* save_load_*:       a save, a load, and rebuilding the map from the save
+* commands:          one command through MainGame (headless, output discarded, autosaving)
+* commands_no_autosave: the same with autosave turned off
+* original_commands: one command through the original textbasedgame_original.py loop
+
+Every result is stored as seconds per operation (lower is better). Usage:
+    python benchmarks.py                  # run and compare with benchmark_baselines.json
+    python benchmarks.py --save-baseline  # run and store the results as the new baseline
+    python benchmarks.py --quick          # skip the largest world size
+Exits with status 1 if any benchmark is slower than its baseline by more than
+the threshold (default 25%).
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import runpy
+import sys
+import time
+
+import config
+from game_map import GameMap
+from headless import run_script
+from memory_database import MemoryDatabaseManager
+from map_generator import OPPOSITE_DIRECTION
+from player import Player
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+ORIGINAL_GAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "textbasedgame_original.py")
+
+WORLD_SIZES = [8, 1_000, 10_000, 100_000]
+QUICK_WORLD_SIZES = [8, 1_000, 10_000]
+DEFAULT_THRESHOLD = 0.25
+COMMAND_COUNT = 20_000
+SEED = 1234
+
+# Measured for comparison only: not our code, so never counted as a regression
+REFERENCE_BENCHMARKS = {"original_commands"}
+
+
+def measure(func, repeat=5, number=1):
+    """
+    Times func the way timeit does: `repeat` rounds of `number` calls each.
+
+    Returns:
+        float: Seconds per call in the fastest round (the least disturbed by other work).
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def world_room_names(size):
+    """The real catalog's rooms, padded with numbered filler rooms up to `size`."""
+    names = [room["name"] for room in MemoryDatabaseManager().get_all_rooms_data()]
+    names += [f"Room {number}" for number in range(size - len(names))]
+    return names
+
+
+# --- Benchmarks ---
+
+def bench_generation(sizes):
+    """Layout generation and validation at each world size."""
+    results = {}
+    for size in sizes:
+        room_names = world_room_names(size)
+        rng = random.Random(SEED)
+        # Small worlds are fast, so time more calls per round
+        number = max(1, 10_000 // size)
+        repeat = 3 if size >= 100_000 else 5
+
+        results[f"generate_{size}"] = measure(lambda: GameMap.create_layout(room_names, rng), repeat, number)
+
+        exits, _ = GameMap.create_layout(room_names, rng)
+        results[f"validate_{size}"] = measure(lambda: GameMap.is_layout_valid(room_names, exits), repeat, number)
+    return results
+
+
+def _save_load_roundtrip(db_manager, game_map, player):
+    """Moves the player, saves, loads, and rebuilds the map from the save."""
+    for direction in player.current_room.exits:
+        if player.current_room.exits[direction] != GameMap.BOSS_ROOM:
+            player.move(direction, game_map)
+            break
+    db_manager.save_game_state(player, game_map, "benchmark", 1)
+    save_data = db_manager.load_game_state("benchmark", 1)
+    game_map.load_map_from_save(save_data["layout"], save_data.get("fallback_rooms"))
+    layout = save_data["layout"]
+    player.current_room = game_map.get_room(layout["rooms"][save_data["player"]["current_room"]])
+
+
+def bench_persistence():
+    """Save/load round trips against in-memory databases."""
+    results = {}
+    stdout = sys.stdout
+
+    db_managers = {"memory": MemoryDatabaseManager()}
+    try:
+        import mongomock
+        from database_manager import DatabaseManager
+
+        # The real DatabaseManager code, on an in-memory MongoDB stand-in
+        mongo_db_manager = DatabaseManager.__new__(DatabaseManager)
+        mongo_db_manager.client = None
+        mongo_db_manager.db = mongomock.MongoClient()["benchmark"]
+        db_managers["mongomock"] = mongo_db_manager
+    except ImportError:
+        print("mongomock is not installed: skipping save_load_mongomock.")
+
+    for name, db_manager in db_managers.items():
+        game_map = GameMap(MemoryDatabaseManager(), seed=SEED)
+        player = Player(game_map.get_room(game_map.start_room_name))
+        sys.stdout = io.StringIO()  # Silence the "Game saved" messages
+        try:
+            results[f"save_load_{name}"] = measure(lambda: _save_load_roundtrip(db_manager, game_map, player), 5, 200)
+        finally:
+            sys.stdout = stdout
+    return results
+
+
+def _safe_walk(seed):
+    """
+    Returns a pair of moves (there and back) from the start room that never
+    enters the boss room, for the seeded map.
+    """
+    game_map = GameMap(MemoryDatabaseManager(), seed=seed)
+    start_room = game_map.get_room(game_map.start_room_name)
+    for direction, neighbor in start_room.exits.items():
+        if neighbor != GameMap.BOSS_ROOM:
+            return [f"go {direction.lower()}", f"go {OPPOSITE_DIRECTION[direction].lower()}"]
+    return ["help", "help"]
+
+
+def bench_commands(count=COMMAND_COUNT):
+    """Commands per second through MainGame (moves, item pick-ups, help, unknown words)."""
+    there, back = _safe_walk(SEED)
+    mix = [there, "get stew", back, "help", "get sword", "dance"]
+    lines = (mix * (count // len(mix) + 1))[:count]
+
+    def run():
+        # run_script() times only the commands, not building the game
+        return min(run_script(lines, player_id="benchmark", seed=SEED, stub_db=True, record_transcript=False).elapsed
+                   for _ in range(3))
+
+    results = {"commands": run() / count}
+
+    autosave_turns = config.AUTOSAVE_TURNS
+    config.AUTOSAVE_TURNS = 0
+    try:
+        results["commands_no_autosave"] = run() / count
+    finally:
+        config.AUTOSAVE_TURNS = autosave_turns
+    return results
+
+
+class _NullWriter:
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def bench_original(count=COMMAND_COUNT):
+    """Commands per second through the original single-file game loop, for comparison."""
+    if not os.path.exists(ORIGINAL_GAME):
+        print("textbasedgame_original.py not found: skipping original_commands.")
+        return {}
+
+    # The same kind of mix, on the original fixed map (Bedroom <-> Great Hall)
+    mix = ["Go North", "Get Stew", "Go South", "Help", "Get Sword", "Dance"]
+    script = "\n".join((mix * (count // len(mix) + 1))[:count] + ["Exit"]) + "\n"
+
+    def run():
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin, sys.stdout = io.StringIO(script), _NullWriter()
+        try:
+            runpy.run_path(ORIGINAL_GAME, run_name="__main__")
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+
+    return {"original_commands": measure(run, 3) / count}
+
+
+def run_all(quick=False):
+    """Runs every benchmark and returns {name: seconds per operation}."""
+    results = {}
+    results.update(bench_generation(QUICK_WORLD_SIZES if quick else WORLD_SIZES))
+    results.update(bench_persistence())
+    results.update(bench_commands())
+    results.update(bench_original())
+    return results
+
+
+# --- Baselines ---
+
+def load_baseline(path=BASELINE_FILE):
+    """Returns the stored baseline results, or None if there are none."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)["results"]
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    """Stores results as the new baseline, with a note of the machine they came from."""
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results
+        }, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares results with a baseline.
+
+    Returns:
+        list: Names of the benchmarks that got slower by more than threshold (a fraction).
+    """
+    regressions = []
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        if reference is None or name in REFERENCE_BENCHMARKS:
+            continue
+        if seconds > reference * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def format_report(results, baseline=None):
+    """Builds a table of the results, with the change from the baseline if there is one."""
+    lines = [f"{'benchmark':<24}{'time/op':>14}{'ops/s':>14}{'vs baseline':>14}"]
+    for name, seconds in results.items():
+        change = ""
+        if baseline and name in baseline:
+            change = f"{(seconds / baseline[name] - 1) * 100:+.1f}%"
+        lines.append(f"{name:<24}{_format_seconds(seconds):>14}{1 / seconds:>14,.0f}{change:>14}")
+
+    if "commands" in results and "original_commands" in results:
+        ratio = results["original_commands"] / results["commands"]
+        lines.append(f"\nMainGame handles {ratio:.2f}x as many commands per second as the original loop.")
+    return "\n".join(lines)
+
+
+def _format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the game engine benchmarks")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before a benchmark counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--quick", action="store_true", help="Skip the largest world size")
+    args = parser.parse_args()
+
+    results = run_all(quick=args.quick)
+    baseline = load_baseline()
+    print(format_report(results, baseline))
+
+    if args.save_baseline:
+        save_baseline(results)
+        print(f"\nBaseline saved to {BASELINE_FILE}.")
+    elif baseline is None:
+        print("\nNo baseline stored yet (run with --save-baseline).")
+    else:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nSlower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions (threshold {args.threshold:.0%}).")
@@ -1,172 +1,226 @@
 """
-This script is responsible for creating the MongoDB database and
-populating it with the initial room and item data.
-Run this script ONCE to set up the database.
+This script is responsible for populating the database with the room and
+item data: the built-in ROOMS_DATA, or content packs given on the command line.
+Rooms are upserted by name, so it is safe to run again (e.g. after editing
+the rooms, or to add a pack); player saves are never touched.
+
+    python build_database.py                       # the built-in rooms
+    python build_database.py packs/castle.jsonl    # one or more content packs
+
+See content_import.py for the pack formats.
 """
 
-import pymongo
 import config
 
 
-def seed_database():
+# The Room Data (also used by the in-memory database, see memory_database.py)
+ROOMS_DATA = [
+    {
+        "name": "Bedroom",
+        "desc_with_item": (
+            "The bedroom seems warm and cozy.\n"
+            "Your bed is neatly made and you have a small fire\n"
+            "going in the fireplace."
+        ),
+        "desc_no_item": (
+            "The bedroom seems warm and cozy.\n"
+            "Your bed is neatly made and you have a small fire\n"
+            "going in the fireplace."
+        ),
+        "item": None,
+        "image_path": "images/bedroom.png"
+    },
+    {
+        "name": "Great Hall",
+        "desc_with_item": (
+            "The Great Hall is vast and a bit chilly as you\n"
+            "feel the cold wind flow across the large vacant\n"
+            "room. You smell it before you see it. On one of the tables, you\n"
+            "see a delicious bowl of hearty stew. You're not sure who\n"
+            "prepared it, but who are you to question free food?"
+        ),
+        "desc_no_item": (
+            "The Great Hall is vast and a bit chilly as you\n"
+            "feel the cold wind flow across the large vacant\n"
+            "room. Nothing in here seems to catch your eye."
+        ),
+        "item": "Stew",
+        "image_path": "images/great_hall.png"
+    },
+    {
+        "name": "Closet",
+        "desc_with_item": (
+            "The walk-in closet is a small, snug room,filled with various clothes.\n"
+            "Sitting nicely on the mannequin are your magical robes.\n"
+            "There is no other door than the one you entered."
+        ),
+        "desc_no_item": (
+            "The walk-in closet is a small, snug room,filled with various clothes.\n"
+            "You see the bare mannequin where your robes used to be.\n"
+            "There is no other door than the one you entered."
+        ),
+        "item": "Robes",
+        "image_path": "images/closet.png"
+    },
+    {
+        "name": "Armory",
+        "desc_with_item": (
+            "As you walk into the armory, you see most of the shelves are stocked\n"
+            "with different miscellaneous staves, shortswords, and scepters.\n"
+            "Mounted on the wall you see one of the Mage Guild's relics:\n"
+            "the Shield of Reflection. You feel a magical aura pulsating from it."
+        ),
+        "desc_no_item": (
+            "As you walk into the armory, you see most of the shelves are still\n"
+            "stocked with different miscellaneous staves, shortswords, and scepters.\n"
+            "You see the now empty area on the wall, void of dust, from\n"
+            "where the shield was once mounted."
+        ),
+        "item": "Shield",
+        "image_path": "images/armory.png"
+    },
+    {
+        "name": "Magic Sanctum",
+        "desc_with_item": (
+            "As you walk into the Magic Sanctum, you can feel the energy\n"
+            "radiating in the air. As you look around, rows of books, scrolls,\n"
+            "and tomes plaster the walls. You notice up against one of the walls,\n"
+            "a display case holding a familiar item you're attuned to: the Cloak of Levitation."
+        ),
+        "desc_no_item": (
+            "As you walk into the Magic Sanctum, you can feel the energy\n"
+            "radiating in the air. As you look around, rows of books, scrolls,\n"
+            "and tomes plaster the walls. You see against the wall, the empty\n"
+            "display case that was once holding the Cloak of Levitation."
+        ),
+        "item": "Cloak",
+        "image_path": "images/sanctum.png"
+    },
+    {
+        "name": "Apothecary",
+        "desc_with_item": (
+            "As you walk into the apothecary, your nostrils are assaulted by\n"
+            "different herbs, animal parts, and other miscellaneous reagents.\n"
+            "As you refocus your mind, you see a mana potion sealed and sitting on\n"
+            "the table."
+        ),
+        "desc_no_item": (
+            "You try to brace yourself but your nostrils are once again assaulted by\n"
+            "different herbs, animal parts, and other miscellaneous reagents.\n"
+            "The table that once held a mana potion is now empty omitting a few\n"
+            "bits and bobbles."
+        ),
+        "item": "Potion",
+        "image_path": "images/apothecary.png"
+    },
+    {
+        "name": "Mage Tower",
+        "desc_with_item": (
+            "Within the Mage Tower and you see your arcane desk. It's covered\n"
+            "with different trinkets and books. Leaning against the desk you\n"
+            "see your tried and true, trusted weapon. Your mage staff pulsates\n"
+            "with power."
+        ),
+        "desc_no_item": (
+            "You enter the Mage Tower and you see your arcane desk.\n"
+            "It's covered with different trinkets and books."
+        ),
+        "item": "Staff",
+        "image_path": "images/tower.png"
+    },
+    {
+        "name": "Arcane Dungeon",
+        "desc_with_item": (
+            "You enter the Arcane Dungeon. You can hear the sounds of the elemental hydra waiting for you."
+        ),
+        "desc_no_item": (
+            "You enter the Arcane Dungeon. You can hear the sounds of the elemental hydra waiting for you."
+        ),
+        "item": None,
+        "image_path": "images/dungeon.png"
+    }
+]
+
+
+def seed_database(paths=None, batch_size=None, max_errors=None):
     """
-    Connects to MongoDB, clears any existing 'text_adventure_db',
-    and inserts the room data documents.
+    Imports rooms into the storage backend selected in config.py
+    (STORAGE_BACKEND), publishes a new catalog version, and writes the
+    catalog snapshot. The 'memory' backend needs no seeding: it always
+    starts from ROOMS_DATA.
+
+    Args:
+        paths (list, optional): Content pack files. Defaults to ROOMS_DATA.
+        batch_size (int, optional): Rooms per bulk write. Defaults to content_import.DEFAULT_BATCH_SIZE.
+        max_errors (int, optional): Invalid rooms to skip before giving up.
+            Defaults to content_import.DEFAULT_MAX_ERRORS.
+
+    Returns:
+        bool: True if a new catalog version was published.
     """
+    if config.STORAGE_BACKEND == 'memory':
+        print("The in-memory backend loads ROOMS_DATA by itself; nothing to seed.")
+        return False
+
+    from content_import import DEFAULT_BATCH_SIZE, DEFAULT_MAX_ERRORS, ContentError, import_rooms
+    from storage import StorageError, open_storage
+
+    db_manager = None
     try:
-        # Connect to MongoDB using the URI from config.py
-        client = pymongo.MongoClient(config.MONGO_URI)
-
-        # Drop the database if it exists to ensure a clean slate
-        client.drop_database(config.DB_NAME)
-        print(f"Cleared existing '{config.DB_NAME}'.")
-
-        # Create/Access the database and collection
-        db = client[config.DB_NAME]
-        rooms_collection = db["rooms"]
-
-        # Define the Room Data
-        rooms_data = [
-            {
-                "name": "Bedroom",
-                "desc_with_item": (
-                    "The bedroom seems warm and cozy.\n"
-                    "Your bed is neatly made and you have a small fire\n"
-                    "going in the fireplace."
-                ),
-                "desc_no_item": (
-                    "The bedroom seems warm and cozy.\n"
-                    "Your bed is neatly made and you have a small fire\n"
-                    "going in the fireplace."
-                ),
-                "item": None,
-                "image_path": "images/bedroom.png"
-            },
-            {
-                "name": "Great Hall",
-                "desc_with_item": (
-                    "The Great Hall is vast and a bit chilly as you\n"
-                    "feel the cold wind flow across the large vacant\n"
-                    "room. You smell it before you see it. On one of the tables, you\n"
-                    "see a delicious bowl of hearty stew. You're not sure who\n"
-                    "prepared it, but who are you to question free food?"
-                ),
-                "desc_no_item": (
-                    "The Great Hall is vast and a bit chilly as you\n"
-                    "feel the cold wind flow across the large vacant\n"
-                    "room. Nothing in here seems to catch your eye."
-                ),
-                "item": "Stew",
-                "image_path": "images/great_hall.png"
-            },
-            {
-                "name": "Closet",
-                "desc_with_item": (
-                    "The walk-in closet is a small, snug room,filled with various clothes.\n"
-                    "Sitting nicely on the mannequin are your magical robes.\n"
-                    "There is no other door than the one you entered."
-                ),
-                "desc_no_item": (
-                    "The walk-in closet is a small, snug room,filled with various clothes.\n"
-                    "You see the bare mannequin where your robes used to be.\n"
-                    "There is no other door than the one you entered."
-                ),
-                "item": "Robes",
-                "image_path": "images/closet.png"
-            },
-            {
-                "name": "Armory",
-                "desc_with_item": (
-                    "As you walk into the armory, you see most of the shelves are stocked\n"
-                    "with different miscellaneous staves, shortswords, and scepters.\n"
-                    "Mounted on the wall you see one of the Mage Guild's relics:\n"
-                    "the Shield of Reflection. You feel a magical aura pulsating from it."
-                ),
-                "desc_no_item": (
-                    "As you walk into the armory, you see most of the shelves are still\n"
-                    "stocked with different miscellaneous staves, shortswords, and scepters.\n"
-                    "You see the now empty area on the wall, void of dust, from\n"
-                    "where the shield was once mounted."
-                ),
-                "item": "Shield",
-                "image_path": "images/armory.png"
-            },
-            {
-                "name": "Magic Sanctum",
-                "desc_with_item": (
-                    "As you walk into the Magic Sanctum, you can feel the energy\n"
-                    "radiating in the air. As you look around, rows of books, scrolls,\n"
-                    "and tomes plaster the walls. You notice up against one of the walls,\n"
-                    "a display case holding a familiar item you're attuned to: the Cloak of Levitation."
-                ),
-                "desc_no_item": (
-                    "As you walk into the Magic Sanctum, you can feel the energy\n"
-                    "radiating in the air. As you look around, rows of books, scrolls,\n"
-                    "and tomes plaster the walls. You see against the wall, the empty\n"
-                    "display case that was once holding the Cloak of Levitation."
-                ),
-                "item": "Cloak",
-                "image_path": "images/sanctum.png"
-            },
-            {
-                "name": "Apothecary",
-                "desc_with_item": (
-                    "As you walk into the apothecary, your nostrils are assaulted by\n"
-                    "different herbs, animal parts, and other miscellaneous reagents.\n"
-                    "As you refocus your mind, you see a mana potion sealed and sitting on\n"
-                    "the table."
-                ),
-                "desc_no_item": (
-                    "You try to brace yourself but your nostrils are once again assaulted by\n"
-                    "different herbs, animal parts, and other miscellaneous reagents.\n"
-                    "The table that once held a mana potion is now empty omitting a few\n"
-                    "bits and bobbles."
-                ),
-                "item": "Potion",
-                "image_path": "images/apothecary.png"
-            },
-            {
-                "name": "Mage Tower",
-                "desc_with_item": (
-                    "Within the Mage Tower and you see your arcane desk. It's covered\n"
-                    "with different trinkets and books. Leaning against the desk you\n"
-                    "see your tried and true, trusted weapon. Your mage staff pulsates\n"
-                    "with power."
-                ),
-                "desc_no_item": (
-                    "You enter the Mage Tower and you see your arcane desk.\n"
-                    "It's covered with different trinkets and books."
-                ),
-                "item": "Staff",
-                "image_path": "images/tower.png"
-            },
-            {
-                "name": "Arcane Dungeon",
-                "desc_with_item": (
-                    "You enter the Arcane Dungeon. You can hear the sounds of the elemental hydra waiting for you."
-                ),
-                "desc_no_item": (
-                    "You enter the Arcane Dungeon. You can hear the sounds of the elemental hydra waiting for you."
-                ),
-                "item": None,
-                "image_path": "images/dungeon.png"
-            }
-        ]
-
-        # Insert data into MongoDB
-        result = rooms_collection.insert_many(rooms_data)
-        print(f"Successfully inserted {len(result.inserted_ids)} room documents into '{config.DB_NAME}'.")
-
-        # Create a unique index on the "name" field.
-        # This ensures fast lookups and prevents duplicate room names.
-        rooms_collection.create_index("name", unique=True)
-        print("Created unique index on 'rooms.name'.")
-
-        client.close()
-
-    except Exception as e:
+        db_manager = open_storage()
+        report = import_rooms(_content_records(paths), db_manager,
+                              batch_size=batch_size or DEFAULT_BATCH_SIZE,
+                              max_errors=DEFAULT_MAX_ERRORS if max_errors is None else max_errors)
+        print(report.summary())
+        if report.published:
+            write_catalog_snapshot(db_manager, report.version)
+        return report.published
+
+    except (ContentError, StorageError, OSError) as e:
         print(f"An error occurred while seeding the database: {e}")
+        return False
+    finally:
+        if db_manager is not None:
+            db_manager.close_connection()
+
+
+def _content_records(paths):
+    """The (location, record) pairs to import: every pack in turn, or ROOMS_DATA."""
+    from content_import import read_content_pack
+
+    if not paths:
+        for number, room in enumerate(ROOMS_DATA):
+            yield f"ROOMS_DATA[{number}]", room
+        return
+    for path in paths:
+        yield from read_content_pack(path)
+
+
+def write_catalog_snapshot(db_manager, version):
+    """
+    Writes the rooms to the catalog snapshot file (config.CATALOG_SNAPSHOT_PATH),
+    stamped with the version just published, so games can memory-map the rooms
+    instead of reading them from the database (see catalog_snapshot.py).
+    The rooms are streamed from the database, which now holds the rooms of
+    every pack imported so far, not just this one.
+    """
+    if not config.CATALOG_SNAPSHOT_PATH:
+        return
+    from catalog_snapshot import write_snapshot
+
+    write_snapshot(config.CATALOG_SNAPSHOT_PATH, db_manager.iter_rooms_data(), version)
+    print(f"Wrote room catalog snapshot '{config.CATALOG_SNAPSHOT_PATH}' (version {version}).")
 
 
 if __name__ == "__main__":
-    seed_database()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import rooms into the game database.")
+    parser.add_argument("paths", nargs="*", metavar="PACK",
+                        help="Content packs to import (.jsonl or .csv). Defaults to the built-in rooms.")
+    parser.add_argument("--batch-size", type=int, help="Rooms per bulk write (default 1000).")
+    parser.add_argument("--max-errors", type=int,
+                        help="Invalid rooms to skip before the import gives up (default 100).")
+    args = parser.parse_args()
+
+    seed_database(args.paths, batch_size=args.batch_size, max_errors=args.max_errors)
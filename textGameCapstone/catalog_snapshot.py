@@ -0,0 +1,188 @@
+"""
+A read-only snapshot of the room catalog in one binary file.
+build_database.py writes it next to the database; RoomCatalog (see
+room_catalog.py) memory-maps it, so a game starts without asking the database
+for rooms, and every game process on the host shares the same page-cached copy.
+
+File layout (little-endian):
+
+    header   magic b"RCAT", format version (u16), reserved (u16),
+             catalog version (i64), room count (u32),
+             string table offset (u32), string table size (u32)
+    index    one entry per room, in catalog order: four (offset, length)
+             pairs (u32) into the string table, for name, desc_with_item,
+             desc_no_item and item (length NO_ITEM when the room has none)
+    strings  the UTF-8 text of every field, back to back
+
+Nothing is copied out of the map up front: a field is decoded straight from
+the mapped pages when the game reads it.
+"""
+
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from collections.abc import Mapping
+
+MAGIC = b"RCAT"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHqIII")
+ENTRY = struct.Struct("<8I")
+
+# The room document fields, in the order their (offset, length) pairs are stored
+FIELDS = ("name", "desc_with_item", "desc_no_item", "item")
+NO_ITEM = 0xFFFFFFFF  # Length stored for a room without an item
+
+
+def write_snapshot(path, rooms_data, catalog_version):
+    """
+    Writes the rooms to a snapshot file.
+    The file is written under a temporary name and then renamed, so a game
+    that has the old snapshot mapped keeps reading the old (complete) file.
+
+    The rooms are read once, in a stream: only the small fixed-size index is
+    kept in memory, and the text is spooled to a temporary file until the
+    index is complete, so a large catalog never has to fit in memory.
+
+    Args:
+        path (str): Where to write the snapshot.
+        rooms_data (iterable): Room documents, in catalog order (e.g. a database cursor).
+        catalog_version (int): The catalog version the rooms belong to.
+    """
+    index = bytearray()
+    room_count = 0
+    strings_size = 0
+    with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as strings:
+        for room in rooms_data:
+            pairs = []
+            for field in FIELDS:
+                value = room.get(field)
+                if value is None:
+                    pairs += [0, NO_ITEM]
+                    continue
+                encoded = value.encode("utf-8")
+                pairs += [strings_size, len(encoded)]
+                strings.write(encoded)
+                strings_size += len(encoded)
+            index += ENTRY.pack(*pairs)
+            room_count += 1
+
+        strings_offset = HEADER.size + len(index)
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, catalog_version, room_count, strings_offset, strings_size)
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as snapshot_file:
+            snapshot_file.write(header)
+            snapshot_file.write(index)
+            strings.seek(0)
+            shutil.copyfileobj(strings, snapshot_file)
+    os.replace(temp_path, path)
+
+
+def open_snapshot(path):
+    """
+    Maps a snapshot file.
+
+    Returns:
+        CatalogSnapshot: The snapshot, or None if the file is missing or not a valid snapshot.
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    try:
+        return CatalogSnapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring room catalog snapshot '{path}': {e}")
+        return None
+
+
+class CatalogSnapshot:
+    """A memory-mapped snapshot file (see the layout at the top of this file)."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot this version can read.
+        """
+        with open(path, "rb") as snapshot_file:
+            # The mapping stays valid after the file is closed (or replaced)
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        if len(self._map) < HEADER.size:
+            raise ValueError("file is too short")
+        magic, format_version, _, self.version, self.room_count, strings_offset, strings_size = \
+            HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("not a room catalog snapshot")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"unsupported format version {format_version}")
+        if strings_offset != HEADER.size + self.room_count * ENTRY.size \
+                or strings_offset + strings_size > len(self._map):
+            raise ValueError("file is truncated")
+
+        self._strings = self._view[strings_offset:strings_offset + strings_size]
+
+        # Names are needed to look rooms up, so they are the only text read up front
+        self._positions = {self._field(position, 0): position for position in range(self.room_count)}
+
+    def _field(self, position, field_number):
+        """Decodes one field of one room from the mapped string table."""
+        offset, length = ENTRY.unpack_from(self._map, HEADER.size + position * ENTRY.size)[
+            field_number * 2:field_number * 2 + 2]
+        if length == NO_ITEM:
+            return None
+        if offset + length > len(self._strings):
+            raise ValueError("string outside the string table")
+        return str(self._strings[offset:offset + length], "utf-8")
+
+    def names(self):
+        """Every room name, in catalog order."""
+        return list(self._positions)
+
+    def get_room(self, name):
+        """Returns the room's document (see SnapshotRoom), or None."""
+        position = self._positions.get(name)
+        return None if position is None else SnapshotRoom(self, position)
+
+    def get_all_rooms(self):
+        """
+        Returns every room, keyed by name, in catalog order.
+
+        Returns:
+            dict: room name -> SnapshotRoom.
+        """
+        return {name: SnapshotRoom(self, position) for name, position in self._positions.items()}
+
+
+class SnapshotRoom(Mapping):
+    """
+    A room document backed by the snapshot: reads like the dictionary the
+    database returns, but each field is decoded from the mapped file on access.
+    """
+
+    __slots__ = ("_snapshot", "_position")
+
+    def __init__(self, snapshot, position):
+        self._snapshot = snapshot
+        self._position = position
+
+    def __getitem__(self, field):
+        try:
+            field_number = FIELDS.index(field)
+        except ValueError:
+            raise KeyError(field) from None
+        return self._snapshot._field(self._position, field_number)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return f"SnapshotRoom({dict(self)!r})"
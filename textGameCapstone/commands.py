@@ -0,0 +1,247 @@
+"""
+Table-driven command handling.
+Commands are registered once with their names, aliases and argument specs,
+and every word the player types is resolved through a prefix trie, so any
+unambiguous abbreviation works ('SA' -> SAVE, 'G N' -> GO NORTH) and the cost
+of a lookup only depends on the length of the word, not on how many
+commands exist.
+
+Handlers return a CommandResult instead of printing, so the caller decides
+how (or whether) to show it.
+"""
+
+
+class PrefixTrie:
+    """
+    Maps words to values and finds them by exact word or unique prefix.
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, word, value):
+        """Adds a word (case-insensitive) that resolves to value."""
+        node = self.root
+        node.values.add(value)
+        for char in word.upper():
+            node = node.children.setdefault(char, _TrieNode())
+            node.values.add(value)
+        node.exact = value
+        node.has_exact = True
+
+    def lookup(self, word):
+        """
+        Resolves a word or abbreviation.
+
+        Returns:
+            tuple: (status, value, options) where status is 'FOUND', 'AMBIGUOUS'
+                   or 'UNKNOWN'. An exact word always wins over longer words
+                   it is a prefix of ('S' can be an alias even though 'SAVE' exists).
+        """
+        node = self.root
+        for char in word.upper():
+            node = node.children.get(char)
+            if node is None:
+                return 'UNKNOWN', None, ()
+
+        if node.has_exact:
+            return 'FOUND', node.exact, ()
+        if len(node.values) == 1:
+            return 'FOUND', next(iter(node.values)), ()
+        return 'AMBIGUOUS', None, tuple(node.values)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'values', 'exact', 'has_exact')
+
+    def __init__(self):
+        self.children = {}
+        self.values = set()  # Every distinct value stored at or below this node
+        self.exact = None
+        self.has_exact = False
+
+
+class ArgSpec:
+    """Describes one argument of a command."""
+
+    def __init__(self, name, choices=None, transform=None, missing_message=None, invalid_message=None):
+        """
+        Args:
+            name (str): Argument name (for help and error details).
+            choices (iterable, optional): Allowed values; abbreviations are resolved through a trie.
+            transform (callable, optional): Applied to the typed word (e.g. str.title).
+            missing_message (str, optional): Shown when the argument is left out.
+            invalid_message (str, optional): Shown for a value not in choices; '{}' is replaced by the word.
+        """
+        self.name = name
+        self.choices = None
+        if choices is not None:
+            self.choices = PrefixTrie()
+            for choice in choices:
+                self.choices.insert(choice, choice)
+        self.transform = transform
+        self.missing_message = missing_message or f"Missing {name}."
+        self.invalid_message = invalid_message or f"'{{}}' is not a valid {name}."
+
+    def parse(self, word):
+        """
+        Converts a typed word into the argument value.
+
+        Returns:
+            tuple: (value, error message or None)
+        """
+        if self.choices is not None:
+            status, value, _ = self.choices.lookup(word)
+            if status != 'FOUND':
+                return None, self.invalid_message.format(word.upper())
+            return value, None
+        if self.transform is not None:
+            word = self.transform(word)
+        return word, None
+
+
+class Command:
+    """A registered command: its handler and how to call it."""
+
+    def __init__(self, name, handler, args=(), uses_database=False, help_text=""):
+        """
+        Args:
+            name (str): The command word, e.g. 'GO'.
+            handler (callable): Called as handler(context, *arguments); returns a CommandResult.
+            args (iterable): ArgSpec for each argument, in order.
+            uses_database (bool): True if running it talks to the database (see server.py).
+            help_text (str): One-line usage, e.g. 'GO [Direction]'.
+        """
+        self.name = name
+        self.handler = handler
+        self.args = list(args)
+        self.uses_database = uses_database
+        self.help_text = help_text or name
+
+
+class CommandResult:
+    """
+    What a command did. `status` is a short code (e.g. 'OK', 'UNRECOGNIZED',
+    'INVALID_MOVE'), `messages` holds any text for the player, and `detail`
+    carries extra data for the caller (such as the word that was not understood).
+    """
+
+    def __init__(self, status='OK', messages=(), ok=True, command=None, detail=None):
+        self.status = status
+        self.messages = list(messages)
+        self.ok = ok
+        self.command = command
+        self.detail = detail
+
+    def __repr__(self):
+        return f"CommandResult({self.status!r}, {self.messages!r})"
+
+
+class CommandRegistry:
+    """
+    Holds every command and alias, and turns player input into handler calls.
+    """
+
+    def __init__(self):
+        self.commands = {}  # Command name -> Command, in registration order
+        self._words = PrefixTrie()  # Command names and aliases -> (command name, preset words)
+
+    def register(self, name, handler, args=(), aliases=(), uses_database=False, help_text=""):
+        """
+        Adds a command.
+
+        Args:
+            name (str): The command word.
+            handler (callable): Called as handler(context, *arguments).
+            args (iterable): ArgSpec for each argument.
+            aliases (iterable): Other words for the same command (see alias() for
+                aliases that also fill in arguments).
+            uses_database (bool): True if the handler talks to the database.
+            help_text (str): One-line usage for HELP.
+        """
+        name = name.upper()
+        self.commands[name] = Command(name, handler, args, uses_database, help_text)
+        self._words.insert(name, (name, ()))
+        for alias in aliases:
+            self.alias(alias, name)
+
+    def alias(self, word, command_name, *preset_words):
+        """
+        Adds another word for a command, optionally with fixed arguments
+        (e.g. alias('N', 'GO', 'NORTH') makes 'N' mean 'GO NORTH').
+        """
+        self._words.insert(word, (command_name.upper(), tuple(preset_words)))
+
+    def resolve(self, words):
+        """
+        Finds the command for a line of input without running it.
+
+        Args:
+            words (list): The input split into words.
+
+        Returns:
+            tuple: (Command or None, argument words, CommandResult for an error or None)
+        """
+        if not words:
+            return None, [], CommandResult('EMPTY', ok=False)
+
+        status, value, options = self._words.lookup(words[0])
+        if status == 'UNKNOWN':
+            return None, [], CommandResult('UNRECOGNIZED', ok=False, detail=words[0])
+        if status == 'AMBIGUOUS':
+            # detail lists what the word could mean, e.g. ['GET', 'GO']
+            meanings = sorted(" ".join((command_name,) + preset_words) for command_name, preset_words in options)
+            return None, [], CommandResult('AMBIGUOUS', ok=False, detail=meanings)
+
+        command_name, preset_words = value
+        return self.commands[command_name], list(preset_words) + list(words[1:]), None
+
+    def uses_database(self, words):
+        """Checks if the command in this input talks to the database."""
+        command, _, error = self.resolve(words)
+        return error is None and command.uses_database
+
+    def dispatch(self, words, context):
+        """
+        Resolves and runs one command.
+
+        Args:
+            words (list): The input split into words.
+            context: Passed to the handler as its first argument (the MainGame).
+
+        Returns:
+            CommandResult: The handler's result, or the reason nothing ran.
+        """
+        command, arg_words, error = self.resolve(words)
+        if error is not None:
+            return error
+
+        arguments = []
+        for position, spec in enumerate(command.args):
+            if position >= len(arg_words):
+                return CommandResult('MISSING_ARGUMENT', [spec.missing_message], ok=False, command=command.name)
+            value, message = spec.parse(arg_words[position])
+            if message is not None:
+                return CommandResult('INVALID_ARGUMENT', [message], ok=False, command=command.name)
+            arguments.append(value)
+
+        result = command.handler(context, *arguments)
+        result.command = command.name
+        return result
+
+    def dispatch_all(self, lines, context):
+        """
+        Runs several commands in order (e.g. from a script) and collects their results.
+
+        Args:
+            lines (iterable): One command per line.
+            context: Passed to every handler.
+
+        Returns:
+            list: A CommandResult per line.
+        """
+        return [self.dispatch(line.split(), context) for line in lines]
+
+    def help_lines(self):
+        """Returns the usage text of every command, in registration order."""
+        return [command.help_text for command in self.commands.values()]
@@ -0,0 +1,133 @@
+"""
+A compact, array-backed store for a generated map.
+Instead of one Room object (with its own exits dictionary) per room, the
+whole map is held in a few flat arrays indexed by integer room IDs:
+
+* exits: an int32 array with 4 slots per room (NORTH, EAST, SOUTH, WEST),
+  holding the neighbouring room ID or -1 for "no door".
+* items: a bit array with one bit per room, set while the room's item is still there.
+
+Room names and descriptions are not copied: they are shared with the room
+catalog, so a map only costs a little over 16 bytes per room.
+"""
+
+from array import array
+from collections.abc import Mapping
+from room import RoomView
+from map_generator import ALL_DIRECTIONS, NUM_DIRECTIONS, NO_EXIT
+
+# Direction name -> slot index within a room's 4 exit slots
+DIRECTION_INDEX = {direction: d for d, direction in enumerate(ALL_DIRECTIONS)}
+
+
+class CompactMap:
+    """
+    Holds a map's layout and item state as arrays, and hands out RoomView
+    objects that look like Room to the rest of the game.
+    """
+
+    def __init__(self, names, docs, ids, exits, item_flags=None):
+        """
+        Args:
+            names (list): Room name for each room ID.
+            docs (list): Room document (descriptions, item) for each room ID.
+            ids (dict): Room name -> room ID.
+            exits (list): Flat exits list, 4 slots per room, NO_EXIT for no door
+                          (the format produced by MapGenerator.generate()).
+            item_flags (list, optional): One boolean per room saying if its item is
+                still there (from a save). Defaults to every item being present.
+        """
+        self.names = names
+        self.docs = docs
+        self.ids = ids
+        self.exits = array('i', exits)
+
+        # One bit per room: is the room's item still there?
+        self.items = bytearray((len(names) + 7) // 8)
+        for room_id, doc in enumerate(docs):
+            present = doc['item'] is not None
+            if item_flags is not None:
+                present = present and item_flags[room_id]
+            if present:
+                self.items[room_id >> 3] |= 1 << (room_id & 7)
+
+        # IDs of rooms whose item state changed since the last save (for delta saves)
+        self.dirty_rooms = set()
+
+        # Read-only name -> RoomView mapping, so code written for GameMap.rooms keeps working
+        self.rooms = CompactRooms(self)
+
+    # --- Item bits ---
+
+    def has_item(self, room_id):
+        """Returns True if the room's item has not been collected yet."""
+        return bool(self.items[room_id >> 3] & (1 << (room_id & 7)))
+
+    def set_item(self, room_id, present):
+        """Sets or clears the room's item bit, and records the room as changed."""
+        self.dirty_rooms.add(room_id)
+        if present:
+            self.items[room_id >> 3] |= 1 << (room_id & 7)
+        else:
+            self.items[room_id >> 3] &= ~(1 << (room_id & 7)) & 0xFF
+
+    def get_item_word(self, word_index):
+        """Returns the item bits of rooms 32*word_index .. 32*word_index+31 as one integer (see save_schema.py)."""
+        return int.from_bytes(self.items[word_index * 4:word_index * 4 + 4], 'little')
+
+    # --- Exits ---
+
+    def get_neighbor_id(self, room_id, direction):
+        """
+        Returns the ID of the room through the given door, or None if there is no door.
+
+        Args:
+            room_id (int): The room to look from.
+            direction (str): 'NORTH', 'EAST', 'SOUTH' or 'WEST'.
+        """
+        d = DIRECTION_INDEX.get(direction)
+        if d is None:
+            return None
+        neighbor_id = self.exits[room_id * NUM_DIRECTIONS + d]
+        return None if neighbor_id == NO_EXIT else neighbor_id
+
+    def get_exits(self, room_id):
+        """Returns the room's exits as a direction -> room name dictionary."""
+        base = room_id * NUM_DIRECTIONS
+        return {ALL_DIRECTIONS[d]: self.names[self.exits[base + d]]
+                for d in range(NUM_DIRECTIONS) if self.exits[base + d] != NO_EXIT}
+
+    # --- Views ---
+
+    def get_room(self, name):
+        """Returns a RoomView for the named room, or None if it isn't on the map."""
+        room_id = self.ids.get(name)
+        if room_id is None:
+            return None
+        return RoomView(self, room_id)
+
+    def get_neighbor(self, room_id, direction):
+        """Returns a RoomView for the room through the given door, or None."""
+        neighbor_id = self.get_neighbor_id(room_id, direction)
+        if neighbor_id is None:
+            return None
+        return RoomView(self, neighbor_id)
+
+
+class CompactRooms(Mapping):
+    """A read-only name -> RoomView mapping over a CompactMap (views are made on demand)."""
+
+    def __init__(self, compact_map):
+        self.compact_map = compact_map
+
+    def __getitem__(self, name):
+        room = self.compact_map.get_room(name)
+        if room is None:
+            raise KeyError(name)
+        return room
+
+    def __iter__(self):
+        return iter(self.compact_map.names)
+
+    def __len__(self):
+        return len(self.compact_map.names)
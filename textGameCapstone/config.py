@@ -4,11 +4,101 @@ It provides a central place to access configuration settings.
 """
 
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from the .env file
-load_dotenv()
+
+def _find_env_file():
+    """
+    Looks for a .env file in this file's directory and then in each parent
+    directory (the same search python-dotenv's load_dotenv() does).
+
+    Returns:
+        str: The path of the first .env found, or None.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Load environment variables from the .env file.
+# python-dotenv (and the modules it pulls in) is only imported if there is a
+# file to load, which keeps startup fast when the settings come from the environment.
+_ENV_FILE = _find_env_file()
+if _ENV_FILE is not None:
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 # Access the variables
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME")
\ No newline at end of file
+DB_NAME = os.getenv("DB_NAME")
+
+# Connection pool settings shared by every component (see db_client.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "10"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "5000"))
+
+# How often (in seconds) the cached room catalog checks for a new catalog version
+CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "30"))
+
+# How a generated map is held in memory: 'objects' (one Room per room) or 'compact' (arrays)
+MAP_STORE = os.getenv("MAP_STORE", "objects")
+
+# Pre-generated map pool (see map_pool.py): 'off', 'file' or 'mongo'
+MAP_POOL_BACKEND = os.getenv("MAP_POOL_BACKEND", "off")
+MAP_POOL_DIR = os.getenv("MAP_POOL_DIR", "map_pool")  # Used by the 'file' backend
+MAP_POOL_LOW_WATERMARK = int(os.getenv("MAP_POOL_LOW_WATERMARK", "4"))  # Refill below this many layouts
+MAP_POOL_TARGET_SIZE = int(os.getenv("MAP_POOL_TARGET_SIZE", "16"))  # Refill up to this many layouts
+MAP_POOL_WORKERS = int(os.getenv("MAP_POOL_WORKERS", str(os.cpu_count() or 1)))
+MAP_POOL_MIN_PAR = int(os.getenv("MAP_POOL_MIN_PAR", "0"))  # Drop layouts winnable in fewer moves (0 keeps all)
+
+# Which save to use when none is given (saves are keyed by player and slot)
+DEFAULT_PLAYER_ID = os.getenv("DEFAULT_PLAYER_ID", "player_1")
+DEFAULT_SAVE_SLOT = int(os.getenv("DEFAULT_SAVE_SLOT", "1"))
+
+# Network server (server.py): where it listens, how many players it hosts,
+# and how many threads run database calls for them
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "4000"))
+SERVER_MAX_SESSIONS = int(os.getenv("SERVER_MAX_SESSIONS", "5000"))
+SERVER_DB_WORKERS = int(os.getenv("SERVER_DB_WORKERS", str(MONGO_MAX_POOL_SIZE)))
+SERVER_IDLE_TIMEOUT_SECONDS = float(os.getenv("SERVER_IDLE_TIMEOUT_SECONDS", "900"))
+
+# Where rooms and saves are stored: 'mongo', 'sqlite' or 'memory' (see storage.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "text_adventure.db")
+
+# Write-behind autosave (see autosave.py): save every this many moves or pick-ups (0 turns it off)
+AUTOSAVE_TURNS = int(os.getenv("AUTOSAVE_TURNS", "1"))
+AUTOSAVE_DELAY_SECONDS = float(os.getenv("AUTOSAVE_DELAY_SECONDS", "0.5"))  # How long an autosave may wait to be merged
+
+# Room catalog snapshot written by build_database.py and memory-mapped by the game
+# (see catalog_snapshot.py); set it to an empty value to always read rooms from the database
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "room_catalog.snapshot")
+
+# Metrics (see metrics.py): a Prometheus text-format file rewritten every
+# METRICS_INTERVAL_SECONDS; leave METRICS_FILE empty to not write one
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_INTERVAL_SECONDS = float(os.getenv("METRICS_INTERVAL_SECONDS", "15"))
+
+# Profiling mode (python main.py --profile, see profiling.py): where the reports go,
+# how many turns between memory snapshots, how long the tables are, and how many
+# stack frames each allocation keeps
+PROFILE_PREFIX = os.getenv("PROFILE_PREFIX", "profile")
+PROFILE_SNAPSHOT_TURNS = int(os.getenv("PROFILE_SNAPSHOT_TURNS", "100"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+PROFILE_FRAMES = int(os.getenv("PROFILE_FRAMES", "1"))
+
+# Shortest-path index behind HINT and WHERE (see path_index.py): maps up to this many
+# rooms get an all-pairs distance matrix, larger ones use A* with this many landmarks
+PATH_MATRIX_MAX_ROOMS = int(os.getenv("PATH_MATRIX_MAX_ROOMS", "512"))
+PATH_LANDMARKS = int(os.getenv("PATH_LANDMARKS", "8"))
+
+# Optimal-route solver (see route_solver.py): how many solved layouts are cached,
+# and the most required items it will solve for (the work doubles with each item)
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "1024"))
+ROUTE_SOLVER_MAX_ITEMS = int(os.getenv("ROUTE_SOLVER_MAX_ITEMS", "16"))
@@ -0,0 +1,224 @@
+"""
+Imports rooms from content packs into whichever storage backend is configured.
+build_database.py uses it both for the built-in ROOMS_DATA and for pack files:
+
+    python build_database.py packs/castle.jsonl packs/caves.csv
+
+A pack is either JSON Lines (one room object per line) or CSV (a header row,
+then one room per row; an empty item cell means the room has no item). Every
+room has a name, desc_with_item and desc_no_item, and optionally an item and
+an image_path. Items are part of their room, so a pack of rooms is also the
+pack of items.
+
+The import is built to handle packs of hundreds of thousands of rooms:
+
+* Packs are read one line at a time and written in batches, so memory use
+  depends on the batch size, not on the size of the pack.
+* Each batch is one unordered bulk upsert keyed on the room name, so running
+  the same import twice changes nothing, and an import can be re-run after
+  it was interrupted.
+* Only the rooms are touched. Saves stay where they are, and the game keeps
+  running during the import: the new rooms show up once the new catalog
+  version is published at the end.
+"""
+
+import csv
+import json
+import os
+import time
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_ERRORS = 100
+
+REQUIRED_FIELDS = ("name", "desc_with_item", "desc_no_item")
+OPTIONAL_FIELDS = ("item", "image_path")
+
+
+class ContentError(ValueError):
+    """A room in a content pack is not valid."""
+
+
+class ImportReport:
+    """What one import did."""
+
+    def __init__(self):
+        self.rooms_read = 0
+        self.rooms_written = 0
+        self.batches = 0
+        self.errors = []  # "location: message" for every room that was skipped
+        self.version = None  # The catalog version published (None if the import was aborted)
+        self.elapsed = 0.0
+
+    @property
+    def published(self):
+        return self.version is not None
+
+    def summary(self):
+        """A one-line summary for the console."""
+        text = (f"Read {self.rooms_read} rooms, wrote {self.rooms_written} in {self.batches} "
+                f"batches, skipped {len(self.errors)} ({self.elapsed:.2f}s).")
+        if self.published:
+            text += f" Published room catalog version {self.version}."
+        else:
+            text += " Nothing was published."
+        return text
+
+
+def read_content_pack(path):
+    """
+    Streams the rooms in a content pack, one at a time.
+
+    Args:
+        path (str): A .jsonl (or .ndjson) or .csv file.
+
+    Yields:
+        tuple: (location, record), where location is "file:line" for error
+            messages and record is the raw room (not yet validated). A line
+            that cannot be parsed is yielded as a ContentError instead of a record.
+
+    Raises:
+        ContentError: If the file type is not supported.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        yield from _read_jsonl(path)
+    elif extension == ".csv":
+        yield from _read_csv(path)
+    else:
+        raise ContentError(f"{path}: unsupported content pack type '{extension}' (use .jsonl or .csv)")
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as pack_file:
+        for line_number, line in enumerate(pack_file, start=1):
+            if not line.strip():
+                continue
+            location = f"{path}:{line_number}"
+            try:
+                yield location, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield location, ContentError(f"invalid JSON: {e}")
+
+
+def _read_csv(path):
+    with open(path, encoding="utf-8", newline="") as pack_file:
+        reader = csv.DictReader(pack_file)
+        for record in reader:
+            # reader.line_num is the last line read, so multi-line cells point at the row's end
+            location = f"{path}:{reader.line_num}"
+            if None in record:
+                yield location, ContentError("more cells than the header has columns")
+                continue
+            # CSV has no null: an empty optional cell means the field is not set
+            for field in OPTIONAL_FIELDS:
+                if record.get(field) == "":
+                    record[field] = None
+            yield location, record
+
+
+def validate_room(record):
+    """
+    Checks a room from a content pack and returns the document to store.
+
+    Args:
+        record (dict): The room as read from the pack.
+
+    Returns:
+        dict: The room document (unset optional fields are left out, except item).
+
+    Raises:
+        ContentError: If the room is missing a field, has an unknown one, or a value is wrong.
+    """
+    if isinstance(record, ContentError):
+        raise record
+    if not isinstance(record, dict):
+        raise ContentError("a room must be an object")
+
+    unknown = set(record) - set(REQUIRED_FIELDS) - set(OPTIONAL_FIELDS)
+    if unknown:
+        raise ContentError(f"unknown fields: {', '.join(sorted(map(str, unknown)))}")
+
+    room = {}
+    for field in REQUIRED_FIELDS:
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ContentError(f"'{field}' must be a non-empty string")
+        room[field] = value
+    if room["name"] != room["name"].strip():
+        raise ContentError("'name' must not start or end with spaces")
+
+    # Players pick items up with GET <item>, which takes one word and title-cases it
+    item = record.get("item")
+    if item is not None:
+        if not isinstance(item, str) or len(item.split()) != 1 or item != item.title():
+            raise ContentError(f"'item' must be a single capitalized word, not {item!r}")
+    room["item"] = item
+
+    image_path = record.get("image_path")
+    if image_path is not None:
+        if not isinstance(image_path, str):
+            raise ContentError("'image_path' must be a string")
+        room["image_path"] = image_path
+
+    return room
+
+
+def import_rooms(records, db_manager, batch_size=DEFAULT_BATCH_SIZE, max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Validates rooms and upserts them into the database in batches, then
+    publishes a new catalog version. Invalid rooms are reported and skipped;
+    if there are more than max_errors of them, the import stops without
+    publishing (the batches already written stay, and re-running the fixed
+    pack overwrites them).
+
+    Args:
+        records (iterable): (location, record) pairs, e.g. from read_content_pack().
+        db_manager (StorageBackend): Where to write the rooms.
+        batch_size (int): Rooms per bulk write.
+        max_errors (int): How many invalid rooms to skip before giving up.
+
+    Returns:
+        ImportReport: Counts, errors, and the published version.
+
+    Raises:
+        StorageError: If the database rejected a write.
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    seen_names = set()  # Only the names are kept, to catch a room defined twice
+    batch = []
+
+    db_manager.begin_room_import()
+    for location, record in records:
+        report.rooms_read += 1
+        try:
+            room = validate_room(record)
+            if room["name"] in seen_names:
+                raise ContentError(f"room '{room['name']}' is defined more than once")
+        except ContentError as e:
+            report.errors.append(f"{location}: {e}")
+            print(f"Skipping {location}: {e}")
+            if len(report.errors) > max_errors:
+                print(f"More than {max_errors} invalid rooms; stopping the import.")
+                report.elapsed = time.perf_counter() - start
+                return report
+            continue
+
+        seen_names.add(room["name"])
+        batch.append(room)
+        if len(batch) >= batch_size:
+            _write_batch(db_manager, batch, report)
+            batch = []
+
+    if batch:
+        _write_batch(db_manager, batch, report)
+
+    report.version = db_manager.finish_room_import()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _write_batch(db_manager, batch, report):
+    db_manager.upsert_rooms(batch)
+    report.rooms_written += len(batch)
+    report.batches += 1
@@ -2,50 +2,134 @@
 This file handles all interactions with the MongoDB database.
 It manages the connection, retrieves room data, and handles
 saving/loading player progress.
+This is the 'mongo' storage backend (see storage.py for the others).
 """
 
+import threading
+import time
 import pymongo
-import sys
+from pymongo import InsertOne, UpdateOne
+from pymongo.write_concern import WriteConcern
 import config
+from startup import startup_timer
+from db_client import registry
+import save_schema
+from metrics import timed_operation
+from storage import StorageBackend, StorageError, SAVE_METADATA_FIELDS, DURABLE, FAST, save_key as _save_key
 
-class DatabaseManager:
+# The room fields the game actually uses (everything else stays on the server)
+ROOM_PROJECTION = {"_id": 0, "name": 1, "desc_with_item": 1, "desc_no_item": 1, "item": 1}
+
+# The save fields returned when listing saves (no game state)
+SAVE_METADATA_PROJECTION = dict({"_id": 0}, **{field: 1 for field in SAVE_METADATA_FIELDS})
+
+# Write concern for FAST (auto)saves: the server does not reply
+UNACKNOWLEDGED = WriteConcern(w=0)
+
+# Saves from before multi-slot support all used this one ID
+LEGACY_SAVE_ID = "player_1_save"
+
+# Set once the saves index has been created in this process
+_save_indexes_ready = False
+
+
+class DatabaseManager(StorageBackend):
     """
     A class to manage the MongoDB connection and operations.
     """
 
+    # Until the background connection is made (see db)
+    _db = None
+    _bulk_load = False  # True while importing into an empty 'rooms' collection
+    _warmup = None
+    _connect_error = None
+
     def __init__(self, db_name="text_adventure_db"):
         """
-        Initializes the connection to the local MongoDB instance.
+        Starts connecting to the local MongoDB instance in the background and
+        returns at once, so the game can show its banner and build the rest of
+        itself while the server answers. The first database call waits for the
+        connection (see db).
 
         Args:
             db_name (str): The name of the database to connect to.
                            Defaults to 'text_adventure_db'.
         """
         self.client = None
-        self.db = None
+        self.db_name = db_name
 
-        try:
-            # Connect to the local MongoDB server
-            # Use the URI from config.py
-            self.client = pymongo.MongoClient(config.MONGO_URI)
+        self._warmup = threading.Thread(target=self._connect, name="mongo-connect", daemon=True)
+        self._warmup.start()
 
-            # Access the specific database
+    def _connect(self):
+        """Runs on the warm-up thread: gets the shared client and checks that the server answers."""
+        acquired = False
+        try:
+            # Get a handle from the shared, process-wide client pool (db_client.py)
+            # instead of opening a new MongoClient for every component.
             # Use the DB_NAME from config.py
             # If it doesn't exist, MongoDB creates it automatically when we add data.
-            self.db = self.client[config.DB_NAME]
+            db = registry.get_database(config.DB_NAME)
+            acquired = True
+            self.client = db.client
+
+            # Health check: make sure the server actually answers before the game uses it
+            if not registry.ping():
+                raise pymongo.errors.ConnectionFailure("server did not respond to ping")
+
+            self._db = db
+            startup_timer.mark("database connected")
+
+        except Exception as e:
+            # Any failure (not only ConnectionFailure: a bad URI or DB_NAME too),
+            # kept for the game's thread, which raises it on first use
+            if acquired:
+                registry.release()
+            self.client = None
+            self._connect_error = StorageError(f"Could not connect to MongoDB: {e}")
+
+    @property
+    def db(self):
+        """
+        The database handle. The first use waits for the background connection.
+
+        Raises:
+            StorageError: If MongoDB could not be reached (main.py exits, server.py drops only that player).
+        """
+        warmup = self._warmup
+        if warmup is not None:
+            warmup.join()
+            self._warmup = None
+        if self._connect_error is not None:
+            raise self._connect_error
+        return self._db
+
+    @db.setter
+    def db(self, db):
+        self._db = db
 
-            print(f"Connected to database: {db_name}")
+    def is_healthy(self):
+        """Returns True if the shared MongoDB client can reach the server."""
+        return registry.ping()
 
-        except pymongo.errors.ConnectionFailure as e:
-            print(f"Could not connect to MongoDB: {e}")
-            sys.exit(1)  # Exit the game if we can't connect to the DB
+    def reopen(self):
+        """Returns a new manager, holding the shared client until it is closed itself."""
+        return DatabaseManager(self.db_name)
 
     def close_connection(self):
-        """Closes the connection to the database."""
+        """
+        Releases this manager's hold on the shared client.
+        The underlying pool is only closed once the last user releases it.
+        """
+        if self._warmup is not None:
+            self._warmup.join()  # Never release a client the warm-up is still acquiring
+            self._warmup = None
         if self.client:
-            self.client.close()
-            print("Database connection closed.")
+            registry.release()
+            self.client = None
+            self.db = None
 
+    @timed_operation("get_room_data")
     def get_room_data(self, room_name):
         """
         Retrieves the document for a specific room from the 'rooms' collection.
@@ -69,94 +153,315 @@ class DatabaseManager:
                 print(f"Error retrieving room data: {e}")
         return None
 
-    def save_game_state(self, player, game_map):
+    @timed_operation("get_rooms_data")
+    def get_rooms_data(self, room_names):
         """
-        Saves the ENTIRE game state (Player + Map Layout) to the 'saves' collection.
+        Retrieves the documents for many rooms in a single round trip.
 
         Args:
-            player (Player): The player object containing inventory and location.
-            game_map (GameMap): The map object containing all Room objects and their dynamic exits.
+            room_names (list): The names of the rooms to find.
+
+        Returns:
+            list: The matching room documents (only the fields the game uses).
+
+        Raises:
+            StorageError: If the rooms could not be read.
         """
         if self.db is not None:
             try:
-                saves_collection = self.db["saves"]
-                save_id = "player_1_save"
-
-                # --- Serialize the Map Data ---
-                # Save the state of every room because the exits are random
-                # and items might have been picked up.
-                map_data = []
-                for room_name, room_obj in game_map.rooms.items():
-                    room_state = {
-                        "name": room_obj.name,
-                        "exits": room_obj.exits,  # Save the dynamic exits
-                        "item_name": room_obj.item_name,  # Save if item is still there (or None)
-                        "has_item": room_obj.has_item,  # Save the boolean flag
-                        "desc_with_item": room_obj.desc_with_item,  # Persist descriptions
-                        "desc_no_item": room_obj.desc_no_item
-                    }
-                    map_data.append(room_state)
-
-                # Prepare the Save Document
-                save_document = {
-                    "save_id": save_id,
-                    "player": {
-                        "current_room": player.current_room.name,  # Save name, not object
-                        "inventory": list(player.inventory)  # Convert Set to List
-                    },
-                    "map_data": map_data,  # The full list of room states
-                }
-
-                # Upsert the save
-                saves_collection.update_one(
-                    {"save_id": save_id},
-                    {"$set": save_document},
-                    upsert=True
+                rooms_collection = self.db["rooms"]
+
+                # One "$in" query instead of one find_one per room.
+                # The projection leaves out fields the game never reads (_id, image_path).
+                cursor = rooms_collection.find(
+                    {"name": {"$in": list(room_names)}},
+                    ROOM_PROJECTION
                 )
-                print("Game saved successfully.")
-                return True
+                return list(cursor)
+
+            except pymongo.errors.PyMongoError as e:
+                raise StorageError(f"Error retrieving room data: {e}") from e
+        return []
+
+    @timed_operation("get_all_rooms_data")
+    def get_all_rooms_data(self):
+        """
+        Retrieves every room in the 'rooms' collection (the whole content pack).
 
+        Returns:
+            list: All room documents (only the fields the game uses).
+
+        Raises:
+            StorageError: If the rooms could not be read.
+        """
+        if self.db is not None:
+            try:
+                return list(self.db["rooms"].find({}, ROOM_PROJECTION))
+            except pymongo.errors.PyMongoError as e:
+                raise StorageError(f"Error retrieving room data: {e}") from e
+        return []
+
+    def iter_rooms_data(self):
+        """Streams every room document from a cursor (for very large catalogs)."""
+        return self.db["rooms"].find({}, ROOM_PROJECTION)
+
+    @timed_operation("get_catalog_version")
+    def get_catalog_version(self):
+        """
+        Retrieves the room catalog version stamp written by build_database.py.
+
+        Returns:
+            int: The version stamp, or None if there is none.
+
+        Raises:
+            StorageError: If the version could not be read.
+        """
+        if self.db is not None:
+            try:
+                meta = self.db["catalog_meta"].find_one({"_id": "rooms"}, {"version": 1})
+                if meta:
+                    return meta.get("version")
             except pymongo.errors.PyMongoError as e:
-                print(f"Error saving game: {e}")
+                raise StorageError(f"Error retrieving catalog version: {e}") from e
+        return None
+
+    # --- Content Import (see content_import.py) ---
+    # Only the 'rooms' and 'catalog_meta' collections are written; saves are never touched.
+
+    def begin_room_import(self):
+        """
+        Chooses how batches are written. An empty 'rooms' collection is bulk
+        loaded with plain inserts and indexed afterwards (much faster than
+        maintaining the index during the load); otherwise every room is an
+        upsert matched on the unique 'name' index.
+        """
+        rooms_collection = self.db["rooms"]
+        try:
+            self._bulk_load = rooms_collection.estimated_document_count() == 0
+            if not self._bulk_load:
+                rooms_collection.create_index("name", unique=True)
+            elif len(rooms_collection.index_information()) > 1:
+                # Left over from an earlier catalog: rebuilt in finish_room_import()
+                rooms_collection.drop_indexes()
+        except pymongo.errors.PyMongoError as e:
+            raise StorageError(f"Error preparing the room import: {e}") from e
+
+    def upsert_rooms(self, rooms):
+        """Writes one batch as a single unordered bulk write (the server may apply it in any order)."""
+        if self._bulk_load:
+            requests = [InsertOne(dict(room)) for room in rooms]  # Copies: insert adds an _id
+        else:
+            requests = [UpdateOne({"name": room["name"]}, {"$set": room}, upsert=True) for room in rooms]
+        try:
+            self.db["rooms"].bulk_write(requests, ordered=False)
+        except pymongo.errors.PyMongoError as e:
+            raise StorageError(f"Error importing rooms: {e}") from e
+
+    def finish_room_import(self):
+        """
+        Creates the unique index on 'rooms.name' (fast lookups, no duplicate
+        rooms) and stamps the catalog with a new version.
+        """
+        try:
+            self.db["rooms"].create_index("name", unique=True)
+            version = time.time_ns()
+            self.db["catalog_meta"].update_one({"_id": "rooms"}, {"$set": {"version": version}}, upsert=True)
+        except pymongo.errors.PyMongoError as e:
+            raise StorageError(f"Error publishing the room catalog: {e}") from e
+        self._bulk_load = False
+        return version
+
+    # --- Saves ---
+    # Every save is keyed by (player_id, slot), backed by a compound unique index.
+
+    def _ensure_save_indexes(self):
+        """
+        Creates the (player_id, slot) index once per process, and gives saves
+        from before multi-slot support (keyed by save_id only) an owner.
+        """
+        global _save_indexes_ready
+        if _save_indexes_ready or self.db is None:
+            return
+
+        saves_collection = self.db["saves"]
+        saves_collection.update_many(
+            {"save_id": LEGACY_SAVE_ID, "player_id": {"$exists": False}},
+            {"$set": {"player_id": config.DEFAULT_PLAYER_ID, "slot": config.DEFAULT_SAVE_SLOT}}
+        )
+        saves_collection.create_index(
+            [("player_id", pymongo.ASCENDING), ("slot", pymongo.ASCENDING)],
+            unique=True
+        )
+        _save_indexes_ready = True
+
+    @timed_operation("save_game_state")
+    def write_save_snapshot(self, snapshot, durability=DURABLE):
+        """
+        Writes a save snapshot to the 'saves' collection (see StorageBackend.save_game_state).
+        A full snapshot replaces the whole document; a delta only "$set"s the
+        changed paths (e.g. 'layout.items.0' or 'player.current_room').
+
+        Args:
+            snapshot (SaveSnapshot): What to write.
+            durability (str): DURABLE waits for the server to acknowledge the
+                write; FAST sends it unacknowledged (write concern w=0), so
+                autosaves never wait for a round trip.
+
+        Returns:
+            bool: False on error, or if a delta found no save document.
+        """
+        if self.db is None:
+            return False
+        try:
+            self._ensure_save_indexes()
+            saves_collection = self.db["saves"]
+            if durability == FAST:
+                saves_collection = saves_collection.with_options(write_concern=UNACKNOWLEDGED)
+
+            if snapshot.is_delta:
+                # --- Delta Save: only the changed paths ---
+                if snapshot.is_empty:
+                    return True  # Nothing changed since the last save
+                result = saves_collection.update_one(snapshot.save_key, {"$set": snapshot.changes})
+                # An unacknowledged write has no match count: assume the document is still
+                # there (the full snapshot that created it is always DURABLE, see autosave.py)
+                return not result.acknowledged or result.matched_count > 0
+
+            # --- Full Save: first save of this map ---
+            # Replace (not $set) so nothing from an older save format is left behind
+            saves_collection.replace_one(snapshot.save_key, snapshot.document, upsert=True)
+            return True
+
+        except pymongo.errors.PyMongoError as e:
+            print(f"Error saving game: {e}")
         return False
 
-    def load_game_state(self):
+    @timed_operation("load_game_state")
+    def load_game_state(self, player_id=None, slot=None):
         """
-        Retrieves the saved game state document.
+        Retrieves the saved game state document, migrated to the current
+        save schema (see save_schema.py).
+
+        Args:
+            player_id (str, optional): Defaults to config.DEFAULT_PLAYER_ID.
+            slot (int, optional): Defaults to config.DEFAULT_SAVE_SLOT.
         """
         if self.db is not None:
             try:
+                self._ensure_save_indexes()
                 saves_collection = self.db["saves"]
-                save_id = "player_1_save"
-                return saves_collection.find_one({"save_id": save_id})
+                save_key = _save_key(player_id, slot)
+                save_document = saves_collection.find_one(save_key)
+                if save_document is not None:
+                    self.last_save_key = save_key
+                    # Older saves are converted to the current schema on load
+                    save_document = save_schema.migrate(save_document)
+                return save_document
             except pymongo.errors.PyMongoError as e:
                 print(f"Error loading game: {e}")
         return None
 
-    def save_exists(self):
-        """Checks if a save file currently exists."""
-        return self.load_game_state() is not None
+    def save_exists(self, player_id=None, slot=None):
+        """
+        Checks if a save file currently exists.
+        Uses an index-only count (limit 1) instead of fetching the whole document.
+        """
+        if self.db is not None:
+            try:
+                self._ensure_save_indexes()
+                return self.db["saves"].count_documents(_save_key(player_id, slot), limit=1) > 0
+            except pymongo.errors.PyMongoError as e:
+                print(f"Error checking for a save: {e}")
+        return False
 
-    def delete_save(self):
+    def list_saves(self, player_id=None, page=0, page_size=10):
+        """
+        Lists a player's saves, one page at a time, without loading the game state.
+
+        Args:
+            player_id (str, optional): Defaults to config.DEFAULT_PLAYER_ID.
+            page (int): Zero-based page number.
+            page_size (int): Number of saves per page.
+
+        Returns:
+            list: Metadata dictionaries (slot, updated_at, schema_version), sorted by slot.
+        """
+        if self.db is not None:
+            try:
+                self._ensure_save_indexes()
+                cursor = self.db["saves"].find(
+                    {"player_id": player_id or config.DEFAULT_PLAYER_ID},
+                    SAVE_METADATA_PROJECTION
+                ).sort("slot", pymongo.ASCENDING).skip(page * page_size).limit(page_size)
+                return list(cursor)
+            except pymongo.errors.PyMongoError as e:
+                print(f"Error listing saves: {e}")
+        return []
+
+    @timed_operation("delete_save")
+    def delete_save(self, player_id=None, slot=None):
         """
         Deletes the current save file.
         Used when starting a new game to ensure a clean state.
         """
         if self.db is not None:
             try:
+                self._ensure_save_indexes()
                 saves_collection = self.db["saves"]
-                save_id = "player_1_save"
 
-                # Delete the document with the matching ID
-                result = saves_collection.delete_one({"save_id": save_id})
+                # Delete the document with the matching key
+                result = saves_collection.delete_one(_save_key(player_id, slot))
 
-                if result.deleted_count > 0:
-                    print("Previous save file deleted.")
-                    return True
-                else:
-                    print("No save file found to delete.")
-                    return False
+                return result.deleted_count > 0
 
             except pymongo.errors.PyMongoError as e:
                 print(f"Error deleting save: {e}")
-        return False
\ No newline at end of file
+        return False
+
+    # --- Map Pool (pre-generated layouts, see map_pool.py) ---
+
+    def push_pool_layouts(self, layouts):
+        """
+        Adds pre-generated layouts to the 'map_pool' collection.
+
+        Args:
+            layouts (list): Layout documents (catalog_version, seed, exits, stats).
+        """
+        if self.db is not None and layouts:
+            try:
+                self.db["map_pool"].insert_many(layouts, ordered=False)
+                return True
+            except pymongo.errors.PyMongoError as e:
+                print(f"Error storing map layouts: {e}")
+        return False
+
+    def pop_pool_layout(self, catalog_version):
+        """
+        Atomically takes one layout built for the given catalog version out of the pool.
+
+        Returns:
+            dict: The layout document, or None if the pool is empty (or on error).
+        """
+        if self.db is not None:
+            try:
+                return self.db["map_pool"].find_one_and_delete({"catalog_version": catalog_version})
+            except pymongo.errors.PyMongoError as e:
+                print(f"Error taking a map layout: {e}")
+        return None
+
+    def count_pool_layouts(self, catalog_version):
+        """Returns how many layouts for the given catalog version are waiting in the pool."""
+        if self.db is not None:
+            try:
+                return self.db["map_pool"].count_documents({"catalog_version": catalog_version})
+            except pymongo.errors.PyMongoError as e:
+                print(f"Error counting map layouts: {e}")
+        return 0
+
+    def prune_pool_layouts(self, catalog_version):
+        """Deletes pooled layouts that were built for an older room catalog."""
+        if self.db is not None:
+            try:
+                self.db["map_pool"].delete_many({"catalog_version": {"$ne": catalog_version}})
+            except pymongo.errors.PyMongoError as e:
+                print(f"Error pruning map layouts: {e}")
@@ -0,0 +1,124 @@
+"""
+Holds the single, process-wide MongoDB client.
+Every component (MainGame, GameMap, DatabaseManager...) gets its database
+handle from here, so a game session only ever opens one connection pool.
+"""
+
+import atexit
+import threading
+import pymongo
+from pymongo import monitoring
+import config
+from metrics import MONGO_COMMAND_SECONDS, MONGO_COMMAND_FAILURES, current_operation
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Times every command the driver sends (pymongo command monitoring) and
+    labels it with the storage operation that sent it (see metrics.py).
+    The driver calls it on the thread that ran the command, so it stays cheap.
+    """
+
+    def started(self, event):
+        pass  # The driver measures the duration itself
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, current_operation() or "other",
+                                      event.command_name)
+
+    def failed(self, event):
+        operation = current_operation() or "other"
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, operation, event.command_name)
+        MONGO_COMMAND_FAILURES.increment(operation, event.command_name)
+
+
+class ClientRegistry:
+    """
+    A lazily-initialised, reference-counted holder for one pymongo.MongoClient.
+
+    The client is only created the first time a component asks for it, and it
+    is closed when the last component that acquired it releases it.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._users = 0  # Number of components currently holding the client
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Returns the shared client, creating it on first use.
+        Every call to acquire() should be matched by a call to release().
+
+        Returns:
+            pymongo.MongoClient: The shared client.
+        """
+        with self._lock:
+            if self._client is None:
+                # MongoClient connects in the background, so this does not block.
+                self._client = pymongo.MongoClient(
+                    config.MONGO_URI,
+                    maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+                    serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    socketTimeoutMS=config.MONGO_SOCKET_TIMEOUT_MS,
+                    event_listeners=[CommandMetricsListener()],
+                )
+            self._users += 1
+            return self._client
+
+    def get_database(self, db_name=None):
+        """
+        Acquires the shared client and returns a database handle from it.
+
+        Args:
+            db_name (str, optional): Database to open. Defaults to config.DB_NAME.
+        """
+        return self.acquire()[db_name or config.DB_NAME]
+
+    def ping(self):
+        """
+        Health check: asks the server to respond to a 'ping' command.
+
+        Returns:
+            bool: True if the server answered, False otherwise (or if no client exists yet).
+        """
+        client = self._client
+        if client is None:
+            return False
+        try:
+            client.admin.command("ping")
+            return True
+        except pymongo.errors.PyMongoError:
+            return False
+
+    def release(self):
+        """
+        Releases one hold on the client. The pool is closed once nobody uses it.
+
+        Returns:
+            bool: True if this call actually closed the client.
+        """
+        with self._lock:
+            if self._client is None:
+                return False
+            self._users = max(self._users - 1, 0)
+            if self._users == 0:
+                self._client.close()
+                self._client = None
+                return True
+            return False
+
+    def shutdown(self):
+        """Closes the client immediately, regardless of how many components hold it."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            self._users = 0
+
+
+# The one registry shared by the whole process
+registry = ClientRegistry()
+
+# Make sure the pool is closed cleanly even if a component forgets to release it
+atexit.register(registry.shutdown)
@@ -3,285 +3,444 @@ Manages all Room objects and the static map structure.
 """
 
 import random
+import time
+import config
 from room import Room
-from database_manager import DatabaseManager
+from compact_map import CompactMap
+from storage import open_storage
+from room_catalog import RoomCatalog
+from map_generator import MapGenerator, layout_to_exits, ALL_DIRECTIONS, NUM_DIRECTIONS, NO_EXIT
+from save_schema import pack_exits, unpack_exits, pack_item_flags, unpack_item_flags, ITEM_WORD_BITS
+from graph_analysis import MapGraph
+from metrics import record_map_build
+from path_index import PathIndex
+from route_solver import solve_route
 
 class GameMap:
-    def __init__(self):
+    # --- Generation Rules ---
+    START_ROOM = 'Bedroom'  # Where the player starts
+    BOSS_ROOM = 'Arcane Dungeon'  # Entering this room ends the game
+    REQUIRED_ITEMS = frozenset({'Cloak', 'Potion', 'Robes', 'Shield', 'Staff', 'Stew'})  # Needed to win
+    FIXED_LINKS = [('Bedroom', 'WEST', 'Closet')]  # Doors that are always built
+    NO_BRANCH_ROOMS = {'Closet'}  # Personal choice: nothing else branches from the Closet
+    NUM_EXTRA_LOOPS = 3  # Extra doors added to make the map more interesting
+    MAX_LOOP_ATTEMPTS = 30  # Retry budget for adding those extra doors
+    MAX_LAYOUT_ATTEMPTS = 5  # Safety limit if a layout ever fails validation
+
+    def __init__(self, db_manager=None, layout=None, seed=None):
         """
         Initializes the GameMap by loading and instantiating all Room objects.
+
+        Args:
+            db_manager (StorageBackend, optional): The storage to read rooms through (see storage.py).
+                Pass the game's existing manager so both share one connection;
+                a new one is created only if none is given.
+            layout (dict, optional): A ready-made layout (e.g. from the map pool,
+                see map_pool.py) to use instead of generating a new one.
+            seed (int, optional): Seed for the map generator, so the same seed always
+                gives the same map (used to replay scripted sessions, see headless.py).
         """
         self.rooms = {}
-        self.start_room_name = 'Bedroom'
+        self.start_room_name = self.START_ROOM
+        self.generation_stats = {}  # Attempt counters for the most recent map
+        self.rng = random.Random(seed) if seed is not None else None  # None = unseeded
+        self.layout_version = 0  # Goes up every time the rooms are rebuilt (lets renderer.py cache per-room text)
+
+        # 'objects' keeps one Room object per room; 'compact' keeps the map in arrays (compact_map.py)
+        self.map_store = config.MAP_STORE
+        self.compact = None
+
+        # --- Delta Save Tracking ---
+        self.dirty_rooms = set()  # Names of Room objects changed since the last save
+        self.persisted = False  # True once this exact layout has been fully written to the save
+        self._room_positions = None  # Room name -> index in the saved layout (built on demand)
+        self._room_list = None  # Rooms in saved layout order (built with _room_positions)
+        self._saved_exits = None  # (room names, packed exits) for save documents, built once per layout
+        self._saved_exits_version = None
+
+        # Shortest-path index for HINT/WHERE, built on first use (see path_index.py)
+        self._path_index = None
+        self._path_index_version = None
 
-        self.db = DatabaseManager() # Initialize Database Manager
+        # Optimal route (par) for the current layout, solved on first use (see route_solver.py)
+        self._par_route = None
+        self._par_route_version = None
 
-        self.generate_map()  # Calls method to create random dungeon layout
+        self.db = db_manager or open_storage() # Initialize the configured storage backend
+        self.catalog = RoomCatalog(self.db)  # Cached room content (see room_catalog.py)
 
-    def generate_map(self):
+        self.generate_map(layout)  # Calls method to create random dungeon layout
+
+    def generate_map(self, layout=None):
         """
         Generates a new random map using a modified Prim's Algorithm.
         This method creates all room objects, hardcodes the Bedroom/Closet
         link, and then randomly connects the rest, ensuring all item
         rooms are reachable without *having* to go through the Arcane Dungeon room (which ends the game).
-        """
-
-        # --- Create all Room objects from Database ---
-
-        # List of room names to fetch from the DB
-        target_rooms = [
-            'Bedroom', 'Great Hall', 'Closet', 'Armory',
-            'Magic Sanctum', 'Apothecary', 'Mage Tower', 'Arcane Dungeon'
-        ]
-
-        for name in target_rooms:
-            # Query the database for this room's data
-            room_data = self.db.get_room_data(name)
-
-            if room_data:
-                # Extract data from the MongoDB document
-                desc_with_item = room_data['desc_with_item']
-                desc_no_item = room_data['desc_no_item']
-                item_name = room_data['item']
-
-                # Create the Room object (exits are empty for now)
-                self.rooms[name] = Room(
-                    name=name,
-                    desc_with_item=desc_with_item,
-                    desc_no_item=desc_no_item,
-                    exits={},
-                    item_name=item_name
-                )
-            else:
-                print(f"ERROR: Could not load room '{name}' from database.")
-
-
-        # ----- Apply Generation Rules & Prep Algorithm -----
-
-        # Hardcode the link between Bedroom and Closet
-        self.rooms['Bedroom'].exits['WEST'] = 'Closet'
-        self.rooms['Closet'].exits['EAST'] = 'Bedroom'
-
-        # Prep for Prim's Algorithm
-        # The "Forest" (rooms already connected) starts with our required rooms.
-        forest = {'Bedroom', 'Closet'}
-
-        # The "Wall" (potential connections) starts with all rooms *except*
-        # the ones already in the forest and the boss room.
-        unconnected_rooms = [
-            'Great Hall', 'Armory', 'Magic Sanctum',
-            'Apothecary', 'Mage Tower'
-        ]
-
-        # Shuffle the list to ensure a random map layout
-        random.shuffle(unconnected_rooms)
-
-
-        # ----- Connect all 5 item rooms to the forest -----
-
-        # Helper map for finding the opposite direction
-        opposite_direction = {
-            'NORTH': 'SOUTH',
-            'SOUTH': 'NORTH',
-            'EAST': 'WEST',
-            'WEST': 'EAST'
-        }
 
-        # All possible directions to try
-        all_directions = ['NORTH', 'EAST', 'SOUTH', 'WEST']
+        The layout is built so that it is valid by construction (see map_generator.py);
+        the BFS check is only a safety net, and rebuilding the layout never
+        touches the database again.
 
-        # Loop through each unconnected room and attach it to the 'forest'
-        for room_name in unconnected_rooms:
-
-            # Get the Room object for the new room we are adding
-            new_room = self.rooms[room_name]
-
-            # Find a valid connection point
-            connected = False
-            while not connected:
-
-                # Get a list of all rooms we can build from.
-                # This is all rooms in the forest *except* the 'Closet'.
-                # (This was a personal choice not to have a second room branching from the closet)
-                valid_anchor_rooms = [room_name for room_name in forest if room_name != 'Closet']
+        Args:
+            layout (dict, optional): A pre-generated layout ({'exits': [...], 'stats': {...}})
+                built for the current room catalog. If it is missing or doesn't
+                fit the catalog, a new layout is generated.
+        """
 
-                # Pick a random room from the valid list to connect to
-                current_forest_room_name = random.choice(valid_anchor_rooms)
-                current_forest_room = self.rooms[current_forest_room_name]
+        start = time.perf_counter()
 
-                # Pick a random direction to try and build a door
-                random.shuffle(all_directions)
-                for direction in all_directions:
-                    # Check if the potential exit is already taken
-                    if direction not in current_forest_room.exits:
-                        # --- Valid Exit Found ---
-                        # Add exit from the forest room to the new room
-                        current_forest_room.exits[direction] = new_room.name
+        # --- Load the rooms from the Database ---
 
-                        # Add the opposite exit from the new room back to the forest
-                        opposite = opposite_direction[direction]
-                        new_room.exits[opposite] = current_forest_room.name
+        # The room set is data-driven: every room in the catalog (the content pack)
+        # goes on the map. After the first game this is served from memory.
+        rooms_data = self.catalog.get_all_rooms()
+        room_names = list(rooms_data)
 
-                        # Add the new room to the forest so it can be built upon
-                        forest.add(new_room.name)
+        for name in (self.start_room_name, self.BOSS_ROOM):
+            if name not in rooms_data:
+                raise RuntimeError(f"ERROR: Could not load room '{name}' from database.")
 
-                        # Mark as connected and break the inner loops
-                        connected = True
-                        break
 
-                # If we failed (e.g., picked a forest room with 4 full exits),
-                # the 'while not connected' loop will try again with a new random forest room.
+        # ----- Build the Layout -----
 
+        if layout is not None and len(layout['exits']) == len(room_names) * NUM_DIRECTIONS:
+            # Pre-generated (and already validated) layout: nothing left to do
+            exits = layout['exits']
+            stats = dict(layout.get('stats', {}), pooled=True)
+            source = 'pooled'
+        else:
+            exits, stats = self.create_layout(room_names, self.rng)
+            source = 'generated'
 
-        # ----- Connect the Boss Room ('Arcane Dungeon') -----
+        # --- Create the rooms from the finished layout ---
 
-        boss_room = self.rooms['Arcane Dungeon']
-        connected = False
-        while not connected:
-            # Get a list of all rooms we can build from (all rooms excluding closet)
-            valid_anchor_rooms = [r_name for r_name in forest if r_name != 'Closet']
+        if self.map_store == 'compact':
+            # Arrays over the shared catalog instead of one object per room
+            names, docs, ids = self.catalog.get_room_index()
+            self._build_rooms(names, docs, exits, ids=ids)
+        else:
+            self._build_rooms(room_names, list(rooms_data.values()), exits)
 
-            # Pick a random valid room to connect the boss room to
-            anchor_room_name = random.choice(valid_anchor_rooms)
-            anchor_room = self.rooms[anchor_room_name]
+        # A brand-new map has never been saved, so its first save must be a full write
+        self._reset_change_tracking(persisted=False)
 
-            # Pick a random direction
-            random.shuffle(all_directions)
-            for direction in all_directions:
-                # Check if the exit is free
-                if direction not in anchor_room.exits:
-                    # --- Valid Exit Found ---
-                    # Add exit from the anchor room to the boss room
-                    anchor_room.exits[direction] = boss_room.name
+        # Record how much work this map took
+        self.generation_stats = stats
+        record_map_build(source, stats, time.perf_counter() - start)
 
-                    # Add the opposite exit from the boss room back
-                    opposite = opposite_direction[direction]
-                    boss_room.exits[opposite] = anchor_room.name
+    @classmethod
+    def create_layout(cls, room_names, rng=None):
+        """
+        Builds and validates a new layout for the given rooms.
+        This needs no database or GameMap instance, so map_pool.py can call it
+        from worker processes.
 
-                    # Add boss room to the forest
-                    forest.add(boss_room.name)
-                    connected = True
-                    break
+        Args:
+            room_names (list): Every room to place on the map (catalog order).
+            rng (random.Random, optional): Source of randomness (seed it for repeatable maps).
 
-            # If we fail, the loop repeats until it finds a free slot.
+        Returns:
+            tuple: (flat exits list, dictionary of attempt counters)
+        """
+        room_set = set(room_names)
+
+        # The generator applies our rules: Bedroom/Closet are hardcoded together,
+        # nothing else branches from the Closet, the Arcane Dungeon is added last,
+        # and then a few extra random loops are added.
+        generator = MapGenerator(
+            start_room=cls.START_ROOM,
+            boss_room=cls.BOSS_ROOM,
+            fixed_links=[link for link in cls.FIXED_LINKS
+                         if link[0] in room_set and link[2] in room_set],
+            no_branch_rooms=cls.NO_BRANCH_ROOMS,
+            num_extra_loops=cls.NUM_EXTRA_LOOPS,
+            max_loop_attempts=cls.MAX_LOOP_ATTEMPTS,
+            rng=rng
+        )
+
+        # Bounded loop instead of recursion: a failed check only rebuilds the exits
+        for attempt in range(1, cls.MAX_LAYOUT_ATTEMPTS + 1):
+            exits = generator.generate(room_names)
+            if cls.is_layout_valid(room_names, exits):
+                return exits, dict(generator.stats, layout_attempts=attempt)
+
+        raise RuntimeError(f"Could not generate a valid map in {cls.MAX_LAYOUT_ATTEMPTS} attempts.")
+
+    @classmethod
+    def is_layout_valid(cls, room_names, exits):
+        """
+        BFS Validation.
+        Checks that every room is reachable from the start
+        without *having* to pass through the 'Arcane Dungeon'.
+        This runs on the raw layout, so a bad layout is rejected before
+        any rooms are built from it.
 
+        Args:
+            room_names (list): The room list the layout was generated for.
+            exits (list): The flat exits list built by MapGenerator.
 
-        # ----- Add Extra Random Loops -----
+        Returns:
+            bool: True if every required room was reached.
+        """
+        start_id = room_names.index(cls.START_ROOM)
+        boss_id = room_names.index(cls.BOSS_ROOM)
 
-        # To make the map more interesting, we add a few extra doors (loops).
-        num_extra_loops = 3
-        for _ in range(num_extra_loops):
+        # IMPORTANT: The boss room is avoided, so the search never "crosses" it.
+        graph = MapGraph(len(room_names), exits)
+        return graph.reaches_all(start_id, avoid={boss_id})
 
-            # Pick two random, different rooms from the forest excluding closet
-            valid_rooms = [r_name for r_name in self.rooms.keys() if r_name != 'Closet']
+    def _build_rooms(self, names, docs, exits, item_flags=None, ids=None):
+        """
+        Creates the map's rooms from a layout, using the configured store.
 
-            room1_name = random.choice(valid_rooms)
-            room2_name = random.choice(valid_rooms)
+        Args:
+            names (list): Room name for each room position.
+            docs (list): Room document (descriptions, item) for each room position.
+            exits (sequence): Flat exits list, 4 slots per room.
+            item_flags (list, optional): Whether each room still has its item (from a save).
+            ids (dict, optional): Prebuilt name -> position index (shared by the catalog).
+        """
+        self.layout_version += 1
 
-            # Ensure we didn't pick the same room twice
-            if room1_name == room2_name:
-                continue  # Skip this attempt
+        if self.map_store == 'compact':
+            if ids is None:
+                ids = {name: position for position, name in enumerate(names)}
+            self.compact = CompactMap(names, docs, ids, exits, item_flags)
+            self.rooms = self.compact.rooms
+            return
 
-            room1 = self.rooms[room1_name]
-            room2 = self.rooms[room2_name]
+        self.compact = None
+        self.rooms = {}
+        for position, (name, room_exits) in enumerate(layout_to_exits(names, exits).items()):
+            room_data = docs[position]
+            item_name = room_data['item']
+            if item_flags is not None and not item_flags[position]:
+                item_name = None  # The item was already collected
 
-            # Check if they are already connected
-            already_connected = False
-            for exit_name in room1.exits.values(): # Key = Direction | Value = Room Name
-                if exit_name == room2.name:
-                    already_connected = True
-                    break
+            self.rooms[name] = Room(
+                name=name,
+                desc_with_item=room_data['desc_with_item'],
+                desc_no_item=room_data['desc_no_item'],
+                exits=room_exits,
+                item_name=item_name
+            )
 
-            if already_connected:
-                continue  # Skip this attempt
+    def load_map_from_save(self, layout, fallback_rooms=None):
+        """
+        Reconstructs the map from saved data.
+        Overrides the current map state with the data from the save file.
+        Saves only hold the layout (see save_schema.py); descriptions and
+        item names are re-read from the room catalog.
 
-            # Find a free exit slot to connect them
-            random.shuffle(all_directions)
-            for direction in all_directions:
-                if direction not in room1.exits:
-                    # Found an available exit space on room1
-                    opposite = opposite_direction[direction]
+        Args:
+            layout (dict): The save's 'layout' (room names, packed exits, item flags).
+            fallback_rooms (dict, optional): Room content kept from an old-format
+                save, used only for rooms that are no longer in the catalog.
 
-                    if opposite not in room2.exits:
-                        # Found opposite available exit space on room2 as well
+        Returns:
+            bool: True if the loaded map already matches the save document
+                  (False for migrated saves, which need a full write on the next save).
+        """
+        names = layout['rooms']
+        exits = unpack_exits(layout['exits'])
+        item_flags = unpack_item_flags(layout['items'], len(names))
+
+        # Re-hydrate the content from the catalog (one bulk query, or the cache)
+        rooms_data = self.catalog.get_rooms(names)
+        docs = []
+        for name in names:
+            room_data = rooms_data.get(name)
+            if room_data is None:
+                room_data = (fallback_rooms or {}).get(name)
+            if room_data is None:
+                print(f"ERROR: Could not load room '{name}' from database.")
+                room_data = {'desc_with_item': '', 'desc_no_item': '', 'item': None}
+            docs.append(room_data)
 
-                        # Create the loop
-                        room1.exits[direction] = room2.name
-                        room2.exits[opposite] = room1.name
-                        break  # Done with this loop attempt
+        self._build_rooms(names, docs, exits, item_flags)
 
+        # The map now matches the save exactly, so later saves only need the changes
+        # (unless the save was in an old format and must be rewritten in full)
+        self._reset_change_tracking(persisted=fallback_rooms is None)
+        return self.persisted
 
-        # ----- BFS Validation -----
+    def to_layout(self):
+        """
+        Serializes the map's layout and item state for a save document (see save_schema.py).
 
-        # Validate the map to ensure all 6 item rooms are reachable
-        # from the start without *having* to passing through the 'Arcane Dungeon'.
+        Returns:
+            dict: {'rooms': [...], 'exits': bytes, 'items': [...]}
+        """
+        # Doors never change within a layout, so they are only packed once per layout:
+        # a full save (taken on the game's thread, see autosave.py) just copies the item flags
+        if self._saved_exits_version != self.layout_version:
+            names, exits = self.get_exits()
+            self._saved_exits = (list(names), pack_exits(exits))
+            self._saved_exits_version = self.layout_version
+        names, packed_exits = self._saved_exits
+
+        if self.compact is not None:
+            num_words = (len(names) + ITEM_WORD_BITS - 1) // ITEM_WORD_BITS
+            items = [self.compact.get_item_word(word) for word in range(num_words)]
+        else:
+            items = pack_item_flags([room.has_item for room in self.rooms.values()])
+
+        # The room list is shared by every save of this layout (saves never change it)
+        return {'rooms': names, 'exits': packed_exits, 'items': items}
+
+    def get_exits(self):
+        """
+        Returns the layout as room names and a flat exits list (4 slots per
+        room, NO_EXIT for no door), with rooms numbered by their saved position.
 
-        # List of all rooms we must be able to reach.
-        required_rooms = {
-            'Bedroom', 'Closet', 'Great Hall', 'Armory',
-            'Magic Sanctum', 'Apothecary', 'Mage Tower'
-        }
+        Returns:
+            tuple: (names, exits)
+        """
+        if self.compact is not None:
+            return self.compact.names, self.compact.exits
+
+        names = list(self.rooms)
+        positions = {name: position for position, name in enumerate(names)}
+        exits = [NO_EXIT] * (len(names) * NUM_DIRECTIONS)
+        for position, room in enumerate(self.rooms.values()):
+            for direction, neighbor_name in room.exits.items():
+                exits[position * NUM_DIRECTIONS + ALL_DIRECTIONS.index(direction)] = positions[neighbor_name]
+        return names, exits
+
+    def get_item_rooms(self):
+        """
+        Returns:
+            dict: room position -> item name, for every item not collected yet.
+        """
+        if self.compact is not None:
+            docs = self.compact.docs
+            return {room_id: docs[room_id]['item'] for room_id in range(len(docs))
+                    if self.compact.has_item(room_id)}
+        return {position: room.item_name for position, room in enumerate(self.rooms.values()) if room.has_item}
 
-        # Start BFS
-        queue = [self.rooms['Bedroom']]  # Start the queue with the starting room
-        visited = {'Bedroom'}  # Keep track of visited rooms
+    def get_path_index(self):
+        """
+        Returns the shortest-path index of the current layout (see path_index.py).
+        It is built on the first call and rebuilt only after the rooms change
+        (a new map or a loaded save); the boss room is never routed through.
+        """
+        if self._path_index is None or self._path_index_version != self.layout_version:
+            names, exits = self.get_exits()
+            self._path_index = PathIndex(
+                len(names), exits,
+                blocked=[self.get_room_position(self.BOSS_ROOM)],
+                start=self.get_room_position(self.start_room_name)
+            )
+            self._path_index_version = self.layout_version
+        return self._path_index
 
-        while queue:
-            current_room = queue.pop(0)  # Get the next room to check
+    def get_par_route(self):
+        """
+        Returns the optimal route of the current layout from the start room,
+        with every item still in place (see route_solver.py). Solved once per
+        layout and cached by fingerprint, so pooled or reloaded layouts that
+        were solved before cost nothing.
 
-            # Look at all its neighbors
-            for exit_name in current_room.exits.values():
+        Returns:
+            RouteSolution: par, pick-up order and rooms (as layout positions), or None if the map cannot be won.
+        """
+        if self._par_route_version != self.layout_version:
+            names, exits = self.get_exits()
+            rooms_data = self.catalog.get_all_rooms()
+            room_items = {position: rooms_data[name]['item'] for position, name in enumerate(names)
+                          if name in rooms_data and rooms_data[name].get('item')}
+            self._par_route = solve_route(
+                exits, room_items, self.REQUIRED_ITEMS,
+                start=self.get_room_position(self.start_room_name),
+                boss=self.get_room_position(self.BOSS_ROOM)
+            )
+            self._par_route_version = self.layout_version
+        return self._par_route
 
-                # IMPORTANT: If the neighbor is the boss room,
-                # do NOT add it to the queue. This prevents the
-                # search from "crossing" the boss room.
-                if exit_name == 'Arcane Dungeon':
-                    continue
+    def par_route_ready(self):
+        """True if get_par_route() has already solved the current layout (and so returns at once)."""
+        return self._par_route_version == self.layout_version
 
-                if exit_name not in visited:
-                    visited.add(exit_name)
-                    queue.append(self.rooms[exit_name])
+    def get_room_position(self, name):
+        """Returns the room's position in the saved layout (its index in layout['rooms'])."""
+        if self.compact is not None:
+            return self.compact.ids[name]
+        if self._room_positions is None:
+            self._room_list = list(self.rooms.values())
+            self._room_positions = {room_name: position for position, room_name in enumerate(self.rooms)}
+        return self._room_positions[name]
 
-        # After the BFS is done, check if we visited all required rooms
-        if not required_rooms.issubset(visited):
-            # The validation FAILED.
-            # We must scrap this map and generate a new one.
-            # We do this by simply calling the method again (recursion).
-            self.generate_map()
+    # --- Delta Save Support ---
 
-    def load_map_from_save(self, map_data):
+    def _reset_change_tracking(self, persisted):
         """
-        Reconstructs the map from saved data.
-        Overrides the current map state with the data from the save file.
+        Starts change tracking over after the rooms were rebuilt.
 
         Args:
-            map_data (list): A list of dictionaries, where each dictionary
-                             contains the data for one room (exits, items, etc.).
+            persisted (bool): True if the current rooms already match the saved game.
         """
-        # Clear the existing map
-        self.rooms = {}
-
-        # Iterate through the saved data
-        for room_dict in map_data:
-            name = room_dict['name']
-
-            # Recreate the Room object using the saved state
-            new_room = Room(
-                name=name,
-                desc_with_item=room_dict['desc_with_item'],
-                desc_no_item=room_dict['desc_no_item'],
-                exits=room_dict['exits'],  # Restore the specific connections
-                item_name=room_dict['item_name']  # Restore the item (or None if taken)
-            )
-
-            # Store it in the map
-            self.rooms[name] = new_room
+        self.persisted = persisted
+        self.dirty_rooms = set()
+        self._room_positions = None
+        if self.compact is None:
+            for room in self.rooms.values():
+                room.on_change = self._room_changed
+
+    def _room_changed(self, room):
+        """Callback from Room: remembers which rooms need to be written on the next save."""
+        self.dirty_rooms.add(room.name)
+
+    def get_changed_item_words(self):
+        """
+        Returns the entries of the saved item flags that changed since the last save.
 
-        print("Map layout and state restored from save file.")
+        Returns:
+            dict: index into layout['items'] -> its new integer value.
+        """
+        if self.compact is not None:
+            words = {room_id // ITEM_WORD_BITS for room_id in self.compact.dirty_rooms}
+            return {word: self.compact.get_item_word(word) for word in sorted(words)}
+
+        words = {self.get_room_position(name) // ITEM_WORD_BITS for name in self.dirty_rooms}
+        if not words:
+            return {}
+
+        changed = {}
+        for word in sorted(words):
+            rooms_in_word = self._room_list[word * ITEM_WORD_BITS:(word + 1) * ITEM_WORD_BITS]
+            changed[word] = pack_item_flags([room.has_item for room in rooms_in_word])[0]
+        return changed
+
+    def mark_clean(self):
+        """Called after a successful save: the saved game now matches the map."""
+        self.persisted = True
+        if self.compact is not None:
+            self.compact.dirty_rooms.clear()
+            return
+        for name in self.dirty_rooms:
+            self.rooms[name].mark_clean()
+        self.dirty_rooms.clear()
 
     def get_room(self, name):
         """
         Retrieves a Room object by its name.
-        This is the method called by Player.move() in its line 3.
         """
         return self.rooms.get(name)
+
+    def get_neighbor(self, room, direction):
+        """
+        Returns the room on the other side of the given door, or None if there is no door.
+        With the compact store this is a single array lookup instead of a lookup by name.
+
+        Args:
+            room (Room or RoomView): The room to look from.
+            direction (str): The direction of the door (e.g., 'NORTH').
+        """
+        if self.compact is not None:
+            return self.compact.get_neighbor(room.room_id, direction)
+
+        destination_room_name = room.exits.get(direction)
+        if destination_room_name is None:
+            return None
+        return self.rooms.get(destination_room_name)
@@ -0,0 +1,452 @@
+"""
+Monte Carlo analytics for the map generator. Generates a large number of
+layouts across a pool of worker processes (the same GameMap.create_layout()
+a game uses), measures each one, and writes summary tables and histograms,
+so generator rules such as NUM_EXTRA_LOOPS or "nothing branches from the
+Closet" can be tuned on numbers instead of by feel.
+
+Measured for every layout:
+* diameter:      the most moves between two rooms (the Arcane Dungeon can only end a walk)
+* par:           the fewest moves that win the game (see route_solver.py);
+                 with --par-every N only every Nth layout is solved, since this
+                 is by far the most expensive metric
+* boss_depth:    moves from the start room to the Arcane Dungeon
+* degree:        doors per room (counted once per room)
+* dead_ends:     rooms with a single door
+* loop_attempts, loops_added, layout_attempts: the generator's retry counters
+
+Each setting in a sweep is the cartesian product of the options, e.g.
+
+    python generator_analytics.py --layouts 1000000 --extra-loops 0,1,2,3,5 --closet-branch both
+
+Every metric is a small integer, so a worker never keeps per-layout values:
+it adds each one to a fixed histogram (a list of counts indexed by value)
+and returns only those counts for a whole chunk of layouts. The parent adds
+the chunks' histograms together element by element, and every figure in
+the report (mean, percentiles, max) is computed from the merged counts.
+The results depend only on --seed, not on the number of workers.
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import random
+import sys
+import time
+
+import config
+from build_database import ROOMS_DATA
+from game_map import GameMap
+from map_generator import NUM_DIRECTIONS, NO_EXIT
+from route_solver import par_from_distances
+
+DEFAULT_LAYOUTS = 100000  # Per setting
+DEFAULT_CHUNK_SIZE = 5000  # Layouts per worker task
+DEFAULT_OUT_DIR = "analytics"
+
+# Report order of the metrics (and of the rows in the output files)
+METRICS = ('diameter', 'par', 'boss_depth', 'degree', 'dead_ends',
+           'loop_attempts', 'loops_added', 'layout_attempts')
+
+HISTOGRAM_WIDTH = 50  # Characters in the longest bar of a text histogram
+
+
+class Tally:
+    """Histograms of every metric over a set of layouts (merged across workers)."""
+
+    def __init__(self):
+        self.histograms = {metric: [] for metric in METRICS}  # metric -> counts indexed by value
+        self.layouts = 0
+        self.unwinnable = 0  # Layouts with no par (never expected from a valid layout)
+        self.worker_seconds = 0.0  # Time spent generating and measuring, summed over workers
+
+    def add(self, metric, value, amount=1):
+        """Counts one value (or `amount` of them) for a metric."""
+        counts = self.histograms[metric]
+        if value >= len(counts):
+            counts.extend([0] * (value + 1 - len(counts)))
+        counts[value] += amount
+
+    def merge(self, other):
+        """Adds another tally's counts into this one."""
+        for metric, counts in other.histograms.items():
+            mine = self.histograms[metric]
+            if len(counts) > len(mine):
+                mine.extend([0] * (len(counts) - len(mine)))
+            for value, count in enumerate(counts):
+                mine[value] += count
+        self.layouts += other.layouts
+        self.unwinnable += other.unwinnable
+        self.worker_seconds += other.worker_seconds
+
+    def summary(self, metric):
+        """
+        Returns:
+            dict: count, mean, min, p50, p95, p99 and max of one metric (None values if it was never seen).
+        """
+        counts = self.histograms[metric]
+        total = sum(counts)
+        if not total:
+            return {'count': 0, 'mean': None, 'min': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+        present = [value for value, count in enumerate(counts) if count]
+        return {
+            'count': total,
+            'mean': sum(value * count for value, count in enumerate(counts)) / total,
+            'min': present[0],
+            'p50': _percentile(counts, total, 0.50),
+            'p95': _percentile(counts, total, 0.95),
+            'p99': _percentile(counts, total, 0.99),
+            'max': present[-1],
+        }
+
+
+def _percentile(counts, total, q):
+    """The value at rank q (nearest rank) of a histogram."""
+    rank = max(1, int(q * total + 0.999999))  # ceil without floating-point surprises at exact ranks
+    seen = 0
+    for value, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return value
+    return len(counts) - 1
+
+
+# --- Worker process side ---
+
+_worker_room_names = None  # Set once per worker process by _init_worker
+_worker_targets = None  # (room IDs holding a required item, the item bit of each)
+_worker_layout_classes = {}  # Setting index -> GameMap subclass with that setting's rules
+
+
+def _init_worker(room_names, targets, target_bits):
+    """Receives the rooms and item placement once per worker instead of once per task."""
+    global _worker_room_names, _worker_targets
+    _worker_room_names = room_names
+    _worker_targets = (targets, target_bits)
+
+
+def _layout_class(setting_index, overrides):
+    """
+    A GameMap subclass with the setting's generation rules, so layouts come
+    from the unchanged GameMap.create_layout().
+    """
+    layout_class = _worker_layout_classes.get(setting_index)
+    if layout_class is None:
+        layout_class = type('SweepMap', (GameMap,), overrides)
+        _worker_layout_classes[setting_index] = layout_class
+    return layout_class
+
+
+def _run_chunk(task):
+    """
+    Generates and measures one chunk of layouts in a worker process.
+
+    Args:
+        task (tuple): (setting index, GameMap overrides, seed, layouts, par every N layouts (0 for never)).
+
+    Returns:
+        tuple: (setting index, Tally)
+    """
+    setting_index, overrides, seed, count, par_every = task
+    layout_class = _layout_class(setting_index, overrides)
+    room_names = _worker_room_names
+    targets, target_bits = _worker_targets
+    num_rooms = len(room_names)
+    start = room_names.index(GameMap.START_ROOM)
+    boss = room_names.index(GameMap.BOSS_ROOM)
+
+    rng = random.Random(seed)
+    tally = Tally()
+    degrees = [0] * (NUM_DIRECTIONS + 1)  # Rooms per door count, added to the tally at the end
+    started = time.perf_counter()
+
+    for index in range(count):
+        exits, stats = layout_class.create_layout(room_names, rng)
+
+        # Doors of every room
+        neighbors = []
+        dead_ends = 0
+        for base in range(0, num_rooms * NUM_DIRECTIONS, NUM_DIRECTIONS):
+            doors = [room_id for room_id in exits[base:base + NUM_DIRECTIONS] if room_id != NO_EXIT]
+            neighbors.append(doors)
+            degrees[len(doors)] += 1
+            if len(doors) == 1:
+                dead_ends += 1
+
+        # BFS from every room but the boss room. The boss room gets a distance
+        # but is never walked through, as in a game (entering it ends the game).
+        dists = [None] * num_rooms
+        diameter = 0
+        for source in range(num_rooms):
+            if source == boss:
+                continue
+            dist = [-1] * num_rooms
+            dist[source] = 0
+            queue = [source]
+            for room_id in queue:  # The list grows while it is read: a BFS queue without pops
+                if room_id == boss:
+                    continue
+                next_dist = dist[room_id] + 1
+                for neighbor_id in neighbors[room_id]:
+                    if dist[neighbor_id] < 0:
+                        dist[neighbor_id] = next_dist
+                        queue.append(neighbor_id)
+            dists[source] = dist
+            if dist[queue[-1]] > diameter:
+                diameter = dist[queue[-1]]  # BFS reaches rooms in order of distance
+
+        start_dist = dists[start]
+        tally.add('diameter', diameter)
+        tally.add('boss_depth', start_dist[boss])
+        tally.add('dead_ends', dead_ends)
+        tally.add('loop_attempts', stats['loop_attempts'])
+        tally.add('loops_added', stats['loops_added'])
+        tally.add('layout_attempts', stats['layout_attempts'])
+
+        if par_every and index % par_every == 0:
+            target_dists = [dists[target] for target in targets]
+            found = par_from_distances(start_dist, target_dists, targets, target_bits,
+                                       [dist[boss] for dist in target_dists])
+            if found is None:
+                tally.unwinnable += 1
+            else:
+                tally.add('par', found[0])
+
+    for degree, rooms in enumerate(degrees):
+        if rooms:
+            tally.add('degree', degree, rooms)
+    tally.layouts = count
+    tally.worker_seconds = time.perf_counter() - started
+    return setting_index, tally
+
+
+# --- Running a sweep ---
+
+def build_rooms(filler_rooms=0):
+    """
+    The room list to generate maps for: the built-in rooms (ROOMS_DATA) plus
+    `filler_rooms` rooms without items, to study larger maps.
+
+    Returns:
+        tuple: (room names, target room IDs, item bit of each target)
+
+    Raises:
+        ValueError: If a required item is missing from the rooms.
+    """
+    room_names = [room['name'] for room in ROOMS_DATA] + [f"Filler Room {n}" for n in range(1, filler_rooms + 1)]
+    item_bits = {item: 1 << position for position, item in enumerate(sorted(GameMap.REQUIRED_ITEMS))}
+    targets, target_bits = [], []
+    for room_id, room in enumerate(ROOMS_DATA):
+        if room['item'] in item_bits and room['name'] != GameMap.BOSS_ROOM:
+            targets.append(room_id)
+            target_bits.append(item_bits[room['item']])
+
+    missing = set(item_bits) - {room['item'] for room in ROOMS_DATA}
+    if missing:
+        raise ValueError(f"No room holds the required items: {', '.join(sorted(missing))}")
+    return room_names, targets, target_bits
+
+
+def build_settings(extra_loops, max_loop_attempts, closet_branch):
+    """
+    The cartesian product of the sweep options.
+
+    Args:
+        extra_loops (list): NUM_EXTRA_LOOPS values.
+        max_loop_attempts (list): MAX_LOOP_ATTEMPTS values.
+        closet_branch (list): False keeps the "nothing branches from the Closet" rule, True drops it.
+
+    Returns:
+        list: (label dict, GameMap overrides dict) per setting.
+    """
+    settings = []
+    for loops, attempts, branch in itertools.product(extra_loops, max_loop_attempts, closet_branch):
+        label = {'extra_loops': loops, 'max_loop_attempts': attempts, 'closet_branch': 'yes' if branch else 'no'}
+        overrides = {
+            'NUM_EXTRA_LOOPS': loops,
+            'MAX_LOOP_ATTEMPTS': attempts,
+            'NO_BRANCH_ROOMS': set() if branch else set(GameMap.NO_BRANCH_ROOMS),
+        }
+        settings.append((label, overrides))
+    return settings
+
+
+def run_sweep(settings, layouts, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, seed=0, filler_rooms=0,
+              par_every=1, progress=None):
+    """
+    Generates and measures `layouts` layouts for every setting.
+
+    Args:
+        settings (list): From build_settings().
+        layouts (int): Layouts per setting.
+        workers (int, optional): Worker processes. Defaults to config.MAP_POOL_WORKERS (one per core).
+        chunk_size (int): Layouts per worker task (bigger chunks mean less inter-process traffic).
+        seed (int): Base seed; each chunk gets its own seed derived from it.
+        filler_rooms (int): Item-less rooms added to the built-in ones.
+        par_every (int): Solve the par of every Nth layout (1 for all, 0 for none).
+            Par costs about twice as much as generating and measuring the layout.
+        progress (callable, optional): Called with (layouts done, layouts in total) after each chunk.
+
+    Returns:
+        tuple: (list of Tally, one per setting, in order; wall-clock seconds)
+    """
+    room_names, targets, target_bits = build_rooms(filler_rooms)
+    tasks = []
+    for setting_index, (_, overrides) in enumerate(settings):
+        for chunk_index, first in enumerate(range(0, layouts, chunk_size)):
+            # A string seed is hashed by random.Random, so every chunk gets an unrelated stream
+            tasks.append((setting_index, overrides, f"{seed}:{setting_index}:{chunk_index}",
+                          min(chunk_size, layouts - first), par_every))
+
+    tallies = [Tally() for _ in settings]
+    total = layouts * len(settings)
+    done = 0
+    started = time.perf_counter()
+
+    # Imported here: multiprocessing is slow to import, and only a sweep needs it
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=workers or config.MAP_POOL_WORKERS, initializer=_init_worker,
+                             initargs=(room_names, targets, target_bits)) as executor:
+        futures = [executor.submit(_run_chunk, task) for task in tasks]
+        for future in as_completed(futures):
+            setting_index, tally = future.result()
+            tallies[setting_index].merge(tally)
+            done += tally.layouts
+            if progress is not None:
+                progress(done, total)
+
+    return tallies, time.perf_counter() - started
+
+
+# --- Reports ---
+
+def format_summary(settings, tallies, elapsed):
+    """Renders one table per setting: the summary of every metric, and the generation rate."""
+    lines = []
+    total = sum(tally.layouts for tally in tallies)
+    worker_seconds = sum(tally.worker_seconds for tally in tallies)
+    lines.append(f"{total} layouts in {elapsed:.1f}s ({total / elapsed:,.0f} layouts/s overall, "
+                 f"{total / worker_seconds:,.0f} layouts/s per worker)" if elapsed and worker_seconds else
+                 f"{total} layouts")
+
+    for (label, _), tally in zip(settings, tallies):
+        lines.append("")
+        lines.append(", ".join(f"{key}={value}" for key, value in label.items())
+                     + f": {tally.layouts} layouts" + (f", {tally.unwinnable} unwinnable" if tally.unwinnable else ""))
+        lines.append(f"  {'metric':<16}{'mean':>8}{'min':>6}{'p50':>6}{'p95':>6}{'p99':>6}{'max':>6}")
+        for metric in METRICS:
+            stats = tally.summary(metric)
+            if not stats['count']:
+                continue
+            lines.append(f"  {metric:<16}{stats['mean']:>8.2f}{stats['min']:>6}{stats['p50']:>6}"
+                         f"{stats['p95']:>6}{stats['p99']:>6}{stats['max']:>6}")
+    return "\n".join(lines)
+
+
+def format_histograms(settings, tallies):
+    """Renders every histogram as text bars (one bar per value)."""
+    lines = []
+    for (label, _), tally in zip(settings, tallies):
+        title = ", ".join(f"{key}={value}" for key, value in label.items())
+        for metric in METRICS:
+            counts = tally.histograms[metric]
+            total = sum(counts)
+            if not total:
+                continue
+            lines.append(f"== {metric} ({title}) ==")
+            tallest = max(counts)
+            first = next(value for value, count in enumerate(counts) if count)
+            for value in range(first, len(counts)):
+                count = counts[value]
+                bar = "#" * round(count / tallest * HISTOGRAM_WIDTH)
+                lines.append(f"{value:>5} {count / total:>7.2%} {bar}")
+            lines.append("")
+    return "\n".join(lines)
+
+
+def write_reports(out_dir, settings, tallies, elapsed):
+    """
+    Writes the reports to out_dir:
+
+        summary.csv     one row per setting and metric (mean, min, p50, p95, p99, max)
+        histograms.csv  one row per setting, metric and value (count)
+        report.txt      the summary tables and text histograms
+
+    Returns:
+        list: The paths written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    label_keys = list(settings[0][0]) if settings else []
+
+    summary_path = os.path.join(out_dir, "summary.csv")
+    with open(summary_path, "w", encoding="utf-8", newline="") as summary_file:
+        writer = csv.writer(summary_file)
+        writer.writerow(label_keys + ['layouts', 'unwinnable', 'metric', 'count', 'mean', 'min', 'p50', 'p95', 'p99', 'max'])
+        for (label, _), tally in zip(settings, tallies):
+            for metric in METRICS:
+                stats = tally.summary(metric)
+                if not stats['count']:
+                    continue
+                writer.writerow([label[key] for key in label_keys] + [tally.layouts, tally.unwinnable, metric]
+                                + [stats['count'], round(stats['mean'], 4)]
+                                + [stats[key] for key in ('min', 'p50', 'p95', 'p99', 'max')])
+
+    histograms_path = os.path.join(out_dir, "histograms.csv")
+    with open(histograms_path, "w", encoding="utf-8", newline="") as histograms_file:
+        writer = csv.writer(histograms_file)
+        writer.writerow(label_keys + ['metric', 'value', 'count'])
+        for (label, _), tally in zip(settings, tallies):
+            for metric in METRICS:
+                for value, count in enumerate(tally.histograms[metric]):
+                    if count:
+                        writer.writerow([label[key] for key in label_keys] + [metric, value, count])
+
+    report_path = os.path.join(out_dir, "report.txt")
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        report_file.write(format_summary(settings, tallies, elapsed) + "\n\n")
+        report_file.write(format_histograms(settings, tallies))
+
+    return [summary_path, histograms_path, report_path]
+
+
+def _int_list(text):
+    """Parses a comma-separated list of integers (an argparse type)."""
+    try:
+        return [int(part) for part in text.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated integers, not {text!r}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the map generator over many random layouts")
+    parser.add_argument("--layouts", type=int, default=DEFAULT_LAYOUTS, help="Layouts per setting")
+    parser.add_argument("--extra-loops", type=_int_list, default=[GameMap.NUM_EXTRA_LOOPS],
+                        help="NUM_EXTRA_LOOPS values to sweep, e.g. 0,1,2,3")
+    parser.add_argument("--max-loop-attempts", type=_int_list, default=[GameMap.MAX_LOOP_ATTEMPTS],
+                        help="MAX_LOOP_ATTEMPTS values to sweep")
+    parser.add_argument("--closet-branch", choices=("no", "yes", "both"), default="no",
+                        help="Allow doors from the Closet besides its fixed one (both sweeps the two)")
+    parser.add_argument("--filler-rooms", type=int, default=0, help="Item-less rooms added to the built-in ones")
+    parser.add_argument("--par-every", type=int, default=1,
+                        help="Solve par for every Nth layout only (0 skips par; the rest is still measured)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Layouts per worker task")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed (same seed, same results)")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="Directory for the reports")
+    args = parser.parse_args()
+
+    closet_branch = {"no": [False], "yes": [True], "both": [False, True]}[args.closet_branch]
+    settings = build_settings(args.extra_loops, args.max_loop_attempts, closet_branch)
+
+    def show_progress(done, total):
+        print(f"\r{done}/{total} layouts", end="", file=sys.stderr, flush=True)
+
+    tallies, elapsed = run_sweep(settings, args.layouts, workers=args.workers, chunk_size=args.chunk_size,
+                                 seed=args.seed, filler_rooms=args.filler_rooms, par_every=args.par_every,
+                                 progress=show_progress)
+    print(file=sys.stderr)
+    print(format_summary(settings, tallies, elapsed))
+    paths = write_reports(args.out, settings, tallies, elapsed)
+    print(f"\nWrote {', '.join(paths)}.")
@@ -0,0 +1,154 @@
+"""
+Graph analysis over a generated map layout.
+The map is converted once into CSR form (compressed sparse rows: one offsets
+array plus one flat neighbours array), and every query below then runs in
+linear time, so it stays usable on million-room maps.
+"""
+
+from array import array
+from map_generator import NUM_DIRECTIONS, NO_EXIT
+
+
+class MapGraph:
+    """
+    An undirected graph of rooms (integer IDs) and doors, stored in CSR form.
+    The neighbours of room v are indices[indptr[v]:indptr[v + 1]].
+    """
+
+    def __init__(self, num_rooms, exits):
+        """
+        Builds the CSR arrays from a flat exits list.
+
+        Args:
+            num_rooms (int): Number of rooms on the map.
+            exits (sequence): Flat exits list, 4 slots per room, NO_EXIT for no door
+                              (the format produced by MapGenerator.generate()).
+        """
+        self.num_rooms = num_rooms
+
+        indptr = array('i', [0]) * (num_rooms + 1)
+        indices = array('i')
+        for room_id in range(num_rooms):
+            base = room_id * NUM_DIRECTIONS
+            for neighbor_id in exits[base:base + NUM_DIRECTIONS]:
+                if neighbor_id != NO_EXIT:
+                    indices.append(neighbor_id)
+            indptr[room_id + 1] = len(indices)
+
+        self.indptr = indptr
+        self.indices = indices
+
+    def neighbors(self, room_id):
+        """Returns the IDs of the rooms sharing a door with room_id."""
+        return self.indices[self.indptr[room_id]:self.indptr[room_id + 1]]
+
+    # --- Reachability ---
+
+    def bfs(self, source, avoid=()):
+        """
+        Breadth-first search from source that never enters the rooms in avoid.
+
+        Args:
+            source (int): The room to start from.
+            avoid (iterable): Room IDs the search may not pass through (or end in).
+
+        Returns:
+            list: distance (number of moves) from source for every room, or -1 if unreachable.
+        """
+        dist = [-1] * self.num_rooms
+        blocked = set(avoid)
+        if source in blocked:
+            return dist
+
+        indptr, indices = self.indptr, self.indices
+        dist[source] = 0
+        queue = [source]
+        head = 0  # Read position; the queue is never popped from the front
+        while head < len(queue):
+            room_id = queue[head]
+            head += 1
+            next_dist = dist[room_id] + 1
+            for neighbor_id in indices[indptr[room_id]:indptr[room_id + 1]]:
+                if dist[neighbor_id] == -1 and neighbor_id not in blocked:
+                    dist[neighbor_id] = next_dist
+                    queue.append(neighbor_id)
+        return dist
+
+    def reachable_count(self, source, avoid=()):
+        """Returns how many rooms (including source) can be reached from source while avoiding avoid."""
+        return sum(1 for d in self.bfs(source, avoid) if d != -1)
+
+    def reaches_all(self, source, avoid=()):
+        """
+        Checks that every room outside avoid is reachable from source without
+        passing through any room in avoid.
+        """
+        blocked = set(avoid)
+        return self.reachable_count(source, blocked) == self.num_rooms - len(blocked)
+
+    # --- Cut vertices and bridges ---
+
+    def articulation_points_and_bridges(self):
+        """
+        Finds the articulation points (rooms whose removal disconnects the map)
+        and bridges (doors whose removal disconnects the map) using Tarjan's
+        low-link algorithm. Written iteratively so huge maps don't hit the
+        recursion limit.
+
+        Returns:
+            tuple: (set of room IDs, list of (room_id, neighbor_id) doors)
+        """
+        indptr, indices = self.indptr, self.indices
+        disc = [-1] * self.num_rooms  # Discovery time of each room
+        low = [0] * self.num_rooms  # Earliest discovery time reachable from its subtree
+        cut_rooms = set()
+        bridges = []
+        timer = 0
+
+        for root in range(self.num_rooms):
+            if disc[root] != -1:
+                continue
+
+            disc[root] = low[root] = timer
+            timer += 1
+            root_children = 0
+            # Stack entries: (room, parent, next neighbour position to look at)
+            stack = [(root, -1, indptr[root])]
+
+            while stack:
+                room_id, parent_id, pos = stack[-1]
+                if pos < indptr[room_id + 1]:
+                    stack[-1] = (room_id, parent_id, pos + 1)
+                    neighbor_id = indices[pos]
+                    if disc[neighbor_id] == -1:
+                        # Tree edge: go deeper
+                        disc[neighbor_id] = low[neighbor_id] = timer
+                        timer += 1
+                        if room_id == root:
+                            root_children += 1
+                        stack.append((neighbor_id, room_id, indptr[neighbor_id]))
+                    elif neighbor_id != parent_id:
+                        # Back edge
+                        low[room_id] = min(low[room_id], disc[neighbor_id])
+                else:
+                    # All neighbours done: report to the parent
+                    stack.pop()
+                    if parent_id != -1:
+                        low[parent_id] = min(low[parent_id], low[room_id])
+                        if low[room_id] > disc[parent_id]:
+                            bridges.append((parent_id, room_id))
+                        if parent_id != root and low[room_id] >= disc[parent_id]:
+                            cut_rooms.add(parent_id)
+
+            if root_children > 1:
+                cut_rooms.add(root)
+
+        return cut_rooms, bridges
+
+    def articulation_points(self):
+        """Returns the set of rooms whose removal would disconnect the map."""
+        return self.articulation_points_and_bridges()[0]
+
+    def bridges(self):
+        """Returns the list of doors whose removal would disconnect the map."""
+        return self.articulation_points_and_bridges()[1]
@@ -0,0 +1,100 @@
+"""
+Runs the game without a person at the keyboard.
+Commands (and the answers to the game's questions) come from a script, and
+everything the game prints goes to a transcript. With a fixed seed and the
+in-memory database the same script always produces the same transcript, which
+makes it possible to replay a session a player reported, or to push thousands
+of commands per second through the engine for a load test.
+
+Script format: one line per command or answer, exactly as a player would type
+it. Blank lines and lines starting with '#' are skipped.
+
+    python main.py --script session.txt --seed 42 --stub-db --transcript out.txt
+"""
+
+import time
+from main import MainGame
+from storage import open_storage
+from renderer import MemorySink, NullSink
+
+
+class HeadlessRun:
+    """The outcome of one scripted game."""
+
+    def __init__(self, game, sink, commands_run, commands_skipped, elapsed):
+        self.game = game
+        self.sink = sink
+        self.commands_run = commands_run  # Lines fed to the game
+        self.commands_skipped = commands_skipped  # Lines left over after the game ended
+        self.elapsed = elapsed  # Seconds spent handling the lines (not building the game)
+
+    @property
+    def transcript(self):
+        """Everything the game printed, with each input shown after its prompt."""
+        return self.sink.getvalue() if isinstance(self.sink, MemorySink) else ""
+
+    @property
+    def commands_per_second(self):
+        return self.commands_run / self.elapsed if self.elapsed > 0 else float("inf")
+
+
+def read_script(path):
+    """
+    Reads a script file.
+
+    Returns:
+        list: The lines to feed to the game, without blanks and comments.
+    """
+    with open(path, encoding="utf-8") as script_file:
+        return [line.strip() for line in script_file
+                if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_script(lines, player_id=None, slot=None, seed=None, stub_db=False,
+               db_manager=None, record_transcript=True, profiler=None):
+    """
+    Plays a game from a list of lines.
+
+    Args:
+        lines (iterable): Commands and prompt answers, one per entry.
+        player_id (str, optional): Whose saves to use. Defaults to config.DEFAULT_PLAYER_ID.
+        slot (int, optional): Which save slot to use. Defaults to config.DEFAULT_SAVE_SLOT.
+        seed (int, optional): Map seed. Use the same seed to get the same map again.
+        stub_db (bool): Use an in-memory database instead of MongoDB.
+        db_manager (optional): A database to use (overrides stub_db), e.g. a shared
+            memory backend so several runs see each other's saves.
+        record_transcript (bool): Keep the output (False discards it, for load tests).
+        profiler (GameProfiler, optional): Times every line (see profiling.py).
+
+    Returns:
+        HeadlessRun: The game, its transcript, and timing.
+    """
+    if db_manager is None and stub_db:
+        db_manager = open_storage('memory')
+
+    sink = MemorySink() if record_transcript else NullSink()
+    game = MainGame(player_id=player_id, slot=slot, sink=sink, db_manager=db_manager, seed=seed,
+                    profiler=profiler)
+    renderer = game.renderer
+
+    lines = list(lines)
+    commands_run = 0
+    start = time.perf_counter()
+
+    game.start_game()
+    for line in lines:
+        if not game.is_running:
+            break
+
+        # Show the input after its prompt, as it would appear in a terminal
+        if record_transcript:
+            renderer.write_prompt(game.current_prompt())
+            sink.write(line + "\n")
+
+        game.handle_line(line)
+        commands_run += 1
+
+    elapsed = time.perf_counter() - start
+    game.close()
+
+    return HeadlessRun(game, sink, commands_run, len(lines) - commands_run, elapsed)
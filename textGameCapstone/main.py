@@ -6,20 +6,21 @@ contains the MainGame orchestrator class, and runs the game.
 """
 
 # --- IMPORTS (Connecting the files) ---
+# Startup timing first, so --startup-profile includes the other imports
+from startup import startup_timer
 from player import Player
 from game_map import GameMap
-from game_map import GameMap
-from database_manager import DatabaseManager # Add this line
+from storage import open_storage, autosave_slot, StorageError
+import autosave
+import config
 import sys # Add this line for exit functionality
+import time
+from metrics import metrics, COMMAND_SECONDS
 
-# ANSI Color Codes
-GREEN = "\033[92m"
-RED = "\033[91m"
-YELLOW = "\033[93m"
-CYAN = "\033[96m"
-BLUE = "\033[94m"
-MAGENTA = "\033[95m"
-RESET = "\033[0m" # Resets color to default
+# ANSI Color Codes (defined with the rest of the display code in renderer.py)
+from renderer import Renderer, GREEN, RED, YELLOW, CYAN, BLUE, MAGENTA, RESET
+from commands import CommandRegistry, ArgSpec, CommandResult
+from path_index import Navigator
 
 # Command output messages (Separating UI text from logic)
 COMMAND_MESSAGES = {
@@ -29,6 +30,17 @@ COMMAND_MESSAGES = {
     'NO_ITEM': f"{YELLOW}There is no item in this room for you to pick up.{RESET}",
     'INVALID_MOVE': f"{RED}There isn't a door to the {{}} from here. Please choose a valid direction.{RESET}",
     'UNRECOGNIZED': f"{RED}Sorry the command you entered was unrecognized. Type 'help' for commands.{RESET}",
+    'AMBIGUOUS': f"{YELLOW}Did you mean {{}}? Please type a little more of the command.{RESET}",
+    'HINT_ITEM': f"{YELLOW}HINT:{RESET} An item you need is {{}} move(s) away. Head {CYAN}{{}}{RESET}.",
+    'HINT_ITEM_HERE': f"{YELLOW}HINT:{RESET} An item you need is right here. Try to GET it.",
+    'HINT_BOSS': f"{YELLOW}HINT:{RESET} You have every item. The {CYAN}Arcane Dungeon{RESET} is {{}} move(s) away. Head {CYAN}{{}}{RESET}.",
+    'NO_ROUTE': f"{RED}There is no way to get there from here.{RESET}",
+    'WHERE_ITEM': f"The {{}} is {{}} move(s) away. Head {CYAN}{{}}{RESET}.",
+    'WHERE_HERE': f"The {{}} is right here.",
+    'WHERE_HAVE': f"{YELLOW}You already have the {{}}.{RESET}",
+    'WHERE_NONE': f"{YELLOW}There is no {{}} anywhere on this map.{RESET}",
+    'PAR': f"You won in {CYAN}{{}}{RESET} moves. Par for this map is {CYAN}{{}}{RESET}.",
+    'PAR_PERFECT': f"You won in {CYAN}{{}}{RESET} moves: {GREEN}a perfect run!{RESET}",
     'WINNER': f"""~""" * 90 + f"""
 As you breach the {CYAN}Arcane Dungeon{RESET}, a wave of stifling heat and flame washes over you.
 Your {MAGENTA}magical robes{RESET} flare with protective wards, turning the inferno aside as you press
@@ -86,14 +98,81 @@ class MainGame:
     The main game orchestrator. It manages the game loop, handles user I/O,
     and checks the win/loss conditions.
     """
-    REQUIRED_ITEMS = {'Cloak', 'Potion', 'Robes', 'Shield', 'Staff', 'Stew'}
+    REQUIRED_ITEMS = GameMap.REQUIRED_ITEMS
+
+    # Commands that change what a save holds (and so count as a turn for autosave)
+    AUTOSAVE_STATUSES = {'MOVED', 'SUCCESS'}
+
+    # Shown when the game is waiting for a command
+    COMMAND_PROMPT = f"{BLUE}What would you like to do?{RESET}\n> "
 
-    def __init__(self):
-        # Initialize Database Manager
-        self.db_manager = DatabaseManager()
+    # Questions that wait for a one-letter answer (the answer arrives through handle_line)
+    PROMPTS = {
+        'CONTINUE_OR_NEW': "Do you want to (C)ontinue or start a (N)ew Game? > ",
+        'RESUME_OR_NEW': "Do you want to (R)esume the autosave, (C)ontinue your last save or start a (N)ew Game? > ",
+        'SAVE_BEFORE_EXIT': "Do you want to save your progress before exiting? (Y/N) > ",
+        'LOAD_CONFIRM': "Load your last save? Progress since then will be lost. (Y/N) > ",
+    }
+
+    def __init__(self, player_id=None, slot=None, sink=None, db_manager=None, seed=None, autosaver=None,
+                 profiler=None):
+        """
+        Args:
+            player_id (str, optional): Whose saves to use. Defaults to config.DEFAULT_PLAYER_ID.
+            slot (int, optional): Which save slot to use. Defaults to config.DEFAULT_SAVE_SLOT.
+            sink (optional): Where game text goes (see renderer.py). Defaults to the terminal.
+            db_manager (optional): The storage backend to use (see storage.py).
+                Defaults to the one selected by config.STORAGE_BACKEND.
+            seed (int, optional): Seed for the map, for repeatable games. Seeded games
+                never take a layout from the map pool.
+            autosaver (AutoSaver, optional): Background save writer (see autosave.py).
+                Defaults to the shared one, or none if config.AUTOSAVE_TURNS is 0.
+            profiler (GameProfiler, optional): Times every turn and snapshots
+                memory between them (see profiling.py).
+
+        Raises:
+            StorageError: If the storage backend cannot be opened.
+        """
+        # Told when each turn starts and ends (--profile)
+        self.profiler = profiler
+
+        # Collects each turn's text and writes it to the sink once per turn
+        self.renderer = Renderer(sink)
+        self.output = self.renderer.write
+
+        # The banner needs no database, so it is shown while the connection warms up
+        self._show_intro()
+        self.renderer.flush()
+        startup_timer.mark("banner shown")
+
+        # Which save this session reads and writes
+        self.player_id = player_id or config.DEFAULT_PLAYER_ID
+        self.slot = config.DEFAULT_SAVE_SLOT if slot is None else slot
+        # Autosaves have a slot of their own, so SAVE/LOAD stays a checkpoint
+        self.autosave_slot = autosave_slot(self.slot)
+
+        # Initialize Database Manager (MongoDB connects in the background, see database_manager.py)
+        self.db_manager = db_manager or open_storage()
+        startup_timer.mark("storage opened")
+
+        # Saves go through the background writer, so autosaves never block a turn
+        if autosaver is None and config.AUTOSAVE_TURNS > 0:
+            autosaver = autosave.autosaver
+        self.autosaver = autosaver
+        self.turns_since_save = 0
+
+        # Take a pre-generated layout from the map pool if one is enabled (see map_pool.py)
+        self.map_pool = None
+        layout = None
+        if config.MAP_POOL_BACKEND != 'off' and seed is None:
+            from map_pool import MapPool  # Only imported when the pool is enabled
+            self.map_pool = MapPool(self.db_manager)
+            layout = self.map_pool.pop()
 
         # Initialize Map Manager to create all Room objects
-        self.game_map = GameMap()
+        # (shares the same database manager, and therefore the same connection pool)
+        self.game_map = GameMap(self.db_manager, layout=layout, seed=seed)
+        startup_timer.mark("map built")
 
         # Get the starting room object
         start_room = self.game_map.get_room(self.game_map.start_room_name)
@@ -101,135 +180,164 @@ class MainGame:
         # Initialize Player, giving them the starting Room object
         self.player = Player(start_room)
 
+        # Moves since the map was created, to compare with its par on a win.
+        # None after a LOAD: the moves made before the save are not known.
+        self.moves_taken = 0
+
+        # HINT/WHERE state for the current map, built on the first hint (see path_index.py)
+        self._navigator = None
+        self._navigator_version = None
+
         # Control flag for the game loop
         self.is_running = True
 
+        # The question waiting for an answer (a key of PROMPTS), or None
+        self.pending_prompt = None
+
     def _display_game_state(self, message=None):
-        """Prints the current room description, inventory, and a status message."""
-        # Separator and Room Info
-        print(f"{RESET}-" * 87)
-        # Display room name and description
-        print(f"You are in the {CYAN}{self.player.current_room.name}{RESET}.")
-        print(self.player.current_room.get_description())
-
-        # Get the exit keys as a list to check its length
-        exit_list = list(self.player.current_room.exits.keys())
-        num_exits = len(exit_list)
-
-        if num_exits == 1:
-            # Case 1: One exit
-            print(f"\nYou see a door to the: {CYAN}{exit_list[0]}{RESET}")
-        elif num_exits == 2:
-            # Case 2: Two exits
-            print(f"\nYou see doors to the: {CYAN}{exit_list[0]} and {exit_list[1]}{RESET}")
-        elif num_exits > 2:
-            # Case 3: Three or more exits (e.g., "NORTH, SOUTH, and WEST")
-            # Join all exits except the last one with a comma
-            all_but_last = ", ".join(exit_list[:-1])
-            last_exit = exit_list[-1]
-            print(f"\nYou see doors to the: {CYAN}{all_but_last}, and {last_exit}{RESET}")
-
-        # Inventory:
-        # Sorts the inventory list before displaying
-        inventory_list = sorted(self.player.inventory)
-        print(f"Inventory: {inventory_list}")
+        """Shows the current room description, its exits, and the inventory."""
+        self.renderer.write_game_state(self.player, self.game_map)
 
     def _display_message(self, message):
-        """Prints only a status message, used for errors or action feedback."""
-        print(f"\n{message}")
+        """Shows only a status message, used for errors or action feedback."""
+        self.output(f"\n{message}")
 
     def _process_input(self, user_input):
-        """Parses and executes player commands, then displays feedback."""
+        """
+        Runs one player command through the command registry (see commands.py)
+        and displays its result.
 
-        # Check for empty string
-        if not user_input:
+        Returns:
+            CommandResult: What the command did.
+        """
+        start = time.perf_counter()
+        result = COMMANDS.dispatch(user_input, self)
+        # Labelled by command (or by status for unknown input, never by the raw words)
+        COMMAND_SECONDS.observe(time.perf_counter() - start, result.command or result.status)
+        self._show_result(result)
+        return result
+
+    def _show_result(self, result):
+        """Translates a CommandResult into messages for the player."""
+        if result.status in ('EMPTY', 'UNRECOGNIZED'):
             self._display_message(COMMAND_MESSAGES['UNRECOGNIZED'])
-            return
-
-        command = user_input[0].upper()
-
-        # Handle Movement (GO)
-        if command == 'GO':
-            if len(user_input) < 2:
-                self._display_message("GO what direction?")
-                return
-
-            direction = user_input[1].upper()
-
-            # Check for valid direction
-            if direction not in DIRECTIONS:
-                # If the direction isn't one of the 4 valid words,
-                # display an error and stop processing.
-                self._display_message(f"{RED}'{direction}' is not a valid direction. Try NORTH, SOUTH, EAST, or WEST.{RESET}")
-                return
-
-            # The Player object attempts the move, using the GameMap for lookups
-            self._display_message(f"{GREEN}You go {direction}{RESET}.")
-            success = self.player.move(direction, self.game_map)
-
-            if not success:
-                # Display message if move fails (e.g., direction is invalid)
-                self._display_message(COMMAND_MESSAGES['INVALID_MOVE'].format(direction))
-            else:
-                # If successful, the full game state (new room) is displayed later
-                pass
-
-        # Handle Item Collection (GET)
-        elif command == 'GET':
-            if len(user_input) < 2:
-                self._display_message("GET what item?")
-                return
-
-            item_name = user_input[1].title()
-
-            # The player object handles all the logic and returns a status code
-            status = self.player.collect_item(item_name)
-
-            # Translate status code into the UI message
-            if status == 'SUCCESS':
-                self._display_message(COMMAND_MESSAGES['SUCCESS'].format(item_name))
-            elif status == 'ALREADY_HAVE':
-                self._display_message(COMMAND_MESSAGES['ALREADY_HAVE'].format(item_name))
-            elif status == 'WRONG_ITEM':
-                # Custom message to reflect the item the player tried to grab
-                self._display_message(COMMAND_MESSAGES['WRONG_ITEM'].format(item_name))
-            elif status == 'NO_ITEM':
-                self._display_message(COMMAND_MESSAGES['NO_ITEM'])
-
-        # Handle Save Command
-        elif command == 'SAVE':
-            self.save_game()
-
-        # Handle Load Command
-        elif command == 'LOAD':
-            self.load_game()
-
-        # Handle Utility Commands
-        elif command == 'HELP':
-            self._display_message(
-                "COMMANDS: GO [Direction], GET [Item], SAVE, LOAD, EXIT.\n"
-                "GOAL: Collect all 6 items before entering the Arcane Dungeon."
+        elif result.status == 'AMBIGUOUS':
+            self._display_message(COMMAND_MESSAGES['AMBIGUOUS'].format(" or ".join(result.detail)))
+
+        for message in result.messages:
+            self._display_message(message)
+
+    # --- Command Handlers (registered in build_command_registry) ---
+
+    def _go_command(self, direction):
+        """Handles Movement (GO)."""
+        # The Player object attempts the move, using the GameMap for lookups
+        messages = [f"{GREEN}You go {direction}{RESET}."]
+        if not self.player.move(direction, self.game_map):
+            # Display message if move fails (e.g., no door that way)
+            messages.append(COMMAND_MESSAGES['INVALID_MOVE'].format(direction))
+            return CommandResult('INVALID_MOVE', messages, ok=False)
+
+        if self.moves_taken is not None:
+            self.moves_taken += 1
+
+        # If successful, the full game state (new room) is displayed later
+        return CommandResult('MOVED', messages)
+
+    def _get_command(self, item_name):
+        """Handles Item Collection (GET)."""
+        # The player object handles all the logic and returns a status code
+        status = self.player.collect_item(item_name)
+
+        # The hints no longer lead to this item
+        if status == 'SUCCESS' and self._navigator is not None:
+            room_id = self.game_map.get_room_position(self.player.current_room.name)
+            self._navigator.item_taken(room_id, item_name)
+
+        # Translate status code into the UI message
+        if status == 'NO_ITEM':
+            message = COMMAND_MESSAGES['NO_ITEM']
+        else:
+            # SUCCESS, ALREADY_HAVE, or WRONG_ITEM (which reflects the item the player tried to grab)
+            message = COMMAND_MESSAGES[status].format(item_name)
+        return CommandResult(status, [message], ok=(status == 'SUCCESS'))
+
+    def _save_command(self):
+        """Handles the SAVE command."""
+        return self.save_game()
+
+    def _load_command(self):
+        """Handles the LOAD command."""
+        # Loading replaces the game (and L alone is enough to get here), so ask first
+        self.pending_prompt = 'LOAD_CONFIRM'
+        return CommandResult('LOAD')
+
+    def _help_command(self):
+        """Handles the HELP command."""
+        return CommandResult('HELP', [
+            "COMMANDS: " + ", ".join(COMMANDS.help_lines()) + ".\n"
+            "Commands and directions can be shortened (N = GO NORTH, G E = GO EAST, SA = SAVE).\n"
+            "GOAL: Collect all 6 items before entering the Arcane Dungeon."
+        ])
+
+    def _hint_command(self):
+        """Handles the HINT command: the way to the nearest item still needed, or to the dungeon."""
+        direction, moves, _, collecting = self._get_navigator().hint(self._current_room_id())
+        if moves == -1:
+            return CommandResult('NO_ROUTE', [COMMAND_MESSAGES['NO_ROUTE']], ok=False)
+        if not collecting:
+            return CommandResult('HINT', [COMMAND_MESSAGES['HINT_BOSS'].format(moves, direction)])
+        if moves == 0:
+            return CommandResult('HINT', [COMMAND_MESSAGES['HINT_ITEM_HERE']])
+        return CommandResult('HINT', [COMMAND_MESSAGES['HINT_ITEM'].format(moves, direction)])
+
+    def _where_command(self, item_name):
+        """Handles the WHERE command: how far away an item is, and which way to go."""
+        if item_name in self.player.inventory:
+            return CommandResult('WHERE', [COMMAND_MESSAGES['WHERE_HAVE'].format(item_name)])
+        found = self._get_navigator().where(self._current_room_id(), item_name)
+        if found is None:
+            return CommandResult('WHERE', [COMMAND_MESSAGES['WHERE_NONE'].format(item_name)], ok=False)
+        direction, moves = found
+        if moves == -1:
+            return CommandResult('NO_ROUTE', [COMMAND_MESSAGES['NO_ROUTE']], ok=False)
+        if moves == 0:
+            return CommandResult('WHERE', [COMMAND_MESSAGES['WHERE_HERE'].format(item_name)])
+        return CommandResult('WHERE', [COMMAND_MESSAGES['WHERE_ITEM'].format(item_name, moves, direction)])
+
+    def _current_room_id(self):
+        """The player's room as a position in the map layout (the ID the path index uses)."""
+        return self.game_map.get_room_position(self.player.current_room.name)
+
+    def _get_navigator(self):
+        """
+        Returns the hint state for the current map, building it after the map
+        changed (new game or loaded save). Picking items up updates it in place.
+        """
+        if not self._navigator_ready():
+            self._navigator = Navigator(
+                self.game_map.get_path_index(),
+                self.game_map.get_item_rooms(),
+                self.REQUIRED_ITEMS - self.player.inventory,
+                final_room=self.game_map.get_room_position(self.game_map.BOSS_ROOM)
             )
+            self._navigator_version = self.game_map.layout_version
+        return self._navigator
 
+    def _navigator_ready(self):
+        """True if the hint state for the current map is built, so HINT and WHERE answer at once."""
+        return self._navigator is not None and self._navigator_version == self.game_map.layout_version
 
-        elif command == 'EXIT':
-            # Prompt to save before exiting
-            while True:
-                choice = input("Do you want to save your progress before exiting? (Y/N) > ").upper()
-                if choice == 'Y':
-                    self.save_game()
-                    break
-                elif choice == 'N':
-                    break
-                else:
-                    print("Invalid choice. Please enter 'Y' or 'N'.")
-
-            # Set the control flag to stop the game loop
-            self.is_running = False
+    def _stats_command(self):
+        """Handles the STATS command: latency and map generation figures for this process."""
+        lines = metrics.report_lines() or ["No measurements yet."]
+        return CommandResult('STATS', ["\n".join(lines)])
 
-        # Handle Unrecognized Commands
-        else:
-            self._display_message(COMMAND_MESSAGES['UNRECOGNIZED'])
+    def _exit_command(self):
+        """Handles the EXIT command."""
+        # Ask to save before exiting; the game stops once it is answered
+        self.pending_prompt = 'SAVE_BEFORE_EXIT'
+        return CommandResult('EXIT')
 
     def _check_win_loss(self):
         """Checks if the player has entered the Arcane Dungeon and determines win/loss state."""
@@ -240,6 +348,7 @@ class MainGame:
             if self.player.inventory == self.REQUIRED_ITEMS:
                 # Win outcome: Display the success narrative and end the game
                 self._display_message(COMMAND_MESSAGES['WINNER'])
+                self._show_par()
             else:
                 # Loss outcome: Display the failure narrative and end the game
                 self._display_message(COMMAND_MESSAGES['LOSER'])
@@ -252,27 +361,57 @@ class MainGame:
 
         return False # Indicates that the game is still running (boss room not entered)
 
+    def _show_par(self):
+        """After a win, compares the player's moves with the map's par (see route_solver.py)."""
+        if self.moves_taken is None:
+            return  # A loaded game: the run is not complete
+        solution = self.game_map.get_par_route()
+        if solution is None:
+            return
+        if self.moves_taken <= solution.par:
+            self._display_message(COMMAND_MESSAGES['PAR_PERFECT'].format(self.moves_taken))
+        else:
+            self._display_message(COMMAND_MESSAGES['PAR'].format(self.moves_taken, solution.par))
+
     def save_game(self):
         """
-        Saves the current game state to the database.
+        Saves the current game state to the database and waits until it is
+        confirmed (together with any autosave still queued for this slot).
+
+        Returns:
+            CommandResult: 'SAVED' or 'SAVE_FAILED', with the message to show.
         """
-        if self.db_manager.save_game_state(self.player, self.game_map):
-            self._display_message(f"{GREEN}Game Saved Successfully!{RESET}")
+        if self.autosaver is not None:
+            saved = self.autosaver.save(self.db_manager, self.player, self.game_map, self.player_id, self.slot)
         else:
-            self._display_message(f"{RED}Error saving game.{RESET}")
+            saved = self.db_manager.save_game_state(self.player, self.game_map, self.player_id, self.slot)
+
+        self.turns_since_save = 0
+        if saved:
+            return CommandResult('SAVED', [f"{GREEN}Game Saved Successfully!{RESET}"])
+        return CommandResult('SAVE_FAILED', [f"{RED}Error saving game.{RESET}"], ok=False)
 
-    def load_game(self):
+    def load_game(self, slot=None):
         """
         Loads the game state from the database and updates the game objects.
+
+        Args:
+            slot (int, optional): The slot to load. Defaults to the game's own
+                slot (the last SAVE); pass self.autosave_slot to resume the autosave.
+
+        Returns:
+            CommandResult: 'LOADED' or 'NO_SAVE', with the message to show.
         """
-        # Retrieve the save document
-        save_data = self.db_manager.load_game_state()
+        # Retrieve the save document (after any queued autosave has been written)
+        self._flush_autosaves()
+        save_data = self.db_manager.load_game_state(self.player_id, self.slot if slot is None else slot)
 
         if save_data:
             # Reconstruct the Map
             # This updates self.game_map.rooms with the saved layout
-            map_data = save_data['map_data']
-            self.game_map.load_map_from_save(map_data)
+            # (content comes from the room catalog; see save_schema.py)
+            layout = save_data['layout']
+            self.game_map.load_map_from_save(layout, save_data.get('fallback_rooms'))
 
             # Reconstruct the Player
             player_data = save_data['player']
@@ -281,88 +420,281 @@ class MainGame:
             self.player.inventory = set(player_data['inventory'])
 
             # Update location (get the new Room object from the reconstructed map)
-            room_name = player_data['current_room']
+            room_name = layout['rooms'][player_data['current_room']]
             self.player.current_room = self.game_map.get_room(room_name)
 
-            self._display_message(f"{GREEN}Game Loaded Successfully!{RESET}")
-            return True
+            # The player now matches the save, so the next save only writes changes
+            self.player.mark_clean()
 
-        self._display_message(f"{RED}No saved game found.{RESET}")
-        return False
+            # Moves made before the save are unknown, so this run is not scored
+            self.moves_taken = None
+
+            return CommandResult('LOADED', [f"{GREEN}Game Loaded Successfully!{RESET}"])
+
+        return CommandResult('NO_SAVE', [f"{RED}No saved game found.{RESET}"], ok=False)
+
+    def _autosave_turn(self):
+        """Queues an autosave every config.AUTOSAVE_TURNS moves or pick-ups (written in the background)."""
+        if self.autosaver is None or config.AUTOSAVE_TURNS <= 0:
+            return
+        self.turns_since_save += 1
+        if self.turns_since_save >= config.AUTOSAVE_TURNS:
+            self.turns_since_save = 0
+            self.autosaver.autosave(self.db_manager, self.player, self.game_map, self.player_id, self.autosave_slot)
+
+    def _flush_autosaves(self):
+        """Waits until this game's queued autosaves are in the database."""
+        if self.autosaver is not None:
+            self.autosaver.flush(self.player_id, self.autosave_slot)
+
+    def _delete_autosave(self):
+        """Deletes the autosave (and drops any still queued), once there is nothing in it to resume."""
+        if self.autosaver is not None:
+            self.autosaver.discard(self.player_id, self.autosave_slot)
+        self.db_manager.delete_save(self.player_id, self.autosave_slot)
 
     def start_game(self):
         """
         Handles the start of the game, checking for save files.
+        If one exists, the player is asked whether to continue it (or to resume
+        the autosave of a game that ended without saving) and the answer is
+        handled by handle_line().
         """
         # Check if a save file exists
-        if self.db_manager.save_exists():
-            print("A saved game has been detected.")
-            while True:
-                choice = input("Do you want to (C)ontinue or start a (N)ew Game? > ").upper()
-                if choice == 'C':
-                    if self.load_game():
-                        self._display_game_state()
-                        return  # Game loaded successfully, return to run_game
-                    else:
-                        print("Error loading save. Starting new game.")
-                        break
-                elif choice == 'N':
-                    self.db_manager.delete_save()
-                    break
+        self._flush_autosaves()
+        if self.db_manager.save_exists(self.player_id, self.autosave_slot):
+            self.output("An autosave of your last game has been detected.")
+            self.pending_prompt = 'RESUME_OR_NEW'
+        elif self.db_manager.save_exists(self.player_id, self.slot):
+            self.output("A saved game has been detected.")
+            self.pending_prompt = 'CONTINUE_OR_NEW'
+        else:
+            # The banner was shown on startup: start in the first room
+            self._display_game_state()
+
+        self.renderer.flush()
+        startup_timer.mark("save checked")
+
+    def _show_intro(self):
+        """Prints the story introduction (the banner shown on startup)."""
+        self.output(f"{GREEN}~" * 87)
+        self.output("| You are one of the head mages of the Wizard Guild in the City of the Radiant Izar.  |")
+        self.output("| A hydra has broken out of its magical restraints and threatens to destroy the city. |")
+        self.output("| The beast's escape has shattered the containment runes, and the resulting magical   |")
+        self.output("| backlash has turned some doors into unstable portals.                               |")
+        self.output("| You must gather your 6 items and subdue the Hydra in the tower's Arcane Dungeon.    |")
+        self.output("|                                                                                     |")
+        self.output(f"|{YELLOW} NOTE: All items will be a single word.{GREEN}                                              |")
+        self.output(f"| {RED}WARNING: Do not try to face the hydra until you have gathered all your supplies!{GREEN}    |")
+        self.output(f"~" * 87)
+
+    def current_prompt(self):
+        """Returns the text to show while waiting for the player's next line."""
+        if self.pending_prompt is not None:
+            return self.PROMPTS[self.pending_prompt]
+        return self.COMMAND_PROMPT
+
+    def line_may_block(self, line):
+        """
+        Checks if handling this line may take a while: it talks to the database
+        (save, load, delete) or first builds something for the current map
+        (the path index behind HINT and WHERE, or the par route shown after a
+        win). Callers that must not block (server.py) run those lines on a
+        worker thread instead.
+        """
+        words = line.split()
+        first_word = words[0].upper() if words else ''
+        if self.pending_prompt == 'CONTINUE_OR_NEW':
+            return first_word in ('C', 'N')
+        if self.pending_prompt == 'RESUME_OR_NEW':
+            return first_word in ('R', 'C', 'N')
+        if self.pending_prompt in ('SAVE_BEFORE_EXIT', 'LOAD_CONFIRM'):
+            return first_word == 'Y'
+
+        command, _, error = COMMANDS.resolve(words)
+        if error is not None:
+            return False
+        if command.uses_database:
+            return True
+        # The path index takes over a second to build on a 100,000-room map
+        if command.name in ('HINT', 'WHERE'):
+            return not self._navigator_ready()
+        # With every item collected, a move may win the game, which solves the map's par
+        return (command.name == 'GO' and self.moves_taken is not None
+                and self.player.inventory == self.REQUIRED_ITEMS and not self.game_map.par_route_ready())
+
+    def handle_line(self, line):
+        """
+        Handles one line typed by the player: either the answer to a pending
+        question or a game command, followed by the win/loss check and the
+        updated room display.
+
+        Args:
+            line (str): The raw text the player entered.
+        """
+        if self.profiler is not None:
+            self.profiler.start_turn()
+        try:
+            if self.pending_prompt is not None:
+                self._answer_prompt(line.strip().upper())
+                return
+
+            # Process the command (move, get, exit, help, error)
+            result = self._process_input(line.strip().split())
+
+            # Check for game termination conditions after processing input
+            if not self._check_win_loss() and result.status in self.AUTOSAVE_STATUSES:
+                self._autosave_turn()
+
+            # Display state if game is still running and not waiting for an answer.
+            # After GET, _process_input handles messaging; after a move the new room is shown.
+            if self.is_running and self.pending_prompt is None:
+                self._display_game_state()
+
+        except Exception as e:
+            # General error handling message
+            self._display_message(f"An unexpected error occurred: {e}")
+
+        finally:
+            # Write the whole turn at once
+            self.renderer.flush()
+            if self.profiler is not None:
+                self.profiler.end_turn(line)
+
+    def _answer_prompt(self, choice):
+        """Handles the answer to the pending question (see PROMPTS)."""
+        if self.pending_prompt in ('CONTINUE_OR_NEW', 'RESUME_OR_NEW'):
+            resuming = self.pending_prompt == 'RESUME_OR_NEW'
+            if choice == 'C' or (choice == 'R' and resuming):
+                self.pending_prompt = None
+                if choice == 'R':
+                    # Later autosaves keep updating the autosave; the last SAVE stays as it was
+                    result = self.load_game(self.autosave_slot)
                 else:
-                    print("Invalid choice. Please enter 'C' or 'N'.")
-
-        # If no save or new game chosen, print intro
-        print(f"{GREEN}~" * 87)
-        print("| You are one of the head mages of the Wizard Guild in the City of the Radiant Izar.  |")
-        print("| A hydra has broken out of its magical restraints and threatens to destroy the city. |")
-        print("| The beast's escape has shattered the containment runes, and the resulting magical   |")
-        print("| backlash has turned some doors into unstable portals.                               |")
-        print("| You must gather your 6 items and subdue the Hydra in the tower's Arcane Dungeon.    |")
-        print("|                                                                                     |")
-        print(f"|{YELLOW} NOTE: All items will be a single word.{GREEN}                                              |")
-        print(f"| {RED}WARNING: Do not try to face the hydra until you have gathered all your supplies!{GREEN}    |")
-        print(f"~" * 87)
-
-        self._display_game_state()
-
-    def run_game(self):
+                    # The autosave was turned down, so it is not offered again
+                    if resuming:
+                        self._delete_autosave()
+                    result = self.load_game()
+                self._show_result(result)
+                if not result.ok:
+                    self.output("Error loading save. Starting new game.")
+                self._display_game_state()
+            elif choice == 'N':
+                self.pending_prompt = None
+                self._delete_autosave()
+                if self.db_manager.delete_save(self.player_id, self.slot):
+                    self.output("Previous save file deleted.")
+                self._display_game_state()
+            elif resuming:
+                self.output("Invalid choice. Please enter 'R', 'C' or 'N'.")
+            else:
+                self.output("Invalid choice. Please enter 'C' or 'N'.")
+
+        elif self.pending_prompt == 'SAVE_BEFORE_EXIT':
+            if choice in ('Y', 'N'):
+                self.pending_prompt = None
+                if choice == 'Y':
+                    result = self.save_game()
+                    self._show_result(result)
+                    if result.ok:
+                        # Everything is in the save, so there is nothing to resume next time
+                        self._delete_autosave()
+                # Set the control flag to stop the game loop
+                self.is_running = False
+            else:
+                self.output("Invalid choice. Please enter 'Y' or 'N'.")
+
+        elif self.pending_prompt == 'LOAD_CONFIRM':
+            if choice in ('Y', 'N'):
+                self.pending_prompt = None
+                if choice == 'Y':
+                    self._show_result(self.load_game())
+                self._display_game_state()
+            else:
+                self.output("Invalid choice. Please enter 'Y' or 'N'.")
+
+    def run_game(self, startup_profile=False):
         """
-        The main game loop. Handles initialization, input, and state updates.
-        Replaces the complex procedural loop from the original file.
+        The main game loop for a terminal player: reads lines with input() and
+        hands each one to handle_line().
+
+        Args:
+            startup_profile (bool): Print how long each startup phase took
+                (see startup.py) just before the first prompt.
         """
 
         # Call start_game to handle intro and load logic
         self.start_game()
 
+        startup_timer.mark("first prompt")
+        if startup_profile:
+            startup_timer.report()
+
         # The Main Execution Loop
         while self.is_running:
             try:
                 # Get user input
-                user_input_raw = input(f"{BLUE}What would you like to do?{RESET}\n> ").strip()
-                user_input = user_input_raw.split()
-
-                # Process the command (move, get, exit, help, error)
-                self._process_input(user_input)
-
-                # Check for game termination conditions after processing input
-                self._check_win_loss()
-
-                # Display state if game is still running
-                if self.is_running:
-                    # After a move, the state needs re-displayed. After GET, _process_input handles messaging.
-                    # We just call it to ensure display updates if the player successfully moved.
-                    self._display_game_state()
-
+                self.renderer.write_prompt(self.current_prompt())
+                line = input()
             except EOFError:
                 # Handles Ctrl+D or other termination signals cleanly
                 self.is_running = False
-            except Exception as e:
-                # General error handling message
-                self._display_message(f"An unexpected error occurred: {e}")
+                break
+
+            self.handle_line(line)
 
         # Game End Message
-        print("\nThanks for playing, goodbye.")
+        self.output("\nThanks for playing, goodbye.")
+        self.renderer.flush()
+
+        self.close()
+
+    def close(self):
+        """
+        Stops any background map pool refill, waits for this game's queued
+        autosaves, then releases the shared database connection.
+        """
+        if self.map_pool is not None:
+            self.map_pool.close()
+        self._flush_autosaves()
+        self.db_manager.close_connection()
+
+
+def build_command_registry():
+    """
+    Registers every player command with its aliases and arguments.
+    Adding a command only takes a handler method and one register() call here.
+    """
+    registry = CommandRegistry()
+
+    registry.register('GO', MainGame._go_command, help_text="GO [Direction]", aliases=['G', 'MOVE'], args=[
+        ArgSpec('direction', choices=DIRECTIONS,
+                missing_message="GO what direction?",
+                invalid_message=f"{RED}'{{}}' is not a valid direction. Try NORTH, SOUTH, EAST, or WEST.{RESET}")
+    ])
+    registry.register('GET', MainGame._get_command, help_text="GET [Item]", aliases=['TAKE'], args=[
+        ArgSpec('item', transform=str.title, missing_message="GET what item?")
+    ])
+    registry.register('SAVE', MainGame._save_command, uses_database=True)
+    registry.register('LOAD', MainGame._load_command)
+    registry.register('HELP', MainGame._help_command, aliases=['H', '?'])
+    registry.register('HINT', MainGame._hint_command)
+    registry.register('WHERE', MainGame._where_command, help_text="WHERE [Item]", args=[
+        ArgSpec('item', transform=str.title, missing_message="WHERE is what item?")
+    ])
+    registry.register('STATS', MainGame._stats_command)
+    registry.register('EXIT', MainGame._exit_command, aliases=['QUIT'])
+
+    # A direction on its own (or its first letter) means GO in that direction
+    for direction in DIRECTIONS:
+        registry.alias(direction, 'GO', direction)
+        registry.alias(direction[0], 'GO', direction)
+
+    return registry
+
+
+# The commands every game understands
+COMMANDS = build_command_registry()
 
 
 if __name__ == '__main__':
@@ -373,7 +705,81 @@ if __name__ == '__main__':
     to start the application loop.
     """
 
-    # Initialize and run the game
-    game = MainGame()
+    import argparse
+
+    # Pick the save to play (e.g. python main.py --player alice --slot 2)
+    parser = argparse.ArgumentParser(description="Text adventure game")
+    parser.add_argument("--player", default=None, help="Player ID that owns the save (default from config.py)")
+    parser.add_argument("--slot", type=int, default=None, help="Save slot to load and save (default from config.py)")
+
+    # Headless mode (see headless.py): play a script instead of reading the keyboard
+    parser.add_argument("--script", default=None, help="File of commands to play without a keyboard")
+    parser.add_argument("--transcript", default=None, help="Where to write the script's output (default: the terminal)")
+    parser.add_argument("--seed", type=int, default=None, help="Map seed, for repeatable games")
+    parser.add_argument("--stub-db", action="store_true", help="Use an in-memory database instead of MongoDB")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="Print how long each startup phase took (to stderr)")
+
+    # Profiling mode (see profiling.py): cProfile, turn timings and memory snapshots
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the session and write the reports on exit")
+    parser.add_argument("--profile-out", default=None,
+                        help="Report path without extension (default from config.py)")
+    parser.add_argument("--profile-every", type=int, default=None,
+                        help="Turns between memory snapshots (default from config.py)")
+    args = parser.parse_args()
+    startup_timer.mark("imports and arguments")
+
+    profiler = None
+    if args.profile:
+        from profiling import GameProfiler
+
+        profiler = GameProfiler(prefix=args.profile_out, snapshot_every=args.profile_every)
+        profiler.start()
+
+    # Keeps config.METRICS_FILE up to date, if one is set (see metrics.py)
+    metrics.start_exporter()
+
+    if args.script:
+        from headless import read_script, run_script
+
+        try:
+            run = run_script(read_script(args.script), player_id=args.player, slot=args.slot,
+                             seed=args.seed, stub_db=args.stub_db, profiler=profiler)
+        except StorageError as e:
+            print(e)
+            sys.exit(1)
+        if profiler is not None:
+            profiler.stop()
+        if args.transcript:
+            with open(args.transcript, "w", encoding="utf-8") as transcript_file:
+                transcript_file.write(run.transcript)
+        else:
+            sys.stdout.write(run.transcript)
 
-    game.run_game()
\ No newline at end of file
+        print(f"Ran {run.commands_run} commands in {run.elapsed:.3f}s "
+              f"({run.commands_per_second:,.0f} per second), {run.commands_skipped} skipped after the game ended.",
+              file=sys.stderr)
+        if args.startup_profile:
+            startup_timer.report()
+        sys.exit(0)
+
+    # Initialize and run the game
+    try:
+        game = MainGame(player_id=args.player, slot=args.slot, seed=args.seed,
+                        db_manager=open_storage('memory') if args.stub_db else None, profiler=profiler)
+    except StorageError as e:
+        print(e)
+        sys.exit(1)  # Exit the game if we can't reach the database
+
+    try:
+        game.run_game(startup_profile=args.startup_profile)
+    except StorageError as e:
+        # MongoDB connects in the background, so an unreachable server is
+        # only noticed when the save is first checked
+        print(e)
+        sys.exit(1)
+    finally:
+        # Also on Ctrl+C, which is when a slow session is usually stopped
+        if profiler is not None:
+            profiler.stop()
\ No newline at end of file
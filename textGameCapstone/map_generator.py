@@ -0,0 +1,215 @@
+"""
+Builds random dungeon layouts (which room connects to which, and in what direction).
+This file only deals with room names and exits, so it never touches the
+database or Room objects; GameMap applies the finished layout to its rooms.
+
+Internally every room is an integer ID (its position in the room list) and the
+exits are one flat list with 4 slots per room (see ALL_DIRECTIONS), where -1
+means "no door". This keeps generation fast enough for worlds of a million rooms.
+"""
+
+import random
+
+# All possible directions. The order matters: the opposite of direction d is (d + 2) % 4.
+ALL_DIRECTIONS = ['NORTH', 'EAST', 'SOUTH', 'WEST']
+NUM_DIRECTIONS = len(ALL_DIRECTIONS)
+NO_EXIT = -1
+
+# FREE_DIRECTIONS[mask] lists the free directions of a room whose used
+# directions are the bits set in mask (bit d = direction d is taken)
+FREE_DIRECTIONS = [tuple(d for d in range(NUM_DIRECTIONS) if not mask & (1 << d))
+                   for mask in range(1 << NUM_DIRECTIONS)]
+
+# Helper map for finding the opposite direction
+OPPOSITE_DIRECTION = {
+    'NORTH': 'SOUTH',
+    'SOUTH': 'NORTH',
+    'EAST': 'WEST',
+    'WEST': 'EAST'
+}
+
+
+class MapGenerator:
+    """
+    Generates a layout that is valid by construction:
+
+    1. The item rooms are grown into a spanning tree from the fixed start rooms
+       (a modified Prim's Algorithm), so every item room is reachable.
+    2. The boss room is attached last as a leaf, so no item room ever sits
+       "behind" it.
+    3. A few extra doors (loops) are added. Adding doors can never make a room
+       unreachable, so only this phase needs retries, and it has a fixed budget.
+
+    The rooms that can still take a new door are kept in a "frontier" list
+    (with a position index for O(1) removal), so every attachment costs O(1)
+    no matter how large the map is.
+    """
+
+    def __init__(self, start_room, boss_room, fixed_links=(), no_branch_rooms=(),
+                 num_extra_loops=3, max_loop_attempts=30, rng=None):
+        """
+        Args:
+            start_room (str): The room the player starts in.
+            boss_room (str): The room that ends the game; attached as a leaf.
+            fixed_links (iterable): (room, direction, other_room) doors that are always built.
+            no_branch_rooms (iterable): Rooms that never get any doors besides their fixed ones.
+            num_extra_loops (int): How many extra doors to try to add after the tree is built.
+            max_loop_attempts (int): Retry budget for the loop-adding phase.
+            rng (random.Random, optional): Source of randomness (pass a seeded one for repeatable maps).
+        """
+        self.start_room = start_room
+        self.boss_room = boss_room
+        self.fixed_links = list(fixed_links)
+        self.no_branch_rooms = set(no_branch_rooms)
+        self.num_extra_loops = num_extra_loops
+        self.max_loop_attempts = max_loop_attempts
+        self.rng = rng or random.Random()
+
+        # Counters describing the most recent generate() call
+        self.stats = {'tree_attempts': 0, 'loop_attempts': 0, 'loops_added': 0}
+
+    def generate(self, room_names):
+        """
+        Builds a new layout for the given rooms.
+
+        Args:
+            room_names (list): Every room that should appear on the map
+                               (must include the start room and the boss room).
+
+        Returns:
+            list: The flat exits list. The door of room i in direction d
+                  (an index into ALL_DIRECTIONS) leads to room
+                  exits[i * 4 + d], or is NO_EXIT.
+        """
+        self.stats = {'tree_attempts': 0, 'loop_attempts': 0, 'loops_added': 0}
+
+        num_rooms = len(room_names)
+
+        # Only the few special rooms need a name -> ID lookup
+        def room_id_of(name):
+            return room_names.index(name)
+
+        blocked = {room_id_of(name) for name in self.no_branch_rooms if name in room_names}
+        start_id = room_id_of(self.start_room)
+        boss_id = room_id_of(self.boss_room)
+
+        exits = [NO_EXIT] * (num_rooms * NUM_DIRECTIONS)
+        used = [0] * num_rooms  # Bit mask of the directions each room already uses
+
+        # The frontier: rooms already on the map that still have a free exit slot.
+        # frontier_pos[room ID] is the room's index in the frontier (or -1).
+        frontier = []
+        frontier_pos = [-1] * num_rooms
+        connected = {start_id}
+
+        # ----- Fixed doors (e.g. Bedroom <-> Closet) -----
+        for room_name, direction, other_name in self.fixed_links:
+            room_id, other_id = room_id_of(room_name), room_id_of(other_name)
+            d = ALL_DIRECTIONS.index(direction)
+            opposite = (d + 2) % NUM_DIRECTIONS
+            exits[room_id * NUM_DIRECTIONS + d] = other_id
+            exits[other_id * NUM_DIRECTIONS + opposite] = room_id
+            used[room_id] |= 1 << d
+            used[other_id] |= 1 << opposite
+            connected.update((room_id, other_id))
+
+        for room_id in sorted(connected):
+            if room_id not in blocked and FREE_DIRECTIONS[used[room_id]]:
+                frontier_pos[room_id] = len(frontier)
+                frontier.append(room_id)
+
+        # ----- Spanning tree over the remaining rooms -----
+        unconnected = [room_id for room_id in range(num_rooms)
+                       if room_id not in connected and room_id != boss_id]
+        self.rng.shuffle(unconnected)
+        unconnected.append(boss_id)  # The boss room goes last, as a leaf
+
+        # This loop runs once per room, so it is written with local names only
+        rand = self.rng.random
+        for room_id in unconnected:
+            if not frontier:
+                raise RuntimeError(f"No free exit left to attach room #{room_id}.")
+
+            # Pick a random frontier room and one of its free directions
+            anchor_id = frontier[int(rand() * len(frontier))]
+            free_directions = FREE_DIRECTIONS[used[anchor_id]]
+            d = free_directions[int(rand() * len(free_directions))]
+            opposite = (d + 2) % NUM_DIRECTIONS
+
+            exits[anchor_id * NUM_DIRECTIONS + d] = room_id
+            exits[room_id * NUM_DIRECTIONS + opposite] = anchor_id
+            used[anchor_id] |= 1 << d
+            used[room_id] = 1 << opposite
+
+            # The anchor just used its last free slot: swap-remove it from the frontier
+            if len(free_directions) == 1:
+                index = frontier_pos[anchor_id]
+                frontier_pos[anchor_id] = -1
+                last = frontier.pop()
+                if last != anchor_id:
+                    frontier[index] = last
+                    frontier_pos[last] = index
+
+            # The new room has three free slots, so it joins the frontier
+            # (except the boss room, which must stay a leaf)
+            if room_id not in blocked and room_id != boss_id:
+                frontier_pos[room_id] = len(frontier)
+                frontier.append(room_id)
+
+        self.stats['tree_attempts'] = len(unconnected)
+
+        # ----- Extra loops, with a bounded retry budget -----
+        loop_rooms = [room_id for room_id in range(num_rooms) if room_id not in blocked]
+        while (self.stats['loops_added'] < self.num_extra_loops
+               and self.stats['loop_attempts'] < self.max_loop_attempts):
+            self.stats['loop_attempts'] += 1
+            if self._add_loop(loop_rooms, exits):
+                self.stats['loops_added'] += 1
+
+        return exits
+
+    def _add_loop(self, loop_rooms, exits):
+        """
+        Tries once to add a door between two random rooms.
+
+        Returns:
+            bool: True if a door was added.
+        """
+        room1_id = loop_rooms[int(self.rng.random() * len(loop_rooms))]
+        room2_id = loop_rooms[int(self.rng.random() * len(loop_rooms))]
+        base1 = room1_id * NUM_DIRECTIONS
+        base2 = room2_id * NUM_DIRECTIONS
+
+        # Same room, or already connected: this attempt is wasted
+        if room1_id == room2_id or room2_id in exits[base1:base1 + NUM_DIRECTIONS]:
+            return False
+
+        # Find a direction that is free on room1 and whose opposite is free on room2
+        directions = list(range(NUM_DIRECTIONS))
+        self.rng.shuffle(directions)
+        for d in directions:
+            opposite = (d + 2) % NUM_DIRECTIONS
+            if exits[base1 + d] == NO_EXIT and exits[base2 + opposite] == NO_EXIT:
+                exits[base1 + d] = room2_id
+                exits[base2 + opposite] = room1_id
+                return True
+        return False
+
+
+def layout_to_exits(room_names, exits):
+    """
+    Converts a flat exits list into per-room exit dictionaries.
+
+    Args:
+        room_names (list): The room list the layout was generated for.
+        exits (list): The flat exits list returned by MapGenerator.generate().
+
+    Returns:
+        dict: room name -> exits dictionary (direction -> neighbouring room name).
+    """
+    named = {}
+    for room_id, name in enumerate(room_names):
+        base = room_id * NUM_DIRECTIONS
+        named[name] = {ALL_DIRECTIONS[d]: room_names[exits[base + d]]
+                       for d in range(NUM_DIRECTIONS) if exits[base + d] != NO_EXIT}
+    return named
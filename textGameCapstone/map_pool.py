@@ -0,0 +1,395 @@
+"""
+A pool of pre-generated, validated map layouts.
+Layouts are generated in worker processes (one seed per layout) and stored
+either in the 'map_pool' collection or in a local directory, so starting a
+new game only has to take a ready layout instead of generating one.
+
+With MAP_POOL_MIN_PAR set, each worker also solves its layout's optimal
+route (see route_solver.py) and drops layouts that can be won in fewer moves,
+so too-easy maps are filtered out before any game sees them.
+
+The worker processes and the background refill are shared by every MapPool
+in the process (server.py has one per player), and the workers are started
+with 'forkserver' (or 'spawn'): the game process already runs threads, which
+a forked worker would inherit in whatever state they were in.
+
+Run this file directly to fill the pool ahead of time:
+    python map_pool.py 50
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+from array import array
+
+import config
+from room_catalog import RoomCatalog
+from game_map import GameMap
+from route_solver import solve_route
+from storage import StorageError
+
+# --- Worker process side ---
+
+_worker_room_names = None  # Set once per worker process by _init_worker
+_worker_room_items = None  # room position -> item name (only when layouts are filtered by par)
+_worker_min_par = 0
+
+
+def _init_worker(room_names, room_items=None, min_par=0):
+    """Receives the room list (and the par filter) once per worker instead of once per task."""
+    global _worker_room_names, _worker_room_items, _worker_min_par
+    _worker_room_names = room_names
+    _worker_room_items = room_items
+    _worker_min_par = min_par
+
+
+def _worker_context():
+    """The multiprocessing context the workers start in: 'forkserver' where the platform has it, else 'spawn'."""
+    import multiprocessing  # Slow to import, and only a refill needs it
+    start_methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in start_methods else 'spawn')
+
+
+def _generate_layout(seed):
+    """
+    Generates and validates one layout in a worker process.
+
+    Returns:
+        tuple: (seed, packed int32 exits as bytes, attempt counters). The exits are
+            None if the layout was dropped by the par filter (config.MAP_POOL_MIN_PAR).
+    """
+    exits, stats = GameMap.create_layout(_worker_room_names, random.Random(seed))
+
+    if _worker_min_par > 0:
+        # Solved without the cache: every layout here is new
+        solution = solve_route(
+            exits, _worker_room_items, GameMap.REQUIRED_ITEMS,
+            start=_worker_room_names.index(GameMap.START_ROOM),
+            boss=_worker_room_names.index(GameMap.BOSS_ROOM),
+            use_cache=False
+        )
+        if solution is None or solution.par < _worker_min_par:
+            return seed, None, stats
+        stats['par'] = solution.par
+
+    return seed, array('i', exits).tobytes(), stats
+
+
+# --- Storage ---
+
+class MongoPoolStore:
+    """Keeps pooled layouts in the 'map_pool' collection."""
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def push(self, layouts):
+        return self.db.push_pool_layouts(layouts)
+
+    def pop(self, catalog_version):
+        return self.db.pop_pool_layout(catalog_version)
+
+    def count(self, catalog_version):
+        return self.db.count_pool_layouts(catalog_version)
+
+    def prune(self, catalog_version):
+        self.db.prune_pool_layouts(catalog_version)
+
+
+class FilePoolStore:
+    """
+    Keeps pooled layouts as files in a local directory, one sub-directory per
+    catalog version. Each file holds a JSON header line followed by the packed exits.
+    Files are claimed with an atomic rename, so several game processes on one
+    host can share the same pool.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _version_dir(self, catalog_version):
+        return os.path.join(self.directory, str(catalog_version))
+
+    def push(self, layouts):
+        for layout in layouts:
+            version_dir = self._version_dir(layout['catalog_version'])
+            os.makedirs(version_dir, exist_ok=True)
+            path = os.path.join(version_dir, f"{layout['seed']}.layout")
+            header = {key: value for key, value in layout.items() if key != 'exits'}
+
+            # Write to a temporary name first so readers never see half a file
+            with open(path + '.tmp', 'wb') as layout_file:
+                layout_file.write(json.dumps(header).encode() + b'\n')
+                layout_file.write(layout['exits'])
+            os.replace(path + '.tmp', path)
+        return True
+
+    def pop(self, catalog_version):
+        version_dir = self._version_dir(catalog_version)
+        if not os.path.isdir(version_dir):
+            return None
+
+        for entry in os.scandir(version_dir):
+            if not entry.name.endswith('.layout'):
+                continue
+            claimed_path = f"{entry.path}.claimed-{os.getpid()}"
+            try:
+                os.rename(entry.path, claimed_path)  # Fails if another process got it first
+            except OSError:
+                continue
+
+            with open(claimed_path, 'rb') as layout_file:
+                header = json.loads(layout_file.readline())
+                header['exits'] = layout_file.read()
+            os.remove(claimed_path)
+            return header
+        return None
+
+    def count(self, catalog_version):
+        version_dir = self._version_dir(catalog_version)
+        if not os.path.isdir(version_dir):
+            return 0
+        return sum(1 for name in os.listdir(version_dir) if name.endswith('.layout'))
+
+    def prune(self, catalog_version):
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name != str(catalog_version):
+                for name in os.listdir(entry.path):
+                    os.remove(os.path.join(entry.path, name))
+                os.rmdir(entry.path)
+
+
+def _open_store(db_manager, backend):
+    """Returns the store for a pool backend ('mongo' keeps layouts in db_manager, anything else in MAP_POOL_DIR)."""
+    if backend == 'mongo':
+        return MongoPoolStore(db_manager)
+    return FilePoolStore(config.MAP_POOL_DIR)
+
+
+# --- The pool ---
+
+class MapPool:
+    """
+    Hands out ready layouts and keeps the pool topped up in the background.
+
+    Every game has its own MapPool, but the refill is shared by the process
+    (it lives on the class): at most one refill thread and one set of worker
+    processes, however many games are running.
+    """
+
+    # --- Process-wide refill shared by all instances ---
+    _refill_thread = None  # The background refill, while one is running
+    _executor = None  # The worker processes, kept between refills
+    _executor_args = None  # The initargs the workers were started with
+    _open_pools = 0  # MapPools not closed yet: the last close() stops the workers
+    _stopping = False  # Set while the last close() stops the refill
+    _lock = threading.Lock()
+
+    def __init__(self, db_manager, backend=None):
+        """
+        Args:
+            db_manager (StorageBackend): Used for the room catalog (and the 'mongo' pool backend).
+            backend (str, optional): 'mongo' or 'file'. Defaults to config.MAP_POOL_BACKEND.
+        """
+        self.db_manager = db_manager
+        self.backend = backend or config.MAP_POOL_BACKEND
+        self.catalog = RoomCatalog(db_manager)
+        self.store = _open_store(db_manager, self.backend)
+
+        self._closed = False
+        with MapPool._lock:
+            MapPool._open_pools += 1
+
+    def _catalog_version(self):
+        """Loads the catalog (cached after the first call) and returns its version stamp."""
+        self.catalog.get_all_rooms()
+        return self.catalog.get_version()
+
+    def pop(self):
+        """
+        Takes one ready layout out of the pool and starts a background refill
+        if the pool has dropped below the low watermark.
+
+        Returns:
+            dict: A layout for GameMap ({'exits': [...], 'stats': {...}, ...}), or None if the pool is empty.
+        """
+        catalog_version = self._catalog_version()
+        layout = self.store.pop(catalog_version)
+        self.refill_in_background()
+
+        if layout is None:
+            return None
+
+        exits = array('i')
+        exits.frombytes(layout['exits'])
+        layout['exits'] = exits
+        return layout
+
+    def size(self):
+        """Returns how many layouts for the current catalog are waiting in the pool."""
+        return self.store.count(self._catalog_version())
+
+    def fill(self, count, workers=None):
+        """
+        Generates `count` layouts across a pool of worker processes and stores
+        each one as soon as it is ready.
+
+        Args:
+            count (int): Number of layouts to add.
+            workers (int, optional): Number of worker processes. Defaults to config.MAP_POOL_WORKERS.
+
+        Returns:
+            int: Number of layouts stored (fewer than count if the par filter
+                dropped some or the store could not take them).
+        """
+        return MapPool._fill(self.catalog, self.store, count, workers)
+
+    @classmethod
+    def _fill(cls, catalog, store, count, workers=None):
+        """fill() with the catalog and store given, so the refill thread can use storage of its own."""
+        catalog.get_all_rooms()
+        catalog_version = catalog.get_version()
+        room_names, docs, _ = catalog.get_room_index()
+        store.prune(catalog_version)
+
+        # The par filter needs to know where the items are
+        min_par = config.MAP_POOL_MIN_PAR
+        room_items = None
+        if min_par > 0:
+            room_items = {position: doc['item'] for position, doc in enumerate(docs) if doc.get('item')}
+
+        seed_source = random.SystemRandom()
+        seeds = [seed_source.getrandbits(63) for _ in range(count)]
+        stored = 0
+
+        # Imported here: multiprocessing is slow to import, and only a refill needs it
+        from concurrent.futures import as_completed
+
+        executor = cls._get_executor(workers or config.MAP_POOL_WORKERS, (room_names, room_items, min_par))
+        futures = [executor.submit(_generate_layout, seed) for seed in seeds]
+        try:
+            for future in as_completed(futures):
+                seed, exits, stats = future.result()
+                # exits is None if the layout was too easy (see MAP_POOL_MIN_PAR)
+                if exits is not None and store.push([{
+                    'catalog_version': catalog_version,
+                    'seed': seed,
+                    'exits': exits,
+                    'stats': stats
+                }]):
+                    stored += 1
+                # The game that started the refill may have ended; only the last one stops it
+                if cls._stopping:
+                    break
+        finally:
+            # Layouts not started yet are dropped (shutdown(cancel_futures=True) needs Python 3.9)
+            for future in futures:
+                future.cancel()
+
+        return stored
+
+    @classmethod
+    def _get_executor(cls, workers, initargs):
+        """
+        Returns the process-wide worker processes, starting them on first use
+        (or again if the catalog or the par filter changed since).
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        with cls._lock:
+            if cls._executor is not None and cls._executor_args != (workers, initargs):
+                cls._executor.shutdown(wait=False)
+                cls._executor = None
+            if cls._executor is None:
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=_worker_context(),
+                    initializer=_init_worker,
+                    initargs=initargs
+                )
+                cls._executor_args = (workers, initargs)
+            return cls._executor
+
+    def refill_in_background(self):
+        """
+        Tops the pool back up to MAP_POOL_TARGET_SIZE on a background thread
+        if it holds fewer than MAP_POOL_LOW_WATERMARK layouts.
+        Does nothing if a refill is already running in this process.
+        """
+        refill_thread = MapPool._refill_thread
+        if self._closed or (refill_thread is not None and refill_thread.is_alive()):
+            return
+
+        size = self.size()
+        if size >= config.MAP_POOL_LOW_WATERMARK:
+            return
+        missing = config.MAP_POOL_TARGET_SIZE - size
+        if missing <= 0:
+            return
+
+        with MapPool._lock:
+            # Another game may have started one since the check above
+            if MapPool._stopping or (MapPool._refill_thread is not None and MapPool._refill_thread.is_alive()):
+                return
+            MapPool._refill_thread = threading.Thread(
+                target=MapPool._refill, args=(self.db_manager, self.backend, missing), daemon=True
+            )
+            MapPool._refill_thread.start()
+
+    @classmethod
+    def _refill(cls, game_db_manager, backend, count):
+        """
+        Runs on the refill thread, with a storage handle of its own: the
+        refill is shared, so the game that started it may close its backend first.
+        """
+        db_manager = None
+        try:
+            db_manager = game_db_manager.reopen()
+            cls._fill(RoomCatalog(db_manager), _open_store(db_manager, backend), count)
+        except StorageError as e:
+            print(f"Map pool refill stopped: {e}")
+        finally:
+            if db_manager is not None and db_manager is not game_db_manager:
+                db_manager.close_connection()
+
+    def close(self):
+        """
+        Closes this game's pool. The last one closed in the process also stops
+        the background refill and the worker processes (layouts already
+        generated are kept).
+        """
+        if self._closed:
+            return
+        self._closed = True
+        with MapPool._lock:
+            MapPool._open_pools -= 1
+            if MapPool._open_pools > 0:
+                return
+            MapPool._stopping = True
+            refill_thread = MapPool._refill_thread
+
+        # The refill stops after the layout it is waiting for
+        if refill_thread is not None:
+            refill_thread.join()
+        with MapPool._lock:
+            if MapPool._executor is not None:
+                MapPool._executor.shutdown(wait=True)
+                MapPool._executor = None
+                MapPool._executor_args = None
+            MapPool._refill_thread = None
+            MapPool._stopping = False
+
+
+if __name__ == '__main__':
+    from storage import open_storage
+
+    db_manager = open_storage()
+    pool = MapPool(db_manager)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else config.MAP_POOL_TARGET_SIZE
+    print(f"Generated {pool.fill(count)} layouts; {pool.size()} now in the pool.")
+    pool.close()
+    db_manager.close_connection()
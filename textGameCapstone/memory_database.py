@@ -0,0 +1,121 @@
+"""
+The 'memory' storage backend (see storage.py).
+It serves the rooms from build_database.py and keeps saves in a dictionary,
+so the game can run without any database (tests, headless scripts, benchmarks).
+Nothing is written to disk and everything is lost when the process exits.
+"""
+
+import copy
+from build_database import ROOMS_DATA
+from metrics import timed_operation
+from storage import StorageBackend, SAVE_METADATA_FIELDS, DURABLE, apply_save_changes, save_key as _save_key
+
+
+class MemoryDatabaseManager(StorageBackend):
+    """
+    Same methods as DatabaseManager, backed by plain Python objects.
+    Save documents are built with the same code as the MongoDB version, so a
+    save made here has exactly the same shape.
+    """
+
+    # Fixed, because the in-memory rooms never change
+    CATALOG_VERSION = "memory"
+
+    # The rooms are already in memory (and must be exactly these, for repeatable scripts)
+    USES_CATALOG_SNAPSHOT = False
+
+    def __init__(self, rooms_data=None):
+        """
+        Args:
+            rooms_data (list, optional): Room documents to serve. Defaults to build_database.ROOMS_DATA.
+        """
+        self.rooms = {room["name"]: _room_fields(room) for room in (rooms_data or ROOMS_DATA)}
+        self.saves = {}  # (player_id, slot) -> save document
+        self.pool = []  # Pooled map layouts (see map_pool.py)
+
+    # --- Rooms ---
+
+    @timed_operation("get_rooms_data")
+    def get_rooms_data(self, room_names):
+        return [self.rooms[name] for name in room_names if name in self.rooms]
+
+    @timed_operation("get_all_rooms_data")
+    def get_all_rooms_data(self):
+        return list(self.rooms.values())
+
+    def get_catalog_version(self):
+        return self.CATALOG_VERSION
+
+    # --- Content Import ---
+
+    def upsert_rooms(self, rooms):
+        for room in rooms:
+            self.rooms[room["name"]] = _room_fields(room)
+
+    def finish_room_import(self):
+        return self.CATALOG_VERSION
+
+    # --- Saves ---
+
+    @timed_operation("save_game_state")
+    def write_save_snapshot(self, snapshot, durability=DURABLE):
+        key = (snapshot.save_key["player_id"], snapshot.save_key["slot"])
+        if not snapshot.is_delta:
+            self.saves[key] = snapshot.document
+            return True
+
+        document = self.saves.get(key)
+        if document is None:
+            return False
+        apply_save_changes(document, snapshot.changes)
+        return True
+
+    @timed_operation("load_game_state")
+    def load_game_state(self, player_id=None, slot=None):
+        save_key = _save_key(player_id, slot)
+        document = self.saves.get((save_key["player_id"], save_key["slot"]))
+        if document is None:
+            return None
+        self.last_save_key = save_key
+        # A copy, like a fresh read from the database
+        return copy.deepcopy(document)
+
+    def save_exists(self, player_id=None, slot=None):
+        save_key = _save_key(player_id, slot)
+        return (save_key["player_id"], save_key["slot"]) in self.saves
+
+    def list_saves(self, player_id=None, page=0, page_size=10):
+        player_id = _save_key(player_id)["player_id"]
+        slots = sorted(slot for owner, slot in self.saves if owner == player_id)
+        return [
+            {field: self.saves[(player_id, slot)][field] for field in SAVE_METADATA_FIELDS}
+            for slot in slots[page * page_size:(page + 1) * page_size]
+        ]
+
+    @timed_operation("delete_save")
+    def delete_save(self, player_id=None, slot=None):
+        save_key = _save_key(player_id, slot)
+        return self.saves.pop((save_key["player_id"], save_key["slot"]), None) is not None
+
+    # --- Map Pool ---
+
+    def push_pool_layouts(self, layouts):
+        self.pool.extend(layouts)
+        return True
+
+    def pop_pool_layout(self, catalog_version):
+        for position, layout in enumerate(self.pool):
+            if layout["catalog_version"] == catalog_version:
+                return self.pool.pop(position)
+        return None
+
+    def count_pool_layouts(self, catalog_version):
+        return sum(1 for layout in self.pool if layout["catalog_version"] == catalog_version)
+
+    def prune_pool_layouts(self, catalog_version):
+        self.pool = [layout for layout in self.pool if layout["catalog_version"] == catalog_version]
+
+
+def _room_fields(room):
+    """Keeps only the fields the game reads (like ROOM_PROJECTION does in MongoDB)."""
+    return {field: room[field] for field in ("name", "desc_with_item", "desc_no_item", "item")}
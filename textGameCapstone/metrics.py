@@ -0,0 +1,360 @@
+"""
+In-process metrics: where a turn's time goes.
+
+* Every player command is timed in MainGame._process_input (command_seconds).
+* Storage calls are timed by the @timed_operation decorator on the backends
+  (storage_operation_seconds), and with MongoDB every command the driver
+  sends is timed through pymongo command monitoring (mongo_command_seconds,
+  see db_client.py), labelled with the storage operation that sent it.
+* Every map that is built counts its layout and loop attempts (see game_map.py).
+
+Players see a summary with the STATS command. For monitoring, set
+config.METRICS_FILE and the metrics are written there every
+config.METRICS_INTERVAL_SECONDS in the Prometheus text format, ready for a
+node_exporter textfile collector.
+
+Latencies go into fixed buckets (like Prometheus histograms), so recording one
+costs a lock and a binary search, and memory does not grow with traffic.
+"""
+
+import atexit
+import bisect
+import functools
+import os
+import threading
+import time
+
+import config
+
+# Upper bounds (in seconds) of the latency buckets, from 50 microseconds to 10 seconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Every metric name in the exported file starts with this
+METRIC_PREFIX = "textgame_"
+
+
+class Histogram:
+    """
+    Latency distributions, one per combination of label values.
+    """
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            name (str): Metric name (without METRIC_PREFIX), e.g. 'command_seconds'.
+            help_text (str): One-line description for the exported file.
+            label_names (tuple): Names of the labels, in the order observe() takes their values.
+            buckets (tuple): Bucket upper bounds in seconds, ascending.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts (last one is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        """Records one measurement."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def series(self):
+        """
+        Returns a copy of every series.
+
+        Returns:
+            dict: label values -> (bucket counts, sum, count), sorted by label values.
+        """
+        with self._lock:
+            return {labels: (list(counts), total, count)
+                    for labels, (counts, total, count) in sorted(self._series.items())}
+
+    def quantile(self, q, bucket_counts):
+        """
+        Estimates a quantile from a series' bucket counts, interpolating inside
+        the bucket it falls in (as Prometheus' histogram_quantile() does).
+
+        Args:
+            q (float): The quantile, e.g. 0.99.
+            bucket_counts (list): A series' bucket counts, from series().
+
+        Returns:
+            float: The estimate in seconds (the largest bucket bound if it falls in +Inf).
+        """
+        count = sum(bucket_counts)
+        if count == 0:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(bucket_counts):
+            if seen + bucket_count >= rank and bucket_count > 0:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class Counter:
+    """
+    Running totals, one per combination of label values.
+    """
+
+    def __init__(self, name, help_text, label_names=()):
+        """
+        Args:
+            name (str): Metric name (without METRIC_PREFIX), ending in '_total'.
+            help_text (str): One-line description for the exported file.
+            label_names (tuple): Names of the labels, in the order increment() takes their values.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}  # label values -> total
+        self._lock = threading.Lock()
+
+    def increment(self, *label_values, amount=1):
+        """Adds amount to the total for the given label values."""
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self):
+        """Returns a copy of every total, sorted by label values."""
+        with self._lock:
+            return dict(sorted(self._values.items()))
+
+
+class MetricsRegistry:
+    """Every metric of the process, and the file they are exported to."""
+
+    def __init__(self):
+        self.metrics = []  # Histograms and Counters, in registration order
+        self._exporter = None
+        self._exporter_stop = threading.Event()
+        self._export_path = None
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        """Creates and registers a Histogram."""
+        metric = Histogram(name, help_text, label_names, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        """Creates and registers a Counter."""
+        metric = Counter(name, help_text, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    # --- Prometheus Export ---
+
+    def to_prometheus(self):
+        """
+        Renders every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The file contents.
+        """
+        lines = []
+        for metric in self.metrics:
+            name = METRIC_PREFIX + metric.name
+            if isinstance(metric, Histogram):
+                lines.append(f"# HELP {name} {metric.help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for label_values, (bucket_counts, total, count) in metric.series().items():
+                    labels = _format_labels(metric.label_names, label_values)
+                    cumulative = 0
+                    for bound, bucket_count in zip(metric.buckets + (float("inf"),), bucket_counts):
+                        cumulative += bucket_count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(metric.label_names + ('le',), label_values + (le,))} "
+                                     f"{cumulative}")
+                    lines.append(f"{name}_sum{labels} {total!r}")
+                    lines.append(f"{name}_count{labels} {count}")
+            else:
+                lines.append(f"# HELP {name} {metric.help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for label_values, value in metric.values().items():
+                    lines.append(f"{name}{_format_labels(metric.label_names, label_values)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Writes the metrics to a file. It is written under a temporary name and
+        renamed, so a collector never reads a half-written file.
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.to_prometheus())
+        os.replace(temp_path, path)
+
+    def start_exporter(self, path=None, interval=None):
+        """
+        Writes the metrics file every `interval` seconds on a background thread,
+        and once more when the process exits. Does nothing if no path is set or
+        the exporter is already running.
+
+        Args:
+            path (str, optional): The metrics file. Defaults to config.METRICS_FILE.
+            interval (float, optional): Seconds between writes. Defaults to config.METRICS_INTERVAL_SECONDS.
+
+        Returns:
+            bool: True if the exporter is running.
+        """
+        path = path or config.METRICS_FILE
+        if not path:
+            return False
+        if self._exporter is not None:
+            return True
+        interval = config.METRICS_INTERVAL_SECONDS if interval is None else interval
+
+        self._export_path = path
+        self._exporter_stop.clear()
+        self._exporter = threading.Thread(target=self._export_loop, args=(path, interval),
+                                          name="metrics-exporter", daemon=True)
+        self._exporter.start()
+        atexit.register(self.stop_exporter)
+        return True
+
+    def stop_exporter(self):
+        """Stops the exporter thread and writes the file one last time."""
+        if self._exporter is None:
+            return
+        self._exporter_stop.set()
+        self._exporter.join()
+        self._exporter = None
+        self._write_quietly(self._export_path)
+
+    def _export_loop(self, path, interval):
+        while not self._exporter_stop.wait(interval):
+            self._write_quietly(path)
+
+    def _write_quietly(self, path):
+        """Writes the file; a failed write is reported but never stops the game."""
+        try:
+            self.write_prometheus(path)
+        except OSError as e:
+            print(f"Error writing metrics file '{path}': {e}")
+
+
+    # --- In-Game Summary ---
+
+    def report_lines(self):
+        """
+        Summarizes the latency histograms (count, p50, p99 per series) and the
+        counters, for the STATS command.
+
+        Returns:
+            list: Lines of text.
+        """
+        lines = []
+        for metric in self.metrics:
+            if isinstance(metric, Histogram):
+                series = metric.series()
+                if not series:
+                    continue
+                lines.append(f"{metric.help_text}")
+                lines.append(f"  {'/'.join(metric.label_names):<36}{'count':>8} {'p50':>12} {'p99':>12}")
+                for label_values, (bucket_counts, _, count) in series.items():
+                    p50 = metric.quantile(0.5, bucket_counts) * 1000
+                    p99 = metric.quantile(0.99, bucket_counts) * 1000
+                    lines.append(f"  {'/'.join(map(str, label_values)):<36}{count:>8} {p50:>9.3f} ms {p99:>9.3f} ms")
+            else:
+                values = metric.values()
+                if not values:
+                    continue
+                lines.append(f"{metric.help_text}")
+                for label_values, value in values.items():
+                    lines.append(f"  {'/'.join(map(str, label_values)) or 'all':<36}{value:>8}")
+        return lines
+
+
+def _format_labels(label_names, label_values):
+    """Renders {name="value",...} (nothing if there are no labels)."""
+    if not label_names:
+        return ""
+    pairs = []
+    for name, value in zip(label_names, label_values):
+        escaped = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# --- Storage Operations ---
+
+# The storage operation running on each thread, so MongoDB commands can be labelled with it
+_current = threading.local()
+
+
+def current_operation():
+    """Returns the storage operation running on this thread (e.g. 'load_game_state'), or None."""
+    return getattr(_current, "operation", None)
+
+
+def timed_operation(operation):
+    """
+    Decorates a storage backend method: its wall time is recorded under
+    storage_operation_seconds, and the MongoDB commands it sends are labelled
+    with the operation name.
+
+    Args:
+        operation (str): The name to record, e.g. 'get_rooms_data'.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            outer = getattr(_current, "operation", None)
+            _current.operation = operation
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                STORAGE_OPERATION_SECONDS.observe(time.perf_counter() - start, operation)
+                _current.operation = outer
+        return timed
+    return decorate
+
+
+def record_map_build(source, stats, seconds):
+    """
+    Records one map that was built.
+
+    Args:
+        source (str): 'generated' (laid out now) or 'pooled' (from the map pool).
+        stats (dict): The layout's attempt counters (see GameMap.create_layout).
+        seconds (float): How long building the map took.
+    """
+    MAPS_BUILT.increment(source)
+    MAP_LAYOUT_ATTEMPTS.increment(source, amount=stats.get('layout_attempts', 0))
+    MAP_LOOP_ATTEMPTS.increment(source, amount=stats.get('loop_attempts', 0))
+    MAP_BUILD_SECONDS.observe(seconds, source)
+
+
+# The one registry for this process, and every metric the game records
+metrics = MetricsRegistry()
+
+COMMAND_SECONDS = metrics.histogram(
+    "command_seconds", "Time to run one player command.", ("command",))
+STORAGE_OPERATION_SECONDS = metrics.histogram(
+    "storage_operation_seconds", "Time spent in one storage backend call.", ("operation",))
+MONGO_COMMAND_SECONDS = metrics.histogram(
+    "mongo_command_seconds", "Time for one MongoDB command, as reported by the driver.",
+    ("operation", "command"))
+MONGO_COMMAND_FAILURES = metrics.counter(
+    "mongo_command_failures_total", "MongoDB commands that failed.", ("operation", "command"))
+MAPS_BUILT = metrics.counter(
+    "maps_built_total", "Maps built, by where their layout came from.", ("source",))
+MAP_LAYOUT_ATTEMPTS = metrics.counter(
+    "map_layout_attempts_total", "Layouts generated (including rejected ones) for the maps built.", ("source",))
+MAP_LOOP_ATTEMPTS = metrics.counter(
+    "map_loop_attempts_total", "Tries at adding an extra loop to a layout.", ("source",))
+MAP_BUILD_SECONDS = metrics.histogram(
+    "map_build_seconds", "Time to build one map, layout included.", ("source",))
@@ -0,0 +1,344 @@
+"""
+Shortest paths over a map layout, for the HINT and WHERE commands.
+
+A PathIndex is built once per map (on the first hint, not when the map is
+generated) and picks one of two strategies by map size:
+
+* Small maps (up to config.PATH_MATRIX_MAX_ROOMS rooms): every distance is
+  precomputed with one BFS per room and stored in a flat array of unsigned
+  16-bit integers (n * n * 2 bytes: 512 KiB for 512 rooms). A distance is one
+  array read and the next step toward a room is one read per door.
+* Large maps: a few landmark rooms are picked far apart from each other and
+  their BFS distances to every room are stored (config.PATH_LANDMARKS arrays
+  of n integers). Routes are found with A*, using the landmarks for the
+  lower bound (|d(L, target) - d(L, room)|, the "ALT" heuristic), so a search
+  only looks at rooms close to the real shortest path.
+
+Rooms in `blocked` (the Arcane Dungeon, which ends the game) can be the end
+of a route but are never passed through.
+
+A Navigator keeps the route of the last hint. Every room on a shortest route
+to the nearest target stays closest to that same target, so while the player
+follows (or returns to) the route the next hint is a dictionary lookup; a new
+search only happens when the player leaves the route or the target's item is
+taken.
+"""
+
+import heapq
+from array import array
+
+import config
+from graph_analysis import MapGraph
+from map_generator import ALL_DIRECTIONS, NUM_DIRECTIONS
+
+UNREACHABLE = 0xFFFF  # Matrix entry for rooms that cannot be reached
+
+
+class PathIndex:
+    """Shortest-path distances and routes over one map layout (room IDs are layout positions)."""
+
+    def __init__(self, num_rooms, exits, blocked=(), matrix_limit=None, landmarks=None, start=0):
+        """
+        Args:
+            num_rooms (int): Number of rooms on the map.
+            exits (sequence): Flat exits list, 4 slots per room (see MapGenerator.generate()).
+            blocked (iterable): Room IDs a route may end in but never pass through.
+            matrix_limit (int, optional): Largest map that gets the all-pairs matrix.
+                Defaults to config.PATH_MATRIX_MAX_ROOMS.
+            landmarks (int, optional): Landmarks for larger maps. Defaults to config.PATH_LANDMARKS.
+            start (int): Room the first landmark is chosen from (the farthest room from it).
+        """
+        self.num_rooms = num_rooms
+        self.exits = exits
+        self.blocked = frozenset(blocked)
+        self.graph = MapGraph(num_rooms, exits)
+
+        matrix_limit = config.PATH_MATRIX_MAX_ROOMS if matrix_limit is None else matrix_limit
+        self.matrix = None  # Distances room -> room (small maps)
+        self.landmarks = []  # Distance arrays from each landmark (large maps)
+
+        # Distances must fit below UNREACHABLE; the longest path has num_rooms - 1 moves
+        if num_rooms <= min(matrix_limit, UNREACHABLE):
+            self._build_matrix()
+        else:
+            self._build_landmarks(config.PATH_LANDMARKS if landmarks is None else landmarks, start)
+
+    @property
+    def strategy(self):
+        """'matrix' or 'landmarks'."""
+        return 'matrix' if self.matrix is not None else 'landmarks'
+
+    # --- Building ---
+
+    def _bfs(self, source, respect_blocked=True):
+        """
+        Distances (in moves) from source to every room, -1 if unreachable.
+        Blocked rooms get a distance but the search does not continue through them.
+        """
+        indptr, indices = self.graph.indptr, self.graph.indices
+        blocked = self.blocked if respect_blocked else ()
+        dist = [-1] * self.num_rooms
+        dist[source] = 0
+        queue = [source]
+        head = 0  # Read position; the queue is never popped from the front
+        while head < len(queue):
+            room_id = queue[head]
+            head += 1
+            if room_id in blocked and room_id != source:
+                continue
+            next_dist = dist[room_id] + 1
+            for neighbor_id in indices[indptr[room_id]:indptr[room_id + 1]]:
+                if dist[neighbor_id] == -1:
+                    dist[neighbor_id] = next_dist
+                    queue.append(neighbor_id)
+        return dist
+
+    def _build_matrix(self):
+        """One BFS per room, stored row by row (row = starting room)."""
+        matrix = array('H')
+        for source in range(self.num_rooms):
+            matrix.extend(UNREACHABLE if d == -1 else d for d in self._bfs(source))
+        self.matrix = matrix
+
+    def _build_landmarks(self, count, start):
+        """
+        Picks landmarks by farthest-point selection: each new landmark is the
+        room farthest from every landmark chosen so far, which spreads them
+        around the edges of the map where their lower bounds are tightest.
+        Landmark distances ignore blocked rooms, so the bounds stay valid
+        (never larger than the real route) for any route.
+        """
+        closest = self._bfs(start, respect_blocked=False)  # Distance to the nearest landmark so far
+        for _ in range(max(count, 1)):
+            landmark = max(range(self.num_rooms), key=closest.__getitem__)
+            if closest[landmark] <= 0 and self.landmarks:
+                break  # Every room already is a landmark (or unreachable)
+            dist = self._bfs(landmark, respect_blocked=False)
+            self.landmarks.append(array('i', dist))
+            closest = [min(old, new) if new != -1 else old for old, new in zip(closest, dist)]
+
+    # --- Queries ---
+
+    def distance(self, source, target):
+        """
+        Returns:
+            int: Moves from source to target, or -1 if there is no route.
+        """
+        if self.matrix is not None:
+            d = self.matrix[source * self.num_rooms + target]
+            return -1 if d == UNREACHABLE else d
+        route = self._astar(source, target)
+        return -1 if route is None else len(route) - 1
+
+    def route(self, source, target):
+        """
+        Returns:
+            list: Room IDs from source to target (both included), or None if there is no route.
+        """
+        if self.matrix is None:
+            return self._astar(source, target)
+
+        n = self.num_rooms
+        matrix = self.matrix
+        if matrix[source * n + target] == UNREACHABLE:
+            return None
+        route = [source]
+        room_id = source
+        while room_id != target:
+            room_id = self._matrix_step(room_id, target)
+            route.append(room_id)
+        return route
+
+    def _matrix_step(self, room_id, target):
+        """The neighbour of room_id that is one move closer to target (matrix strategy)."""
+        n = self.num_rooms
+        remaining = self.matrix[room_id * n + target] - 1
+        for neighbor_id in self.graph.neighbors(room_id):
+            if neighbor_id == target:
+                return neighbor_id
+            if neighbor_id not in self.blocked and self.matrix[neighbor_id * n + target] == remaining:
+                return neighbor_id
+        raise RuntimeError("Path matrix is inconsistent with the map.")  # Cannot happen for a built matrix
+
+    def nearest(self, source, targets):
+        """
+        Finds the closest of several target rooms.
+
+        Args:
+            source (int): Where the route starts.
+            targets (iterable): Candidate room IDs.
+
+        Returns:
+            tuple: (target, route) for the closest reachable target (lowest ID on a tie),
+                or (None, None) if none can be reached.
+        """
+        targets = sorted(targets)
+        if self.matrix is not None:
+            row = source * self.num_rooms
+            best = min(targets, key=lambda target: (self.matrix[row + target], target), default=None)
+            if best is None or self.matrix[row + best] == UNREACHABLE:
+                return None, None
+            return best, self.route(source, best)
+
+        # Search the targets in order of their lower bound, and stop once no
+        # remaining target can beat the best route found
+        best_target, best_route = None, None
+        for bound, target in sorted((self._lower_bound(source, target), target) for target in targets):
+            if best_route is not None and bound >= len(best_route) - 1:
+                break
+            route = self._astar(source, target)
+            if route is not None and (best_route is None or len(route) < len(best_route)):
+                best_target, best_route = target, route
+        return best_target, best_route
+
+    def direction(self, room_id, neighbor_id):
+        """Returns the direction of the door from room_id to neighbor_id (e.g. 'NORTH')."""
+        base = room_id * NUM_DIRECTIONS
+        for slot in range(NUM_DIRECTIONS):
+            if self.exits[base + slot] == neighbor_id:
+                return ALL_DIRECTIONS[slot]
+        return None
+
+    # --- A* with landmarks (large maps) ---
+
+    def _lower_bound(self, room_id, target):
+        """The landmark (triangle inequality) lower bound on the moves from room_id to target."""
+        bound = 0
+        for dist in self.landmarks:
+            a, b = dist[room_id], dist[target]
+            if a >= 0 and b >= 0 and abs(a - b) > bound:
+                bound = abs(a - b)
+        return bound
+
+    def _astar(self, source, target):
+        """A* search from source to target; returns the route (list of room IDs) or None."""
+        if source == target:
+            return [source]
+        indptr, indices = self.graph.indptr, self.graph.indices
+        blocked = self.blocked
+        target_dists = [(dist, dist[target]) for dist in self.landmarks]
+
+        def lower_bound(room_id):
+            bound = 0
+            for dist, to_target in target_dists:
+                d = dist[room_id]
+                if d >= 0 and to_target >= 0:
+                    d = d - to_target if d > to_target else to_target - d
+                    if d > bound:
+                        bound = d
+            return bound
+
+        moves = {source: 0}
+        came_from = {source: None}
+        frontier = [(lower_bound(source), 0, source)]
+        while frontier:
+            _, g, room_id = heapq.heappop(frontier)
+            if room_id == target:
+                route = []
+                while room_id is not None:
+                    route.append(room_id)
+                    room_id = came_from[room_id]
+                return route[::-1]
+            if g > moves[room_id] or (room_id in blocked and room_id != source):
+                continue  # A stale entry, or a room the route may only end in
+            for neighbor_id in indices[indptr[room_id]:indptr[room_id + 1]]:
+                known = moves.get(neighbor_id)
+                if known is None or g + 1 < known:
+                    moves[neighbor_id] = g + 1
+                    came_from[neighbor_id] = room_id
+                    heapq.heappush(frontier, (g + 1 + lower_bound(neighbor_id), g + 1, neighbor_id))
+        return None
+
+
+class Navigator:
+    """
+    Hints for one game: where the items the player still needs are, and the
+    way to the Arcane Dungeon once they have all of them.
+    """
+
+    def __init__(self, index, room_items, needed_items, final_room):
+        """
+        Args:
+            index (PathIndex): The map's path index.
+            room_items (dict): room ID -> item name, for every item still on the map.
+            needed_items (iterable): Item names the player still has to collect.
+            final_room (int): Where to send the player once nothing is needed (the boss room).
+        """
+        self.index = index
+        self.final_room = final_room
+        self.needed_items = set(needed_items)
+
+        self.item_rooms = {}  # item name -> room IDs holding it
+        for room_id, item_name in room_items.items():
+            self.item_rooms.setdefault(item_name, set()).add(room_id)
+        self.targets = {room_id for room_id, item_name in room_items.items() if item_name in self.needed_items}
+
+        # The route of the last hint: its target, and room ID -> position on it
+        self._target = None
+        self._route = None
+        self._route_positions = None
+
+    def item_taken(self, room_id, item_name):
+        """
+        Updates the targets after the player picked up an item (no search needed).
+
+        Args:
+            room_id (int): The room the item was in.
+            item_name (str): The item.
+        """
+        rooms = self.item_rooms.get(item_name)
+        if rooms is not None:
+            rooms.discard(room_id)
+            if not rooms:
+                del self.item_rooms[item_name]
+
+        if item_name in self.needed_items:
+            # Other rooms with the same item are no longer worth visiting
+            self.needed_items.discard(item_name)
+            self.targets -= {room_id} | (rooms or set())
+            if self._target not in self.targets:
+                self._route = None
+
+    def hint(self, room_id):
+        """
+        The way to the nearest item still needed (or to the final room).
+
+        Returns:
+            tuple: (direction, moves left, target room ID, collecting). direction is
+                None if the player is already there or there is no route (then moves is -1);
+                collecting is False when the hint leads to the final room.
+        """
+        collecting = bool(self.targets)
+        if self._route is None or room_id not in self._route_positions:
+            if collecting:
+                target, route = self.index.nearest(room_id, self.targets)
+            else:
+                target, route = self.final_room, self.index.route(room_id, self.final_room)
+            if route is None:
+                self._route = None
+                return None, -1, None, collecting
+            self._target, self._route = target, route
+            self._route_positions = {room: position for position, room in enumerate(route)}
+
+        position = self._route_positions[room_id]
+        moves_left = len(self._route) - 1 - position
+        if moves_left == 0:
+            return None, 0, self._target, collecting
+        return self.index.direction(room_id, self._route[position + 1]), moves_left, self._target, collecting
+
+    def where(self, room_id, item_name):
+        """
+        The way to the nearest room holding the given item.
+
+        Returns:
+            tuple: (direction, moves) as for hint(), or None if the item is not on the map.
+        """
+        rooms = self.item_rooms.get(item_name)
+        if not rooms:
+            return None
+        _, route = self.index.nearest(room_id, rooms)
+        if route is None:
+            return None, -1
+        if len(route) == 1:
+            return None, 0
+        return self.index.direction(room_id, route[1]), len(route) - 1
@@ -8,9 +8,37 @@ from room import Room
 class Player:
     def __init__(self, start_room: Room):
         """ Initializes the player """
+        self.dirty_fields = set()  # Names of the fields changed since the last save (for delta saves)
+        self.inventory_version = 0  # Goes up whenever the inventory changes (lets renderer.py cache its text)
         self.current_room = start_room  # (Room) holds a reference to a Room object (the player's location)
         self.inventory = set()  # shows player's inventory as a set (originally a list, changed for lookup efficiency)
 
+    # --- Dirty Tracking ---
+    # current_room and inventory are properties so that every change is recorded.
+
+    @property
+    def current_room(self):
+        return self._current_room
+
+    @current_room.setter
+    def current_room(self, room):
+        self._current_room = room
+        self.dirty_fields.add('current_room')
+
+    @property
+    def inventory(self):
+        return self._inventory
+
+    @inventory.setter
+    def inventory(self, items):
+        self._inventory = items
+        self.inventory_version += 1
+        self.dirty_fields.add('inventory')
+
+    def mark_clean(self):
+        """Forgets all recorded changes (called once the player's state has been saved)."""
+        self.dirty_fields.clear()
+
     def collect_item(self, item_name):
         """
         Attempts to collect the item from the current room.
@@ -34,6 +62,8 @@ class Player:
 
             # Add the item to the player's inventory
             self.inventory.add(item_to_collect)
+            self.inventory_version += 1
+            self.dirty_fields.add('inventory')
             return 'SUCCESS'  # Item collected successfully
 
         # If the name didn't match, check if there's an item in the room.
@@ -58,11 +88,9 @@ class Player:
         """
         # Check if the exit is valid from the current room
         if self.current_room.is_exit_valid(direction):
-            # Get the name of the destination room
-            destination_room_name = self.current_room.exits[direction]
-
-            # Use the GameMap manager to get the actual Room object for the destination
-            new_room_object = game_map_manager.get_room(destination_room_name)
+            # Use the GameMap manager to get the actual Room object behind that door
+            # (a name lookup for Room objects, an array lookup for the compact map)
+            new_room_object = game_map_manager.get_neighbor(self.current_room, direction)
 
             # Update the player's location reference
             self.current_room = new_room_object
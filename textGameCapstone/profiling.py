@@ -0,0 +1,198 @@
+"""
+Profiling mode, turned on with `python main.py --profile` (interactive or
+with --script).
+
+While the game runs:
+
+* cProfile records where the CPU time goes, for the whole session.
+* Every turn (each line handled by MainGame.handle_line) is timed, so slow
+  turns stand out even when the profile averages them away.
+* tracemalloc takes a snapshot every `snapshot_every` turns. Each snapshot is
+  compared with the one before it, which shows where memory is allocated and
+  kept turn after turn (e.g. text rebuilt for every room display).
+
+When the game exits two files are written:
+
+    <prefix>.pstats  the raw profile (open with `python -m pstats` or snakeviz)
+    <prefix>.txt     the top functions, turn timings, and allocation diffs
+
+Both tools slow the game down (tracemalloc by several times), so the numbers
+are for comparing code paths with each other, not for absolute latency; use
+STATS (see metrics.py) for that.
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+
+import config
+
+
+class GameProfiler:
+    """Profiles a game session and writes the reports when stopped."""
+
+    def __init__(self, prefix=None, snapshot_every=None, top=None, frames=None):
+        """
+        Args:
+            prefix (str, optional): Report path without extension. Defaults to config.PROFILE_PREFIX.
+            snapshot_every (int, optional): Turns between tracemalloc snapshots
+                (0 for only the first and last). Defaults to config.PROFILE_SNAPSHOT_TURNS.
+            top (int, optional): Lines per table in the text report. Defaults to config.PROFILE_TOP.
+            frames (int, optional): Stack frames kept per allocation. 1 groups
+                allocations by line; more tells apart the callers. Defaults to config.PROFILE_FRAMES.
+        """
+        self.prefix = prefix or config.PROFILE_PREFIX
+        self.snapshot_every = config.PROFILE_SNAPSHOT_TURNS if snapshot_every is None else snapshot_every
+        self.top = top or config.PROFILE_TOP
+        self.frames = frames or config.PROFILE_FRAMES
+
+        self._profile = cProfile.Profile()
+        self._turn_start = None
+        self.turn_times = []  # Seconds per turn, in order
+        self.slowest_turns = []  # (seconds, turn number, line), the `top` slowest
+
+        self._first_snapshot = None  # (turn, snapshot) at start
+        self._last_snapshot = None  # (turn, snapshot) most recent
+        self.allocation_diffs = []  # (from turn, to turn, [StatisticDiff]) per interval
+
+        self.running = False
+
+    def start(self):
+        """Starts profiling (call before the game is built, to include startup)."""
+        tracemalloc.start(self.frames)
+        self._first_snapshot = self._last_snapshot = (0, self._snapshot())
+        self._profile.enable()
+        self.running = True
+
+    def start_turn(self):
+        """Called by MainGame.handle_line before it handles a line."""
+        self._turn_start = time.perf_counter()
+
+    def end_turn(self, line):
+        """
+        Called by MainGame.handle_line after the turn's output is written.
+
+        Args:
+            line (str): What the player typed, for the slowest-turns table.
+        """
+        if self._turn_start is None:
+            return
+        seconds = time.perf_counter() - self._turn_start
+        self._turn_start = None
+        self.turn_times.append(seconds)
+        turn = len(self.turn_times)
+
+        self.slowest_turns.append((seconds, turn, line.strip()))
+        if len(self.slowest_turns) > self.top * 2:
+            self.slowest_turns = sorted(self.slowest_turns, reverse=True)[:self.top]
+
+        if self.snapshot_every and turn % self.snapshot_every == 0:
+            self._compare_snapshot(turn)
+
+    def stop(self):
+        """
+        Stops profiling and writes the reports.
+
+        Returns:
+            tuple: (pstats path, text report path), or None if it was not running.
+        """
+        if not self.running:
+            return None
+        self._profile.disable()
+        self.running = False
+
+        turn = len(self.turn_times)
+        if turn != self._last_snapshot[0] or turn == 0:
+            self._compare_snapshot(turn)
+        overall = self._last_snapshot[1].compare_to(self._first_snapshot[1], "lineno")
+        tracemalloc.stop()
+
+        pstats_path = f"{self.prefix}.pstats"
+        report_path = f"{self.prefix}.txt"
+        self._profile.dump_stats(pstats_path)
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            report_file.write(self.report(overall))
+        print(f"Wrote profile to {pstats_path} and {report_path}.", file=sys.stderr)
+        return pstats_path, report_path
+
+    def _snapshot(self):
+        """Takes a tracemalloc snapshot without the profiler's own allocations."""
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+        ))
+
+    def _compare_snapshot(self, turn):
+        """Snapshots memory and keeps the difference with the previous snapshot (not the snapshot itself)."""
+        # Snapshotting is slow: keep it out of the CPU profile
+        if self.running:
+            self._profile.disable()
+        snapshot = self._snapshot()
+        previous_turn, previous = self._last_snapshot
+        self.allocation_diffs.append((previous_turn, turn, snapshot.compare_to(previous, "lineno")[:self.top]))
+        self._last_snapshot = (turn, snapshot)
+        if self.running:
+            self._profile.enable()
+
+    # --- Report ---
+
+    def report(self, overall_diff=()):
+        """
+        Renders the text report.
+
+        Args:
+            overall_diff (list): StatisticDiffs from the first to the last snapshot.
+
+        Returns:
+            str: The report.
+        """
+        out = io.StringIO()
+
+        out.write(f"== CPU: top {self.top} functions by cumulative time ==\n")
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.strip_dirs().sort_stats("cumulative").print_stats(self.top)
+        out.write(f"== CPU: top {self.top} functions by own time ==\n")
+        stats.sort_stats("tottime").print_stats(self.top)
+
+        out.write("== Turn wall time ==\n")
+        if self.turn_times:
+            ordered = sorted(self.turn_times)
+            out.write(f"turns {len(ordered)}, total {sum(ordered) * 1000:.1f} ms, "
+                      f"mean {sum(ordered) / len(ordered) * 1000:.3f} ms\n")
+            for label, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+                out.write(f"{label} {_percentile(ordered, q) * 1000:.3f} ms\n")
+            out.write(f"max {ordered[-1] * 1000:.3f} ms\n\n")
+            out.write("Slowest turns:\n")
+            for seconds, turn, line in sorted(self.slowest_turns, reverse=True)[:self.top]:
+                out.write(f"  turn {turn:>6}  {seconds * 1000:>9.3f} ms  {line!r}\n")
+        else:
+            out.write("no turns were played\n")
+
+        out.write(f"\n== Memory: growth from start to exit (top {self.top}) ==\n")
+        _write_diffs(out, overall_diff[:self.top])
+        for from_turn, to_turn, diffs in self.allocation_diffs:
+            out.write(f"\n== Memory: turns {from_turn} -> {to_turn} ==\n")
+            _write_diffs(out, diffs)
+
+        return out.getvalue()
+
+
+def _percentile(ordered, q):
+    """The q-th value of an already sorted list (nearest rank)."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _write_diffs(out, diffs):
+    """Writes tracemalloc StatisticDiffs, one per line, largest change first."""
+    changed = [diff for diff in diffs if diff.size_diff or diff.count_diff]
+    if not changed:
+        out.write("no change\n")
+        return
+    for diff in changed:
+        frame = diff.traceback[0]
+        out.write(f"{diff.size_diff / 1024:>+10.1f} KiB {diff.count_diff:>+8} blocks  "
+                  f"(now {diff.size / 1024:.1f} KiB)  {frame.filename}:{frame.lineno}\n")
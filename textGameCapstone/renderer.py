@@ -0,0 +1,190 @@
+"""
+Builds the text the player sees and sends it to an output "sink".
+Everything printed during one turn is collected in a buffer and written with
+a single call when the turn ends, and the parts of the room display that
+rarely change (the exit list, the sorted inventory) are cached.
+
+Sinks only need a write(text) method:
+* TerminalSink: standard output (the normal game).
+* SocketSink:   an asyncio connection (server.py).
+* MemorySink:   keeps the text in memory (tests, scripts, headless runs).
+* NullSink:     throws the text away (benchmarks).
+"""
+
+import sys
+import threading
+
+# ANSI Color Codes
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+CYAN = "\033[96m"
+BLUE = "\033[94m"
+MAGENTA = "\033[95m"
+RESET = "\033[0m" # Resets color to default
+
+# The line printed above every room description
+SEPARATOR = f"{RESET}-" * 87
+
+
+# --- Sinks ---
+
+class TerminalSink:
+    """Writes to standard output (or another text stream)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def write(self, text):
+        self.stream.write(text)
+        self.stream.flush()
+
+
+class SocketSink:
+    """
+    Writes to an asyncio StreamWriter, using telnet (CRLF) line endings.
+    Safe to call from executor threads: those writes are handed to the
+    event loop, in order, instead of touching the transport directly.
+    """
+
+    def __init__(self, writer, loop=None):
+        self.writer = writer
+        if loop is None:
+            import asyncio  # Only the server needs asyncio, so it is not imported at startup
+            loop = asyncio.get_running_loop()
+        self.loop = loop
+        self._loop_thread = threading.get_ident()  # Must be created on the loop's thread
+
+    def write(self, text):
+        data = text.replace("\n", "\r\n").encode()
+        if threading.get_ident() == self._loop_thread:
+            self.writer.write(data)
+        else:
+            self.loop.call_soon_threadsafe(self.writer.write, data)
+
+
+class MemorySink:
+    """Keeps everything written in memory."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def getvalue(self):
+        """Returns all the text written so far."""
+        return "".join(self.chunks)
+
+    def clear(self):
+        self.chunks.clear()
+
+
+class NullSink:
+    """Discards everything (for benchmarks)."""
+
+    def write(self, text):
+        pass
+
+
+# --- Renderer ---
+
+class Renderer:
+    """
+    Collects one turn's output and writes it to the sink in one go.
+    """
+
+    def __init__(self, sink=None):
+        """
+        Args:
+            sink (optional): Any object with a write(text) method. Defaults to a TerminalSink.
+        """
+        self.sink = sink or TerminalSink()
+        self.lines = []
+
+        # Cached exit text per room, valid for one map layout
+        self._exit_text = {}
+        self._exit_layout_version = None
+
+        # Cached inventory text, valid for one inventory version
+        self._inventory_text = None
+        self._inventory_version = None
+
+    def write(self, text=""):
+        """Adds a line to the current turn's output."""
+        self.lines.append(str(text))
+
+    def flush(self):
+        """Writes everything collected this turn to the sink."""
+        if self.lines:
+            self.lines.append("")  # End with a newline
+            self.sink.write("\n".join(self.lines))
+            self.lines.clear()
+
+    def write_prompt(self, prompt):
+        """Flushes the turn and then shows a prompt (without a newline after it)."""
+        self.flush()
+        self.sink.write(prompt)
+
+    # --- Room display ---
+
+    def write_game_state(self, player, game_map):
+        """Adds the current room description, its exits and the inventory to the turn's output."""
+        room = player.current_room
+        self.lines.append(SEPARATOR)
+        self.lines.append(f"You are in the {CYAN}{room.name}{RESET}.")
+        self.lines.append(room.get_description())
+
+        exit_text = self.exit_text(room, game_map)
+        if exit_text:
+            self.lines.append(exit_text)
+
+        self.lines.append(self.inventory_text(player))
+
+    def exit_text(self, room, game_map):
+        """
+        Returns the "You see doors to the: ..." line for a room (empty if it has no exits).
+        Exits only change when the map is rebuilt, so the text is cached per layout.
+        """
+        if self._exit_layout_version != game_map.layout_version:
+            self._exit_text = {}
+            self._exit_layout_version = game_map.layout_version
+
+        text = self._exit_text.get(room.name)
+        if text is None:
+            text = self._exit_text[room.name] = format_exits(list(room.exits))
+        return text
+
+    def inventory_text(self, player):
+        """Returns the sorted "Inventory: [...]" line, rebuilt only when the inventory changes."""
+        if self._inventory_version != player.inventory_version:
+            self._inventory_text = f"Inventory: {sorted(player.inventory)}"
+            self._inventory_version = player.inventory_version
+        return self._inventory_text
+
+
+def format_exits(exit_list):
+    """
+    Formats a room's exits for display.
+
+    Args:
+        exit_list (list): Direction names, e.g. ['NORTH', 'WEST'].
+
+    Returns:
+        str: e.g. "You see doors to the: NORTH and WEST" (empty if there are no exits).
+    """
+    num_exits = len(exit_list)
+
+    if num_exits == 1:
+        # Case 1: One exit
+        return f"\nYou see a door to the: {CYAN}{exit_list[0]}{RESET}"
+    elif num_exits == 2:
+        # Case 2: Two exits
+        return f"\nYou see doors to the: {CYAN}{exit_list[0]} and {exit_list[1]}{RESET}"
+    elif num_exits > 2:
+        # Case 3: Three or more exits (e.g., "NORTH, SOUTH, and WEST")
+        # Join all exits except the last one with a comma
+        all_but_last = ", ".join(exit_list[:-1])
+        last_exit = exit_list[-1]
+        return f"\nYou see doors to the: {CYAN}{all_but_last}, and {last_exit}{RESET}"
+    return ""
@@ -15,6 +15,10 @@ class Room:
         self.item_name = item_name  # (str, optional): The name of the collectible item in the room. Defaults to None
         self.has_item = item_name is not None  # Boolean flag for quick checking
 
+        # --- Dirty Tracking (used for delta saves) ---
+        self.dirty_fields = set()  # Names of the fields changed since the last save
+        self.on_change = None  # Optional callback(room), set by GameMap to collect changed rooms
+
     def get_description(self):
         """
         Returns the appropriate description based on whether the item
@@ -50,11 +54,22 @@ class Room:
             # --- State Change for OOP ---
             self.item_name = None  # Clear the item
             self.has_item = False  # Update the flag
+            self._mark_dirty('item_name', 'has_item')
             # ---------------------------
 
             return collected_item
         return None
 
+    def _mark_dirty(self, *fields):
+        """Records that the given fields changed, so the next save writes them."""
+        self.dirty_fields.update(fields)
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def mark_clean(self):
+        """Forgets all recorded changes (called once the room's state has been saved)."""
+        self.dirty_fields.clear()
+
     def check_item_name(self, attempted_item):
         """
         Checks if the given item name matches the collectible item in the room,
@@ -67,3 +82,73 @@ class Room:
             bool: True if the item is present and matches the attempted item name.
         """
         return self.has_item and self.item_name == attempted_item
+
+
+class RoomView:
+    """
+    A lightweight stand-in for Room used by the compact map store (compact_map.py).
+    It holds no state of its own: just the map and an integer room ID, and every
+    attribute is read from the map's arrays. It offers the same methods as Room,
+    so Player and MainGame can use either one.
+    """
+    __slots__ = ('compact_map', 'room_id')
+
+    def __init__(self, compact_map, room_id):
+        """ Initializes a RoomView over room number room_id of compact_map """
+        self.compact_map = compact_map
+        self.room_id = room_id
+
+    @property
+    def name(self):
+        return self.compact_map.names[self.room_id]
+
+    @property
+    def desc_with_item(self):
+        return self.compact_map.docs[self.room_id]['desc_with_item']
+
+    @property
+    def desc_no_item(self):
+        return self.compact_map.docs[self.room_id]['desc_no_item']
+
+    @property
+    def has_item(self):
+        return self.compact_map.has_item(self.room_id)
+
+    @property
+    def item_name(self):
+        # The item name is static catalog data; the bit array says if it's still here
+        if self.has_item:
+            return self.compact_map.docs[self.room_id]['item']
+        return None
+
+    @property
+    def exits(self):
+        """Builds the direction -> room name dictionary on demand (same shape as Room.exits)."""
+        return self.compact_map.get_exits(self.room_id)
+
+    def get_description(self):
+        """Returns the description matching whether the item is still in the room."""
+        if self.has_item:
+            return self.desc_with_item
+        return self.desc_no_item
+
+    def is_exit_valid(self, direction):
+        """Checks if the provided direction is a valid exit from this room."""
+        return self.compact_map.get_neighbor_id(self.room_id, direction) is not None
+
+    def get_item_name(self):
+        """
+        Retrieves the item name from the room and removes the item,
+        ensuring it can only be collected once.
+
+        Returns:
+            str or None: The name of the item if present, otherwise None.
+        """
+        collected_item = self.item_name
+        if collected_item is not None:
+            self.compact_map.set_item(self.room_id, False)
+        return collected_item
+
+    def check_item_name(self, attempted_item):
+        """Checks if the given item name matches the item in the room, without removing it."""
+        return self.has_item and self.item_name == attempted_item
@@ -0,0 +1,180 @@
+"""
+A read-through cache in front of the 'rooms' collection.
+Room content is static, so it is fetched from MongoDB once (in bulk) and then
+served from memory to every GameMap in the process until build_database.py
+publishes a new catalog version.
+
+If build_database.py wrote a catalog snapshot (see catalog_snapshot.py), the
+cache is filled from that file instead, without any database reads; the
+database is only used when the snapshot is missing or stale.
+"""
+
+import threading
+import time
+import config
+from catalog_snapshot import open_snapshot
+from storage import StorageError
+
+
+class RoomCatalog:
+    """
+    Serves room documents from an in-process cache, loading any missing
+    rooms from the database with a single bulk query.
+
+    The cache is shared by every RoomCatalog in the process (it lives on the
+    class), so regenerating a map or starting a new game never re-queries rooms.
+    """
+
+    # --- Process-wide cache shared by all instances ---
+    _rooms = {}  # room name -> room document
+    _version = None  # catalog version stamp the cached rooms belong to
+    _complete = False  # True once every room in the catalog has been loaded
+    _index = None  # (rooms dict, names, docs, ids) for the full catalog, shared by compact maps
+    _checked_at = 0.0  # time.monotonic() of the last version check
+    _snapshot = None  # The mapped CatalogSnapshot the cached rooms come from, if any
+    _lock = threading.Lock()
+
+    def __init__(self, db_manager):
+        """
+        Args:
+            db_manager (StorageBackend): Used to read rooms and the catalog version.
+        """
+        self.db = db_manager
+
+    def get_rooms(self, room_names):
+        """
+        Returns the documents for the given rooms, keyed by room name.
+        Rooms not yet cached are fetched together in one round trip.
+
+        Args:
+            room_names (list): The names of the rooms needed.
+
+        Returns:
+            dict: room name -> room document. Rooms that don't exist are left out.
+
+        Raises:
+            StorageError: If the missing rooms could not be read.
+        """
+        with RoomCatalog._lock:
+            self._check_version()
+
+            missing = [name for name in room_names if name not in RoomCatalog._rooms]
+            # Once the whole catalog is cached, a missing room does not exist
+            if missing and not RoomCatalog._complete:
+                for room_data in self.db.get_rooms_data(missing):
+                    RoomCatalog._rooms[room_data['name']] = room_data
+
+            return {name: RoomCatalog._rooms[name] for name in room_names if name in RoomCatalog._rooms}
+
+    def get_all_rooms(self):
+        """
+        Returns every room in the catalog, keyed by room name, in catalog order.
+        The full catalog is fetched once and then served from memory.
+
+        Returns:
+            dict: room name -> room document.
+
+        Raises:
+            StorageError: If the rooms could not be read (nothing is cached then).
+        """
+        with RoomCatalog._lock:
+            self._check_version()
+
+            if not RoomCatalog._complete:
+                rooms = {room_data['name']: room_data for room_data in self.db.get_all_rooms_data()}
+                if not rooms:
+                    return rooms  # An empty catalog is not cached: it is read again next time
+                RoomCatalog._rooms = rooms
+                RoomCatalog._complete = True
+
+            return RoomCatalog._rooms
+
+    def get_room_index(self):
+        """
+        Returns the full catalog interned to integer room IDs.
+        The lists are built once per catalog version and shared by every
+        compact map in the process (see compact_map.py), so they must not be modified.
+
+        Returns:
+            tuple: (names, docs, ids) where names[i] and docs[i] are the name and
+                   document of room i, and ids maps a room name back to i.
+        """
+        rooms = self.get_all_rooms()
+        with RoomCatalog._lock:
+            if RoomCatalog._index is None or RoomCatalog._index[0] is not rooms:
+                names = list(rooms)
+                docs = list(rooms.values())
+                ids = {name: room_id for room_id, name in enumerate(names)}
+                RoomCatalog._index = (rooms, names, docs, ids)
+            return RoomCatalog._index[1:]
+
+    def get_version(self):
+        """Returns the version stamp of the cached catalog (None if it hasn't been loaded yet)."""
+        return RoomCatalog._version
+
+    def get_room(self, room_name):
+        """Returns a single room document (or None), served from the cache when possible."""
+        return self.get_rooms([room_name]).get(room_name)
+
+    def _check_version(self):
+        """
+        Drops the cache if the catalog version in the database has changed.
+        The version is only re-read every CATALOG_VERSION_CHECK_SECONDS so
+        cache hits stay free of database traffic.
+        An empty cache is filled from the snapshot file first, if there is
+        one: it is trusted until the next version check.
+        """
+        now = time.monotonic()
+        if RoomCatalog._rooms and now - RoomCatalog._checked_at < config.CATALOG_VERSION_CHECK_SECONDS:
+            return
+
+        RoomCatalog._checked_at = now
+        if not RoomCatalog._rooms and self._load_snapshot():
+            return
+
+        try:
+            version = self.db.get_catalog_version()
+        except StorageError:
+            # The database is unreachable: keep serving the rooms we have
+            return
+        # No version stamp is not a new version: the cached rooms stay
+        if version is not None and version != RoomCatalog._version:
+            RoomCatalog._rooms = {}
+            RoomCatalog._complete = False
+            RoomCatalog._version = version
+            RoomCatalog._snapshot = None
+            # A snapshot written for the new version saves reloading from the database
+            self._load_snapshot(version)
+
+    def _load_snapshot(self, version=None):
+        """
+        Fills the cache from the catalog snapshot (config.CATALOG_SNAPSHOT_PATH).
+
+        Args:
+            version (optional): The catalog version the snapshot must have.
+                None accepts any version (checked against the database later).
+
+        Returns:
+            bool: True if the cache now holds the snapshot's rooms.
+        """
+        if not self.db.USES_CATALOG_SNAPSHOT:
+            return False
+        snapshot = open_snapshot(config.CATALOG_SNAPSHOT_PATH)
+        if snapshot is None or (version is not None and snapshot.version != version):
+            return False  # Missing or stale: the rooms come from the database
+
+        RoomCatalog._snapshot = snapshot
+        RoomCatalog._rooms = snapshot.get_all_rooms()
+        RoomCatalog._complete = True
+        RoomCatalog._version = snapshot.version
+        return True
+
+    @classmethod
+    def invalidate(cls):
+        """Clears the cache so the next request reloads from the database."""
+        with cls._lock:
+            cls._rooms = {}
+            cls._complete = False
+            cls._version = None
+            cls._checked_at = 0.0
+            cls._snapshot = None
@@ -0,0 +1,278 @@
+"""
+The shortest way to win a map: the fewest moves that collect every required
+item and then enter the Arcane Dungeon. This is the map's par, used to score
+a finished game and to turn down maps that are too easy (see map_pool.py).
+
+The solver:
+
+1. Runs one BFS from the start room and one from each room holding a required
+   item, never passing through the boss room (entering it ends the game).
+2. Runs Held-Karp dynamic programming over those rooms: the best number of
+   moves for every (set of items collected, room the player stands in). With
+   k items this is O(2^k * r^2) for r item rooms, which is instant for the
+   6 items of a normal game. If an item is in several rooms, only one of
+   them has to be visited.
+3. Adds the cheapest way into the boss room from the last item room, and
+   rebuilds the room-by-room route from the BFS distances.
+
+Picking an item up takes no moves, so par counts moves (GO) only.
+
+Solutions are cached by a fingerprint of everything they depend on (the
+doors, where the items are, the start and boss rooms, and the items needed),
+so a layout is only solved once per process, however many games use it.
+"""
+
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+
+import config
+from graph_analysis import MapGraph
+from map_generator import NUM_DIRECTIONS
+
+
+class RouteSolution:
+    """The optimal route for one layout. Treat as read-only: it is shared through the cache."""
+
+    def __init__(self, par, stops, path):
+        """
+        Args:
+            par (int): Moves on the optimal route.
+            stops (tuple): (room ID, item name) in the order the items are picked up.
+            path (tuple): Every room ID on the route, from the start room to the boss room.
+        """
+        self.par = par
+        self.stops = stops
+        self.path = path
+
+    def __repr__(self):
+        return f"RouteSolution(par={self.par}, stops={list(self.stops)})"
+
+
+def layout_fingerprint(exits, room_items, required_items, start, boss):
+    """
+    Identifies a solve: two layouts with the same fingerprint have the same solution.
+
+    Args:
+        exits (sequence): Flat exits list, 4 slots per room (see MapGenerator.generate()).
+        room_items (dict): room ID -> item name.
+        required_items (iterable): Items needed to win.
+        start (int): Start room ID.
+        boss (int): Boss room ID.
+
+    Returns:
+        str: A hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(array('i', exits).tobytes())
+    # Separators that cannot appear in an item name keep the fields apart
+    digest.update("\x00".join(f"{room_id}={item}" for room_id, item in sorted(room_items.items())).encode())
+    digest.update(f"\x01{start}\x01{boss}\x01".encode())
+    digest.update("\x00".join(sorted(required_items)).encode())
+    return digest.hexdigest()
+
+
+# --- Cache ---
+
+_cache = OrderedDict()  # fingerprint -> RouteSolution (or None: the map cannot be won), least recent first
+_cache_lock = threading.Lock()  # server.py solves from several threads
+
+
+def cache_size():
+    """Returns how many solutions are cached."""
+    return len(_cache)
+
+
+def clear_cache():
+    """Forgets every cached solution."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def solve_route(exits, room_items, required_items, start, boss, use_cache=True):
+    """
+    Finds the optimal route for a layout, from the cache if it was solved before.
+
+    Args:
+        exits (sequence): Flat exits list, 4 slots per room.
+        room_items (dict): room ID -> item name (rooms without an item can be left out).
+        required_items (iterable): Items needed to win.
+        start (int): Start room ID.
+        boss (int): Boss room ID (only entered at the end).
+        use_cache (bool): Look up and store the solution in the cache
+            (config.ROUTE_CACHE_SIZE entries, least recently used dropped first).
+
+    Returns:
+        RouteSolution: The optimal route, or None if the map cannot be won
+            (an item is missing or cannot be reached without the boss room).
+
+    Raises:
+        ValueError: If more than config.ROUTE_SOLVER_MAX_ITEMS items are required.
+    """
+    required_items = frozenset(required_items)
+    if not use_cache or config.ROUTE_CACHE_SIZE <= 0:
+        return _solve(exits, room_items, required_items, start, boss)
+
+    fingerprint = layout_fingerprint(exits, room_items, required_items, start, boss)
+    with _cache_lock:
+        if fingerprint in _cache:
+            _cache.move_to_end(fingerprint)
+            return _cache[fingerprint]
+
+    # Solved outside the lock; two threads may solve the same layout once each
+    solution = _solve(exits, room_items, required_items, start, boss)
+    with _cache_lock:
+        _cache[fingerprint] = solution
+        _cache.move_to_end(fingerprint)
+        while len(_cache) > config.ROUTE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return solution
+
+
+# --- Solver ---
+
+def _solve(exits, room_items, required_items, start, boss):
+    """Held-Karp over the item rooms (see the module docstring); no caching."""
+    items = sorted(required_items)
+    if len(items) > config.ROUTE_SOLVER_MAX_ITEMS:
+        raise ValueError(f"Cannot solve routes for {len(items)} items "
+                         f"(the limit is ROUTE_SOLVER_MAX_ITEMS={config.ROUTE_SOLVER_MAX_ITEMS}).")
+    item_bits = {item: 1 << position for position, item in enumerate(items)}
+
+    graph = MapGraph(len(exits) // NUM_DIRECTIONS, exits)
+    avoid = (boss,)
+
+    # Rooms worth visiting: the ones holding a required item (never the boss room)
+    targets = sorted(room_id for room_id, item in room_items.items()
+                     if item in item_bits and room_id != boss)
+    if {room_items[room_id] for room_id in targets} != required_items:
+        return None  # Some item is not on the map (or only in the boss room)
+
+    start_dist = graph.bfs(start, avoid)
+    target_dists = [graph.bfs(target, avoid) for target in targets]
+    boss_neighbors = [room_id for room_id in graph.neighbors(boss) if room_id != boss]
+
+    if not targets:
+        # Nothing to collect: straight to the boss room
+        return _finish(graph, start_dist, start, boss, boss_neighbors, 0, [], [start])
+
+    target_bits = [item_bits[room_items[target]] for target in targets]
+    boss_legs = [_boss_distance(dist, boss_neighbors) for dist in target_dists]
+    found = par_from_distances(start_dist, target_dists, targets, target_bits, boss_legs)
+    if found is None:
+        return None
+    moves, order = found
+    last = order[-1]
+
+    # Rebuild the route leg by leg from the BFS distances
+    path = [start]
+    leg_dists = [start_dist] + [target_dists[t] for t in order[:-1]]
+    for dist, t in zip(leg_dists, order):
+        path.extend(_walk_back(graph, dist, targets[t], boss)[1:])
+    stops = [(targets[t], room_items[targets[t]]) for t in order]
+    return _finish(graph, target_dists[last], targets[last], boss, boss_neighbors,
+                   moves - boss_legs[last], stops, path)
+
+
+def par_from_distances(start_dist, target_dists, targets, target_bits, boss_legs):
+    """
+    The Held-Karp step on its own, for callers that already have the BFS
+    distances (generator_analytics.py measures millions of layouts this way).
+
+    Args:
+        start_dist (sequence): Moves from the start room to every room (-1 if unreachable).
+        target_dists (list): The same, from each target room.
+        targets (list): Room IDs holding a required item (at least one).
+        target_bits (list): The item each target holds, as a bit (1 << item index).
+            Together they must cover every required item.
+        boss_legs (list): Moves from each target into the boss room (-1 if it cannot be reached).
+
+    Returns:
+        tuple: (par, pick-up order as indexes into targets), or None if the map cannot be won.
+    """
+    count = len(targets)
+    full = 0
+    for bit in target_bits:
+        full |= bit
+    unreachable = len(start_dist) * (count + 1)  # Longer than any real route
+
+    # best[mask * count + t]: fewest moves to collect the items in mask, ending in target t
+    best = [unreachable] * ((full + 1) * count)
+    previous = [-1] * ((full + 1) * count)  # Target visited before t on that best route
+
+    # The moves from each target to every other reachable one, looked up once
+    steps = []
+    for t in range(count):
+        dist = target_dists[t]
+        steps.append([(u, target_bits[u], dist[targets[u]]) for u in range(count)
+                      if u != t and dist[targets[u]] >= 0])
+        moves = start_dist[targets[t]]
+        if moves >= 0:
+            best[target_bits[t] * count + t] = moves
+
+    # Every transition adds an item, so masks only grow: increasing order is a valid order
+    for mask in range(1, full + 1):
+        row = mask * count
+        for t in range(count):
+            moves = best[row + t]
+            if moves == unreachable:
+                continue
+            for u, bit, step in steps[t]:
+                if mask & bit:
+                    continue
+                slot = (mask | bit) * count + u
+                if moves + step < best[slot]:
+                    best[slot] = moves + step
+                    previous[slot] = t
+
+    # Add the last leg into the boss room
+    row = full * count
+    par, last = unreachable, -1
+    for t in range(count):
+        leg = boss_legs[t]
+        if leg >= 0 and best[row + t] + leg < par:
+            par, last = best[row + t] + leg, t
+    if last == -1:
+        return None
+
+    # Walk the previous pointers back to get the pick-up order
+    order = []
+    mask, t = full, last
+    while t != -1:
+        order.append(t)
+        t, mask = previous[mask * count + t], mask & ~target_bits[t]
+    order.reverse()
+    return par, order
+
+
+def _boss_distance(dist, boss_neighbors):
+    """Moves into the boss room, given BFS distances that avoid it; -1 if it cannot be reached."""
+    legs = [dist[room_id] for room_id in boss_neighbors if dist[room_id] >= 0]
+    return min(legs) + 1 if legs else -1
+
+
+def _finish(graph, dist, source, boss, boss_neighbors, moves, stops, path):
+    """Adds the last leg (source -> boss room) to a route and wraps it up."""
+    reachable = [room_id for room_id in boss_neighbors if dist[room_id] >= 0]
+    if not reachable:
+        return None
+    entry = min(reachable, key=lambda room_id: (dist[room_id], room_id))
+    path.extend(_walk_back(graph, dist, entry, boss)[1:])
+    path.append(boss)
+    return RouteSolution(moves + dist[entry] + 1, tuple(stops), tuple(path))
+
+
+def _walk_back(graph, dist, target, boss):
+    """
+    One shortest route to target from the BFS source of dist (both included),
+    found by stepping to any neighbour one move closer (lowest ID first).
+    """
+    route = [target]
+    room_id = target
+    while dist[room_id] > 0:
+        room_id = min(neighbor_id for neighbor_id in graph.neighbors(room_id)
+                      if neighbor_id != boss and dist[neighbor_id] == dist[room_id] - 1)
+        route.append(room_id)
+    route.reverse()
+    return route
@@ -0,0 +1,129 @@
+"""
+Defines the layout of save documents and migrates older saves.
+
+Schema version 2 (current) stores only the map's *layout*, not its content:
+
+    {
+      "player_id": "player_1",
+      "slot": 1,
+      "updated_at": <datetime>,
+      "schema_version": 2,
+      "player": {"current_room": 3, "inventory": ["Stew"]},   // room index into layout.rooms
+      "layout": {
+        "rooms": ["Bedroom", "Great Hall", ...],   // room IDs (catalog names), in map order
+        "exits": <binary>,                         // packed int32, 4 slots per room, -1 = no door
+        "items": [181]                             // item flags, 32 rooms per integer
+      }
+    }
+
+Descriptions and item names are re-read from the room catalog on load, so
+content fixes also reach old saves.
+
+Version 1 (saves without "schema_version") stored every room's exits and
+both descriptions in a "map_data" list; migrate() converts those on load.
+"""
+
+import sys
+from array import array
+from map_generator import ALL_DIRECTIONS, NUM_DIRECTIONS, NO_EXIT
+
+SAVE_SCHEMA_VERSION = 2
+ITEM_WORD_BITS = 32  # Rooms per entry of layout.items
+
+
+# --- Packing helpers ---
+
+def pack_exits(exits):
+    """Packs a flat exits list into little-endian int32 bytes."""
+    packed = array('i', exits)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_exits(data):
+    """Unpacks the bytes written by pack_exits() back into an int32 array."""
+    exits = array('i')
+    exits.frombytes(bytes(data))
+    if sys.byteorder != 'little':
+        exits.byteswap()
+    return exits
+
+
+def pack_item_flags(flags):
+    """
+    Packs one boolean per room into integers of ITEM_WORD_BITS bits each
+    (room i is bit i % 32 of entry i // 32). Keeping the flags in small
+    integers lets a delta save rewrite a single entry.
+    """
+    words = [0] * ((len(flags) + ITEM_WORD_BITS - 1) // ITEM_WORD_BITS)
+    for position, present in enumerate(flags):
+        if present:
+            words[position // ITEM_WORD_BITS] |= 1 << (position % ITEM_WORD_BITS)
+    return words
+
+
+def unpack_item_flags(words, num_rooms):
+    """Unpacks the integers written by pack_item_flags() into one boolean per room."""
+    return [bool(words[position // ITEM_WORD_BITS] >> (position % ITEM_WORD_BITS) & 1)
+            for position in range(num_rooms)]
+
+
+# --- Migration ---
+
+def migrate(save_document):
+    """
+    Brings a save document up to SAVE_SCHEMA_VERSION.
+
+    Args:
+        save_document (dict): The document as stored in the 'saves' collection.
+
+    Returns:
+        dict: A current-version document. If it had to be converted, it also has
+              "migrated_from" (the old version) and "fallback_rooms" (the old
+              saved content, used only for rooms missing from the catalog).
+    """
+    version = save_document.get("schema_version", 1)
+    if version == SAVE_SCHEMA_VERSION:
+        return save_document
+    if version == 1:
+        return _migrate_v1(save_document)
+    raise ValueError(f"Unknown save schema version: {version}")
+
+
+def _migrate_v1(save_document):
+    """Converts a version 1 document (full 'map_data' list) to version 2."""
+    map_data = save_document["map_data"]
+    names = [room_dict["name"] for room_dict in map_data]
+    positions = {name: position for position, name in enumerate(names)}
+
+    exits = [NO_EXIT] * (len(names) * NUM_DIRECTIONS)
+    for position, room_dict in enumerate(map_data):
+        for direction, neighbor_name in room_dict["exits"].items():
+            exits[position * NUM_DIRECTIONS + ALL_DIRECTIONS.index(direction)] = positions[neighbor_name]
+
+    player_data = save_document["player"]
+    return {
+        "player_id": save_document.get("player_id"),
+        "slot": save_document.get("slot"),
+        "updated_at": save_document.get("updated_at"),
+        "schema_version": SAVE_SCHEMA_VERSION,
+        "player": {
+            "current_room": positions[player_data["current_room"]],
+            "inventory": list(player_data["inventory"])
+        },
+        "layout": {
+            "rooms": names,
+            "exits": pack_exits(exits),
+            "items": pack_item_flags([room_dict["has_item"] for room_dict in map_data])
+        },
+        "migrated_from": 1,
+        "fallback_rooms": {
+            room_dict["name"]: {
+                "desc_with_item": room_dict["desc_with_item"],
+                "desc_no_item": room_dict["desc_no_item"],
+                "item": room_dict["item_name"]
+            }
+            for room_dict in map_data
+        }
+    }
@@ -0,0 +1,232 @@
+"""
+Runs the game as a TCP server, so one process can host many players at once.
+Every connection gets its own MainGame session inside a single asyncio event
+loop. Anything that talks to MongoDB (creating a session, SAVE, LOAD, ...) or
+may take long for another reason (the first HINT on a huge map, solving the
+par after a win) is run on a small, bounded thread pool, so a slow database
+never stalls the other players.
+
+Start the server and connect with any telnet-style client:
+    python server.py --port 4000
+    telnet localhost 4000
+"""
+
+import argparse
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from main import MainGame
+from metrics import metrics
+from renderer import Renderer, SocketSink
+
+# Player names become save keys, so keep them short and simple
+PLAYER_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+
+class GameServer:
+    """
+    Accepts connections and runs one GameSession per connected player.
+    """
+
+    def __init__(self, host=None, port=None, max_sessions=None, db_workers=None):
+        """
+        Args:
+            host (str, optional): Address to listen on. Defaults to config.SERVER_HOST.
+            port (int, optional): Port to listen on. Defaults to config.SERVER_PORT.
+            max_sessions (int, optional): Most players connected at once. Defaults to config.SERVER_MAX_SESSIONS.
+            db_workers (int, optional): Threads for database calls. Defaults to config.SERVER_DB_WORKERS.
+        """
+        self.host = host or config.SERVER_HOST
+        self.port = config.SERVER_PORT if port is None else port
+        self.max_sessions = max_sessions or config.SERVER_MAX_SESSIONS
+
+        # Bounded: at most db_workers database calls run at the same time,
+        # the rest wait in the executor's queue
+        self.executor = ThreadPoolExecutor(
+            max_workers=db_workers or config.SERVER_DB_WORKERS,
+            thread_name_prefix="game-db"
+        )
+
+        self.sessions = set()
+        self.active_saves = set()  # (player_id, slot) pairs currently being played
+        self._server = None
+
+    async def start(self):
+        """Starts listening for connections."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # The real port if 0 was given
+        print(f"Game server listening on {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        """Starts the server (if needed) and runs until cancelled."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stops accepting players, ends every session, and shuts down the database threads."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for session in list(self.sessions):
+            session.writer.close()
+        self.executor.shutdown(wait=True)
+
+    async def run_blocking(self, func, *args):
+        """Runs a blocking call (database, or building a map's hint index or par) on the executor without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _handle_connection(self, reader, writer):
+        """Called by asyncio for every new connection."""
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b"The server is full, please try again later.\r\n")
+            await writer.drain()
+            writer.close()
+            return
+
+        session = GameSession(self, reader, writer)
+        self.sessions.add(session)
+        try:
+            await session.run()
+        finally:
+            self.sessions.discard(session)
+
+
+class GameSession:
+    """
+    One connected player. Reads lines from the socket, feeds them to a
+    MainGame, and sends the game's output back.
+    """
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.game = None
+        self.save_key = None
+
+        # Game text is written through this sink, even from executor threads (see renderer.py).
+        # The session's own messages (login) use a renderer of their own.
+        self.sink = SocketSink(writer)
+        self.renderer = Renderer(self.sink)
+
+    def write(self, text):
+        """Adds a session message (not game text) to the output."""
+        self.renderer.write(text)
+
+    async def flush(self, prompt=""):
+        """Sends the pending session messages and the prompt, then waits for the socket to drain."""
+        self.renderer.write_prompt(prompt)
+        await self.writer.drain()
+
+    async def read_line(self):
+        """
+        Waits for the player's next line.
+
+        Returns:
+            str: The line without its line ending, or None if the player
+                 disconnected, went idle, or sent an over-long line.
+        """
+        try:
+            data = await asyncio.wait_for(self.reader.readline(), config.SERVER_IDLE_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, ValueError, ConnectionError):
+            return None
+        if not data:
+            return None
+        return data.decode(errors="replace").strip()
+
+    async def run(self):
+        """Runs the session from login to disconnect."""
+        try:
+            if await self._login():
+                await self._play()
+        except ConnectionError:
+            pass  # The player dropped the connection
+        finally:
+            await self._close()
+
+    async def _login(self):
+        """
+        Asks for a player name and creates the MainGame for it.
+
+        Returns:
+            bool: True if a game was created.
+        """
+        while True:
+            await self.flush("Enter your player name > ")
+            name = await self.read_line()
+            if name is None:
+                return False
+            if not PLAYER_NAME_PATTERN.match(name):
+                self.write("Names are 1-32 letters, digits, '_' or '-'.")
+                continue
+
+            save_key = (name, config.DEFAULT_SAVE_SLOT)
+            if save_key in self.server.active_saves:
+                self.write("That player is already connected.")
+                continue
+            self.server.active_saves.add(save_key)
+            self.save_key = save_key
+            break
+
+        try:
+            # Creating a game connects to the database and loads the room catalog
+            self.game = await self.server.run_blocking(self._create_game, name)
+            await self.server.run_blocking(self.game.start_game)
+        except Exception as e:
+            # e.g. StorageError if the database is unreachable: only this player is dropped
+            self.write(f"Sorry, the game could not be started: {e}")
+            await self.flush()
+            return False
+        return True
+
+    def _create_game(self, name):
+        return MainGame(player_id=name, sink=self.sink)
+
+    async def _play(self):
+        """The per-player game loop: the asyncio version of MainGame.run_game()."""
+        game = self.game
+        while game.is_running:
+            await self.flush(game.current_prompt())
+            line = await self.read_line()
+            if line is None:
+                return
+
+            if game.line_may_block(line):
+                await self.server.run_blocking(game.handle_line, line)
+            else:
+                game.handle_line(line)
+
+        self.write("\nThanks for playing, goodbye.")
+        await self.flush()
+
+    async def _close(self):
+        """Releases the player's game and closes the connection."""
+        if self.game is not None:
+            await self.server.run_blocking(self.game.close)
+            self.game = None
+        if self.save_key is not None:
+            self.server.active_saves.discard(self.save_key)
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass  # The player already dropped the connection
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Text adventure game server")
+    parser.add_argument("--host", default=None, help="Address to listen on (default from config.py)")
+    parser.add_argument("--port", type=int, default=None, help="Port to listen on (default from config.py)")
+    args = parser.parse_args()
+
+    server = GameServer(host=args.host, port=args.port)
+    metrics.start_exporter()  # Writes config.METRICS_FILE, if one is set
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("Server stopped.")
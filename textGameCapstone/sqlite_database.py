@@ -0,0 +1,393 @@
+"""
+The 'sqlite' storage backend (see storage.py).
+Keeps the rooms and saves in a single local SQLite file (config.SQLITE_PATH),
+so a single-host deployment needs no database server at all.
+
+The database runs in WAL mode (readers never wait for a writer) with
+synchronous=NORMAL, and every query is a fixed SQL string with parameters, so
+sqlite3 compiles each statement once and reuses it from its statement cache.
+"""
+
+import datetime
+import json
+import sqlite3
+import threading
+import time
+
+import config
+import save_schema
+from metrics import timed_operation
+from storage import StorageBackend, StorageError, SAVE_METADATA_FIELDS, DURABLE, save_key as _save_key, now as _now
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    position INTEGER PRIMARY KEY,          -- catalog order
+    name TEXT NOT NULL UNIQUE,
+    desc_with_item TEXT NOT NULL,
+    desc_no_item TEXT NOT NULL,
+    item TEXT
+);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS saves (
+    player_id TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    schema_version INTEGER NOT NULL,
+    current_room INTEGER NOT NULL,        -- index into layout_rooms
+    inventory TEXT NOT NULL,              -- JSON list
+    layout_rooms TEXT NOT NULL,           -- JSON list of room names
+    layout_exits BLOB NOT NULL,           -- packed int32 (see save_schema.py)
+    layout_items TEXT NOT NULL,           -- JSON list of item flag words
+    PRIMARY KEY (player_id, slot)
+);
+CREATE TABLE IF NOT EXISTS map_pool (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    catalog_version INTEGER NOT NULL,
+    seed INTEGER NOT NULL,
+    exits BLOB NOT NULL,
+    stats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS map_pool_version ON map_pool (catalog_version);
+"""
+
+# --- Statements (compiled once per connection by sqlite3's statement cache) ---
+
+SELECT_ROOMS = "SELECT name, desc_with_item, desc_no_item, item FROM rooms ORDER BY position"
+SELECT_ROOM = "SELECT name, desc_with_item, desc_no_item, item FROM rooms WHERE name = ?"
+SELECT_VERSION = "SELECT version FROM catalog_meta WHERE id = 'rooms'"
+UPSERT_VERSION = "INSERT OR REPLACE INTO catalog_meta (id, version) VALUES ('rooms', ?)"
+INSERT_ROOM = ("INSERT INTO rooms (position, name, desc_with_item, desc_no_item, item) "
+               "VALUES (?, ?, ?, ?, ?)")
+# New rooms go to the end of the catalog (position is assigned); existing ones keep their place
+UPSERT_ROOM = ("INSERT INTO rooms (name, desc_with_item, desc_no_item, item) VALUES (?, ?, ?, ?) "
+               "ON CONFLICT(name) DO UPDATE SET desc_with_item = excluded.desc_with_item, "
+               "desc_no_item = excluded.desc_no_item, item = excluded.item")
+
+UPSERT_SAVE = ("INSERT OR REPLACE INTO saves (player_id, slot, updated_at, schema_version, current_room, "
+               "inventory, layout_rooms, layout_exits, layout_items) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+SELECT_SAVE = ("SELECT player_id, slot, updated_at, schema_version, current_room, inventory, "
+               "layout_rooms, layout_exits, layout_items FROM saves WHERE player_id = ? AND slot = ?")
+SELECT_SAVE_PLAYER = "SELECT current_room, inventory, layout_items FROM saves WHERE player_id = ? AND slot = ?"
+UPDATE_SAVE_PLAYER = ("UPDATE saves SET updated_at = ?, current_room = ?, inventory = ?, layout_items = ? "
+                      "WHERE player_id = ? AND slot = ?")
+SYNC_FULL = "PRAGMA synchronous=FULL"
+SYNC_NORMAL = "PRAGMA synchronous=NORMAL"
+SAVE_EXISTS = "SELECT 1 FROM saves WHERE player_id = ? AND slot = ? LIMIT 1"
+LIST_SAVES = ("SELECT slot, updated_at, schema_version FROM saves WHERE player_id = ? "
+              "ORDER BY slot LIMIT ? OFFSET ?")
+DELETE_SAVE = "DELETE FROM saves WHERE player_id = ? AND slot = ?"
+
+INSERT_POOL = "INSERT INTO map_pool (catalog_version, seed, exits, stats) VALUES (?, ?, ?, ?)"
+SELECT_POOL = "SELECT id, catalog_version, seed, exits, stats FROM map_pool WHERE catalog_version = ? LIMIT 1"
+DELETE_POOL = "DELETE FROM map_pool WHERE id = ?"
+COUNT_POOL = "SELECT COUNT(*) FROM map_pool WHERE catalog_version = ?"
+PRUNE_POOL = "DELETE FROM map_pool WHERE catalog_version != ?"
+
+
+class SQLiteDatabaseManager(StorageBackend):
+    """
+    Same methods as DatabaseManager, backed by a SQLite file.
+    One connection is shared by all threads (server.py runs saves on a thread
+    pool), with a lock around every use.
+    """
+
+    def __init__(self, path=None):
+        """
+        Opens (and if needed creates) the database. A new database is seeded
+        with build_database.ROOMS_DATA so it is playable straight away.
+
+        Args:
+            path (str, optional): Database file. Defaults to config.SQLITE_PATH (':memory:' also works).
+
+        Raises:
+            StorageError: If the file cannot be opened.
+        """
+        self.path = path or config.SQLITE_PATH
+        self._lock = threading.Lock()
+        try:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(SYNC_NORMAL)
+            self.connection.executescript(SCHEMA)
+
+            if self.connection.execute("SELECT COUNT(*) FROM rooms").fetchone()[0] == 0:
+                from build_database import ROOMS_DATA
+                self.seed_rooms(ROOMS_DATA)
+        except sqlite3.Error as e:
+            raise StorageError(f"Could not open SQLite database '{self.path}': {e}") from e
+
+    def is_healthy(self):
+        try:
+            with self._lock:
+                self.connection.execute("SELECT 1")
+            return True
+        except (sqlite3.Error, AttributeError):
+            return False
+
+    def reopen(self):
+        return SQLiteDatabaseManager(self.path)
+
+    def close_connection(self):
+        if self.connection is not None:
+            with self._lock:
+                self.connection.close()
+                self.connection = None
+
+    # --- Rooms ---
+
+    def seed_rooms(self, rooms_data):
+        """
+        Replaces every room with rooms_data and publishes a new catalog version.
+
+        Returns:
+            int: The new catalog version.
+        """
+        version = time.time_ns()
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM rooms")
+            self.connection.executemany(INSERT_ROOM, [
+                (position, room["name"], room["desc_with_item"], room["desc_no_item"], room["item"])
+                for position, room in enumerate(rooms_data)
+            ])
+            self.connection.execute(UPSERT_VERSION, (version,))
+        return version
+
+    @timed_operation("get_room_data")
+    def get_room_data(self, room_name):
+        try:
+            with self._lock:
+                row = self.connection.execute(SELECT_ROOM, (room_name,)).fetchone()
+            return _room_document(row) if row else None
+        except sqlite3.Error as e:
+            print(f"Error retrieving room data: {e}")
+        return None
+
+    @timed_operation("get_rooms_data")
+    def get_rooms_data(self, room_names):
+        wanted = set(room_names)
+        return [room for room in self._select_all_rooms() if room["name"] in wanted]
+
+    @timed_operation("get_all_rooms_data")
+    def get_all_rooms_data(self):
+        return self._select_all_rooms()
+
+    def _select_all_rooms(self):
+        try:
+            with self._lock:
+                return [_room_document(row) for row in self.connection.execute(SELECT_ROOMS)]
+        except sqlite3.Error as e:
+            raise StorageError(f"Error retrieving room data: {e}") from e
+
+    def iter_rooms_data(self):
+        """Streams the rooms in chunks, so a very large catalog is never all in memory."""
+        with self._lock:
+            cursor = self.connection.execute(SELECT_ROOMS)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            for row in rows:
+                yield _room_document(row)
+
+    @timed_operation("get_catalog_version")
+    def get_catalog_version(self):
+        try:
+            with self._lock:
+                row = self.connection.execute(SELECT_VERSION).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            raise StorageError(f"Error retrieving catalog version: {e}") from e
+
+    # --- Content Import (see content_import.py) ---
+
+    def upsert_rooms(self, rooms):
+        """Writes one batch in a single transaction; the UNIQUE name column makes it an upsert."""
+        try:
+            with self._lock, self.connection:
+                self.connection.executemany(UPSERT_ROOM, [
+                    (room["name"], room["desc_with_item"], room["desc_no_item"], room.get("item"))
+                    for room in rooms
+                ])
+        except sqlite3.Error as e:
+            raise StorageError(f"Error importing rooms: {e}") from e
+
+    def finish_room_import(self):
+        """Publishes a new catalog version (the name index is part of the table)."""
+        version = time.time_ns()
+        try:
+            with self._lock, self.connection:
+                self.connection.execute(UPSERT_VERSION, (version,))
+        except sqlite3.Error as e:
+            raise StorageError(f"Error publishing the room catalog: {e}") from e
+        return version
+
+    # --- Saves ---
+
+    @timed_operation("save_game_state")
+    def write_save_snapshot(self, snapshot, durability=DURABLE):
+        """
+        Writes a save snapshot. A full snapshot writes the whole row; a delta
+        only rewrites the player columns and the item flags (the layout's rooms
+        and exits never change).
+        DURABLE saves are synced to disk before returning (synchronous=FULL);
+        FAST saves keep synchronous=NORMAL, which survives a crash of the game
+        but not of the machine.
+        """
+        try:
+            with self._lock, self.connection:
+                self.connection.execute(SYNC_FULL if durability == DURABLE else SYNC_NORMAL)
+                if snapshot.is_delta:
+                    return self._save_changes(snapshot.save_key, snapshot.changes)
+
+                document = snapshot.document
+                layout = document["layout"]
+                self.connection.execute(UPSERT_SAVE, (
+                    document["player_id"], document["slot"], document["updated_at"].isoformat(),
+                    document["schema_version"], document["player"]["current_room"],
+                    json.dumps(document["player"]["inventory"]), json.dumps(layout["rooms"]),
+                    layout["exits"], json.dumps(layout["items"])
+                ))
+            return True
+
+        except sqlite3.Error as e:
+            print(f"Error saving game: {e}")
+        return False
+
+    def _save_changes(self, save_key, changes):
+        """
+        Applies the changes from _build_save_changes() to the stored row.
+        Called with the lock held, inside a transaction.
+
+        Returns:
+            bool: False if the row is gone (the caller then writes a full save).
+        """
+        if not changes:
+            return True
+
+        key = (save_key["player_id"], save_key["slot"])
+        row = self.connection.execute(SELECT_SAVE_PLAYER, key).fetchone()
+        if row is None:
+            return False
+
+        current_room = changes.get("player.current_room", row[0])
+        inventory = changes.get("player.inventory")
+        items = json.loads(row[2])
+        for path, value in changes.items():
+            if path.startswith("layout.items."):
+                items[int(path.rsplit(".", 1)[1])] = value
+
+        self.connection.execute(UPDATE_SAVE_PLAYER, (
+            changes.get("updated_at", _now()).isoformat(), current_room,
+            row[1] if inventory is None else json.dumps(inventory),
+            json.dumps(items), *key
+        ))
+        return True
+
+    @timed_operation("load_game_state")
+    def load_game_state(self, player_id=None, slot=None):
+        save_key = _save_key(player_id, slot)
+        try:
+            with self._lock:
+                row = self.connection.execute(SELECT_SAVE, (save_key["player_id"], save_key["slot"])).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error loading game: {e}")
+            return None
+
+        if row is None:
+            return None
+        self.last_save_key = save_key
+        return save_schema.migrate({
+            "player_id": row[0],
+            "slot": row[1],
+            "updated_at": datetime.datetime.fromisoformat(row[2]),
+            "schema_version": row[3],
+            "player": {"current_room": row[4], "inventory": json.loads(row[5])},
+            "layout": {"rooms": json.loads(row[6]), "exits": bytes(row[7]), "items": json.loads(row[8])},
+        })
+
+    def save_exists(self, player_id=None, slot=None):
+        save_key = _save_key(player_id, slot)
+        try:
+            with self._lock:
+                return self.connection.execute(SAVE_EXISTS, (save_key["player_id"], save_key["slot"])).fetchone() is not None
+        except sqlite3.Error as e:
+            print(f"Error checking for a save: {e}")
+        return False
+
+    def list_saves(self, player_id=None, page=0, page_size=10):
+        player_id = _save_key(player_id)["player_id"]
+        try:
+            with self._lock:
+                rows = self.connection.execute(LIST_SAVES, (player_id, page_size, page * page_size)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error listing saves: {e}")
+            return []
+
+        saves = []
+        for slot, updated_at, schema_version in rows:
+            values = {"slot": slot, "updated_at": datetime.datetime.fromisoformat(updated_at),
+                      "schema_version": schema_version}
+            saves.append({field: values[field] for field in SAVE_METADATA_FIELDS})
+        return saves
+
+    @timed_operation("delete_save")
+    def delete_save(self, player_id=None, slot=None):
+        save_key = _save_key(player_id, slot)
+        try:
+            with self._lock, self.connection:
+                deleted = self.connection.execute(DELETE_SAVE, (save_key["player_id"], save_key["slot"])).rowcount
+            return deleted > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting save: {e}")
+        return False
+
+    # --- Map Pool ---
+
+    def push_pool_layouts(self, layouts):
+        try:
+            with self._lock, self.connection:
+                self.connection.executemany(INSERT_POOL, [
+                    (layout["catalog_version"], layout["seed"], layout["exits"], json.dumps(layout["stats"]))
+                    for layout in layouts
+                ])
+            return True
+        except sqlite3.Error as e:
+            print(f"Error storing map layouts: {e}")
+        return False
+
+    def pop_pool_layout(self, catalog_version):
+        try:
+            # Select and delete in one transaction, so two games never get the same layout
+            with self._lock, self.connection:
+                row = self.connection.execute(SELECT_POOL, (catalog_version,)).fetchone()
+                if row is None:
+                    return None
+                self.connection.execute(DELETE_POOL, (row[0],))
+            return {"catalog_version": row[1], "seed": row[2], "exits": bytes(row[3]), "stats": json.loads(row[4])}
+        except sqlite3.Error as e:
+            print(f"Error taking a map layout: {e}")
+        return None
+
+    def count_pool_layouts(self, catalog_version):
+        try:
+            with self._lock:
+                return self.connection.execute(COUNT_POOL, (catalog_version,)).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error counting map layouts: {e}")
+        return 0
+
+    def prune_pool_layouts(self, catalog_version):
+        try:
+            with self._lock, self.connection:
+                self.connection.execute(PRUNE_POOL, (catalog_version,))
+        except sqlite3.Error as e:
+            print(f"Error pruning map layouts: {e}")
+
+
+def _room_document(row):
+    """Turns a rooms row into the same document shape MongoDB returns."""
+    return {"name": row[0], "desc_with_item": row[1], "desc_no_item": row[2], "item": row[3]}
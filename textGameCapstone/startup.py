@@ -0,0 +1,52 @@
+"""
+Startup timing, shown by `python main.py --startup-profile`.
+main.py imports this module first, so the clock starts before the rest of
+the game is imported. Each step of startup calls startup_timer.mark(), and
+the report lists how long each step took up to the first prompt.
+"""
+
+import sys
+import time
+
+
+class StartupTimer:
+    """Records named points in time since the clock started."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = {}  # phase -> seconds since start
+
+    def mark(self, phase):
+        """
+        Records that a startup phase has just finished. Only the first time
+        counts, so games started later (e.g. by server.py) add nothing.
+        Safe to call from background threads (e.g. the database warm-up).
+        """
+        if phase not in self.marks:
+            self.marks[phase] = time.perf_counter() - self.start
+
+    def elapsed(self):
+        """Seconds since the clock started."""
+        return time.perf_counter() - self.start
+
+    def report(self, stream=None):
+        """
+        Writes a table of the phases: when each one ended, and how long since
+        the phase before it (phases on background threads overlap the others).
+
+        Args:
+            stream (file, optional): Where to write. Defaults to stderr, so the
+                report never mixes with the game's own output.
+        """
+        stream = stream or sys.stderr
+        lines = [f"{'startup phase':<28}{'ends at':>12}{'took':>12}"]
+        previous = 0.0
+        for phase, seconds in sorted(self.marks.items(), key=lambda mark: mark[1]):
+            lines.append(f"{phase:<28}{seconds * 1000:>9.1f} ms{(seconds - previous) * 1000:>9.1f} ms")
+            previous = seconds
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+
+
+# The one clock for this process, started when main.py is imported
+startup_timer = StartupTimer()
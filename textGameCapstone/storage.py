@@ -0,0 +1,371 @@
+"""
+The storage interface shared by every database backend.
+The game only talks to storage through these methods, so the backend can be
+chosen in config.py (STORAGE_BACKEND):
+
+* 'mongo':  MongoDB (database_manager.py), the original backend.
+* 'sqlite': a local SQLite file (sqlite_database.py), for single-host deployments.
+* 'memory': plain Python objects (memory_database.py), for tests, scripts and benchmarks.
+"""
+
+import datetime
+import config
+from save_schema import SAVE_SCHEMA_VERSION
+
+# The save fields returned by list_saves() (no game state)
+SAVE_METADATA_FIELDS = ("slot", "updated_at", "schema_version")
+
+STORAGE_BACKENDS = ('mongo', 'sqlite', 'memory')
+
+# How sure a save must be before it counts as written (see write_save_snapshot):
+# 'durable' waits for the database to confirm (explicit SAVE), 'fast' does not (autosave)
+DURABLE = 'durable'
+FAST = 'fast'
+
+
+class StorageError(Exception):
+    """Raised when a storage backend cannot be opened (e.g. MongoDB is unreachable)."""
+
+
+def save_key(player_id=None, slot=None):
+    """Builds the key that identifies one save: (player_id, slot), with defaults from config.py."""
+    return {
+        "player_id": player_id or config.DEFAULT_PLAYER_ID,
+        "slot": config.DEFAULT_SAVE_SLOT if slot is None else slot
+    }
+
+
+def autosave_slot(slot=None):
+    """
+    The slot a save slot's autosaves are written to, so they never overwrite the
+    save the player made with SAVE: slot N autosaves to slot -N - 1 (negative
+    slots are reserved for autosaves).
+    """
+    slot = config.DEFAULT_SAVE_SLOT if slot is None else slot
+    return -slot - 1
+
+
+def now():
+    """Current time for the 'updated_at' field."""
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def apply_save_changes(document, changes):
+    """
+    Applies dotted-path changes (from StorageBackend._build_save_changes) to a
+    save document in place, the way MongoDB's "$set" would.
+    """
+    for path, value in changes.items():
+        *parents, field = path.split(".")
+        target = document
+        for part in parents:
+            target = target[part]
+        if isinstance(target, list):
+            target[int(field)] = value
+        else:
+            target[field] = value
+    return document
+
+
+class SaveSnapshot:
+    """
+    What one save has to write, captured from the game objects at the moment
+    of saving: either the whole save document, or only the changed fields.
+    A snapshot owns its data, so it can be written later on another thread
+    while the game carries on (see autosave.py).
+    """
+
+    def __init__(self, save_key, document=None, changes=None):
+        self.save_key = save_key
+        self.document = document  # Full save document, or None for a delta
+        self.changes = changes or {}  # Dotted path -> value (deltas only)
+
+    @property
+    def is_delta(self):
+        return self.document is None
+
+    @property
+    def is_empty(self):
+        """True for a delta with nothing to write."""
+        return self.document is None and not self.changes
+
+    def merge(self, newer):
+        """
+        Folds a newer snapshot of the same save into this one, so both are
+        written with a single database call.
+        """
+        if newer.document is not None:
+            # A full save replaces everything before it
+            self.document = newer.document
+            self.changes = {}
+        elif self.document is not None:
+            apply_save_changes(self.document, newer.changes)
+        else:
+            self.changes.update(newer.changes)
+
+
+def open_storage(backend=None):
+    """
+    Opens the configured storage backend.
+    Each backend module is only imported when it is used, so e.g. the SQLite
+    backend works without pymongo installed.
+
+    Args:
+        backend (str, optional): 'mongo', 'sqlite' or 'memory'. Defaults to config.STORAGE_BACKEND.
+
+    Returns:
+        StorageBackend: The opened backend.
+
+    Raises:
+        StorageError: If the backend is unknown or cannot be opened. (MongoDB
+            connects in the background, so an unreachable server is reported
+            on first use instead.)
+    """
+    backend = backend or config.STORAGE_BACKEND
+    if backend == 'mongo':
+        from database_manager import DatabaseManager
+        return DatabaseManager()
+    if backend == 'sqlite':
+        from sqlite_database import SQLiteDatabaseManager
+        return SQLiteDatabaseManager()
+    if backend == 'memory':
+        from memory_database import MemoryDatabaseManager
+        return MemoryDatabaseManager()
+    raise StorageError(f"Unknown storage backend '{backend}' (expected one of {', '.join(STORAGE_BACKENDS)}).")
+
+
+class StorageBackend:
+    """
+    Base class for storage backends: the methods every backend provides, plus
+    the save-document code they share (so a save has the same shape everywhere).
+    """
+
+    # The (player_id, slot) key of the save last written or loaded, so delta
+    # saves are never applied to a different slot
+    last_save_key = None
+
+    # True if the room catalog may be read from build_database.py's snapshot
+    # file instead of this backend (see catalog_snapshot.py)
+    USES_CATALOG_SNAPSHOT = True
+
+    # --- Connection ---
+
+    def is_healthy(self):
+        """Returns True if the storage can currently be reached."""
+        return True
+
+    def close_connection(self):
+        """Releases the connection (if any)."""
+
+    def reopen(self):
+        """
+        Opens another handle on the same storage, for work that may outlive
+        this one (see MapPool's refill). Backends without a connection to
+        close share themselves.
+        """
+        return self
+
+    # --- Room Catalog ---
+
+    def get_room_data(self, room_name):
+        """Returns the document for one room, or None."""
+        rooms = self.get_rooms_data([room_name])
+        return rooms[0] if rooms else None
+
+    def get_rooms_data(self, room_names):
+        """
+        Returns the documents (name, desc_with_item, desc_no_item, item) for the given rooms.
+        Raises StorageError if the rooms cannot be read (never an empty list instead).
+        """
+        raise NotImplementedError
+
+    def get_all_rooms_data(self):
+        """
+        Returns every room document, in catalog order.
+        Raises StorageError if the rooms cannot be read (never an empty list instead).
+        """
+        raise NotImplementedError
+
+    def iter_rooms_data(self):
+        """Yields every room document in catalog order, without loading them all at once."""
+        return iter(self.get_all_rooms_data())
+
+    def get_catalog_version(self):
+        """
+        Returns the room catalog's version stamp, or None if there is none.
+
+        Raises:
+            StorageError: If the version could not be read.
+        """
+        raise NotImplementedError
+
+    # --- Content Import (see content_import.py) ---
+
+    def begin_room_import(self):
+        """Prepares the room storage for a bulk import."""
+
+    def upsert_rooms(self, rooms):
+        """
+        Inserts or replaces a batch of validated room documents, matched by name.
+        Rooms that are not in the batch (and all saves) are left alone.
+
+        Raises:
+            StorageError: If the batch could not be written.
+        """
+        raise NotImplementedError
+
+    def finish_room_import(self):
+        """
+        Builds the room indexes and publishes a new catalog version, so
+        running games reload their cached rooms.
+
+        Returns:
+            The new catalog version.
+        """
+        raise NotImplementedError
+
+    # --- Saves ---
+
+    def save_game_state(self, player, game_map, player_id=None, slot=None):
+        """
+        Saves the player and map layout and waits for the database to confirm.
+        The first save of a map writes the ENTIRE state; after that only the
+        fields that changed since the last save are written.
+
+        Args:
+            player (Player): The player object containing inventory and location.
+            game_map (GameMap): The map object containing all rooms and their exits.
+            player_id (str, optional): Who the save belongs to. Defaults to config.DEFAULT_PLAYER_ID.
+            slot (int, optional): Which of the player's save slots to use. Defaults to config.DEFAULT_SAVE_SLOT.
+
+        Returns:
+            bool: True on success.
+        """
+        snapshot = self.take_save_snapshot(player, game_map, player_id, slot)
+        saved = self.write_save_snapshot(snapshot)
+        if not saved and snapshot.is_delta:
+            # The save document is gone (or the delta failed): write everything
+            saved = self.write_save_snapshot(self.take_save_snapshot(player, game_map, player_id, slot, full=True))
+
+        if not saved:
+            # The next save must not be a delta on top of a write that never happened
+            self.last_save_key = None
+        return saved
+
+    def take_save_snapshot(self, player, game_map, player_id=None, slot=None, full=False):
+        """
+        Captures what the next save has to write and marks the game objects as
+        saved, so the snapshot after this one only holds newer changes.
+
+        Args:
+            full (bool): Capture the whole document even if a delta would do.
+
+        Returns:
+            SaveSnapshot: A full document for the first save of a map, a delta after that.
+        """
+        key = save_key(player_id, slot)
+        if not full and self._can_save_delta(key, game_map):
+            changes = self._build_save_changes(player, game_map)
+            if changes:
+                changes["updated_at"] = now()
+            snapshot = SaveSnapshot(key, changes=changes)
+        else:
+            snapshot = SaveSnapshot(key, document=self._build_save_document(key, player, game_map))
+
+        # From here on the stored save is assumed to match the game objects
+        self._mark_saved(key, player, game_map)
+        return snapshot
+
+    def write_save_snapshot(self, snapshot, durability=DURABLE):
+        """
+        Writes a snapshot from take_save_snapshot(). Safe to call from another thread.
+
+        Args:
+            snapshot (SaveSnapshot): What to write.
+            durability (str): DURABLE to wait for the database to confirm the
+                write, FAST to send it without waiting (where the backend can).
+
+        Returns:
+            bool: False on error, or if a delta's save document no longer exists.
+        """
+        raise NotImplementedError
+
+    def load_game_state(self, player_id=None, slot=None):
+        """Returns the save document (current schema), or None."""
+        raise NotImplementedError
+
+    def save_exists(self, player_id=None, slot=None):
+        """Returns True if the save exists."""
+        raise NotImplementedError
+
+    def list_saves(self, player_id=None, page=0, page_size=10):
+        """Returns one page of the player's saves as SAVE_METADATA_FIELDS dictionaries, sorted by slot."""
+        raise NotImplementedError
+
+    def delete_save(self, player_id=None, slot=None):
+        """Deletes the save. Returns True if there was one."""
+        raise NotImplementedError
+
+    # --- Map Pool (pre-generated layouts, see map_pool.py) ---
+
+    def push_pool_layouts(self, layouts):
+        raise NotImplementedError
+
+    def pop_pool_layout(self, catalog_version):
+        raise NotImplementedError
+
+    def count_pool_layouts(self, catalog_version):
+        raise NotImplementedError
+
+    def prune_pool_layouts(self, catalog_version):
+        raise NotImplementedError
+
+    # --- Shared save-document code ---
+
+    def _build_save_document(self, save_key, player, game_map):
+        """
+        Serializes the complete game state into a save document.
+        Only the layout is stored (room IDs, packed exits, item flags), not the
+        room descriptions; see save_schema.py for the format.
+        """
+        return {
+            "player_id": save_key["player_id"],
+            "slot": save_key["slot"],
+            "updated_at": now(),
+            "schema_version": SAVE_SCHEMA_VERSION,
+            "player": {
+                "current_room": game_map.get_room_position(player.current_room.name),  # Index into layout.rooms
+                "inventory": list(player.inventory)  # Convert Set to List
+            },
+            "layout": game_map.to_layout(),
+        }
+
+    def _build_save_changes(self, player, game_map):
+        """
+        Builds the "$set" fields for everything that changed since the last save.
+
+        Returns:
+            dict: Dotted field path -> new value (empty if nothing changed).
+        """
+        changes = {}
+
+        if 'current_room' in player.dirty_fields:
+            changes["player.current_room"] = game_map.get_room_position(player.current_room.name)
+        if 'inventory' in player.dirty_fields:
+            changes["player.inventory"] = list(player.inventory)
+
+        # Rooms only change when an item is picked up
+        for word_index, value in game_map.get_changed_item_words().items():
+            changes[f"layout.items.{word_index}"] = value
+
+        return changes
+
+    def _can_save_delta(self, key, game_map):
+        """True if only the changes need writing: this map was last written to (or loaded from) this save."""
+        return game_map.persisted and key == self.last_save_key
+
+    def _mark_saved(self, key, player, game_map):
+        """Records that the stored save now matches the game objects."""
+        self.last_save_key = key
+        player.mark_clean()
+        game_map.mark_clean()
@@ -0,0 +1,154 @@
+"""
+Tests for the write-behind autosave (autosave.py) and the autosave slot.
+Run from this folder with: python -m unittest test_autosave
+"""
+
+import unittest
+
+from autosave import AutoSaver
+from game_map import GameMap
+from headless import run_script
+from memory_database import MemoryDatabaseManager
+from player import Player
+from storage import DURABLE, FAST, autosave_slot
+
+
+class RecordingDatabase(MemoryDatabaseManager):
+    """The memory backend, recording every write and failing them on request."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []  # (is_delta, durability) of every write, in order
+        self.fail = False
+
+    def write_save_snapshot(self, snapshot, durability=DURABLE):
+        self.writes.append((snapshot.is_delta, durability))
+        if self.fail:
+            return False
+        return super().write_save_snapshot(snapshot, durability)
+
+
+class AutoSaverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = RecordingDatabase()
+        self.game_map = GameMap(self.db, seed=3)
+        self.player = Player(self.game_map.get_room(self.game_map.start_room_name))
+        self.saver = None
+
+    def tearDown(self):
+        if self.saver is not None:
+            self.saver.close()
+
+    def _move(self):
+        """Moves the player through the first door that does not lead to the boss room."""
+        for direction, room_name in self.player.current_room.exits.items():
+            if room_name != GameMap.BOSS_ROOM:
+                self.assertTrue(self.player.move(direction, self.game_map))
+                return
+        self.fail("No safe door out of " + self.player.current_room.name)
+
+    def _autosave(self):
+        return self.saver.autosave(self.db, self.player, self.game_map, "tester", 1)
+
+    def _assert_save_matches_game(self):
+        document = self.db.load_game_state("tester", 1)
+        layout = document["layout"]
+        self.assertEqual(layout["rooms"][document["player"]["current_room"]], self.player.current_room.name)
+        self.assertEqual(set(document["player"]["inventory"]), self.player.inventory)
+        self.assertEqual(layout, self.game_map.to_layout())
+
+    def test_waiting_autosaves_are_coalesced(self):
+        # The writer holds autosaves for a minute, so all of them are still waiting
+        self.saver = AutoSaver(delay=60)
+        for _ in range(5):
+            self._move()
+            self._autosave()
+
+        self.assertTrue(self.saver.flush("tester", 1, timeout=10))
+        self.assertEqual(len(self.db.writes), 1)
+        self.assertEqual(self.saver.saves_coalesced, 4)
+        self._assert_save_matches_game()
+
+    def test_full_snapshot_is_durable(self):
+        self.saver = AutoSaver(delay=0)
+        self._autosave()
+        self.saver.flush("tester", 1, timeout=10)
+        self._move()
+        self._autosave()
+        self.saver.flush("tester", 1, timeout=10)
+
+        # The first autosave writes the whole save and waits for it; the next one does not
+        self.assertEqual(self.db.writes, [(False, DURABLE), (True, FAST)])
+
+    def test_failed_write_is_followed_by_full_snapshot(self):
+        self.saver = AutoSaver(delay=0)
+        self._autosave()
+        self.saver.flush("tester", 1, timeout=10)
+
+        self.db.fail = True
+        self._move()
+        self._autosave()
+        self.saver.flush("tester", 1, timeout=10)
+        self.assertEqual(self.saver.saves_failed, 1)
+
+        # The failed delta is not lost: the next autosave writes everything
+        self.db.fail = False
+        self._move()
+        self._autosave()
+        self.saver.flush("tester", 1, timeout=10)
+        self.assertEqual(self.db.writes[-1], (False, DURABLE))
+        self._assert_save_matches_game()
+
+    def test_close_writes_queued_autosaves(self):
+        self.saver = AutoSaver(delay=60)
+        self._move()
+        self._autosave()
+        self.assertEqual(self.db.writes, [])
+
+        self.saver.close(timeout=10)
+        self.assertIsNone(self.saver._thread)
+        self.assertEqual(len(self.db.writes), 1)
+        self._assert_save_matches_game()
+
+    def test_explicit_save_waits_for_the_write(self):
+        self.saver = AutoSaver(delay=60)
+        self._move()
+        self.assertTrue(self.saver.save(self.db, self.player, self.game_map, "tester", 1, timeout=10))
+        self.assertEqual(self.db.writes, [(False, DURABLE)])
+        self._assert_save_matches_game()
+
+
+class AutosaveSlotTest(unittest.TestCase):
+
+    def test_load_returns_to_the_last_save(self):
+        db = MemoryDatabaseManager()
+        run = run_script(["save", "north", "load", "Y"], player_id="slots", seed=3, db_manager=db)
+        self.assertEqual(run.game.player.current_room.name, run.game.game_map.start_room_name)
+
+    def test_load_asks_first(self):
+        db = MemoryDatabaseManager()
+        run = run_script(["save", "north", "l", "N"], player_id="slots", seed=3, db_manager=db)
+        self.assertIn("Load your last save?", run.transcript)
+        self.assertNotEqual(run.game.player.current_room.name, run.game.game_map.start_room_name)
+
+    def test_exit_without_saving_keeps_the_last_save(self):
+        db = MemoryDatabaseManager()
+        run_script(["save", "north", "exit", "N"], player_id="slots", seed=3, db_manager=db)
+        self.assertEqual(db.load_game_state("slots", 1)["player"]["current_room"], 0)
+        self.assertTrue(db.save_exists("slots", autosave_slot(1)))
+
+        # The next game offers the autosave, which has the move in it
+        run = run_script(["R"], player_id="slots", seed=3, db_manager=db)
+        self.assertIn("(R)esume", run.transcript)
+        self.assertNotEqual(run.game.player.current_room.name, run.game.game_map.start_room_name)
+
+    def test_saving_on_exit_deletes_the_autosave(self):
+        db = MemoryDatabaseManager()
+        run_script(["north", "exit", "Y"], player_id="slots", seed=3, db_manager=db)
+        self.assertTrue(db.save_exists("slots", 1))
+        self.assertFalse(db.save_exists("slots", autosave_slot(1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
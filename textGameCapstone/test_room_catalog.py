@@ -0,0 +1,84 @@
+"""
+Tests for the process-wide room cache (room_catalog.py).
+Run from this folder with: python -m unittest test_room_catalog
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+from memory_database import MemoryDatabaseManager
+from room_catalog import RoomCatalog
+from sqlite_database import SQLiteDatabaseManager
+from storage import StorageError
+
+
+class FlakyDatabase(MemoryDatabaseManager):
+    """The memory backend, with a catalog version that can change or fail to read."""
+
+    def __init__(self):
+        super().__init__()
+        self.version = "v1"
+        self.down = False
+
+    def get_catalog_version(self):
+        if self.down:
+            raise StorageError("Error retrieving catalog version: connection refused")
+        return self.version
+
+    def get_all_rooms_data(self):
+        if self.down:
+            raise StorageError("Error retrieving room data: connection refused")
+        return super().get_all_rooms_data()
+
+
+class RoomCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        RoomCatalog.invalidate()
+        # Check the version on every read, and never use a snapshot file lying around
+        for name, value in (("CATALOG_VERSION_CHECK_SECONDS", 0), ("CATALOG_SNAPSHOT_PATH", "")):
+            patcher = mock.patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(RoomCatalog.invalidate)
+        self.db = FlakyDatabase()
+        self.catalog = RoomCatalog(self.db)
+
+    def test_failed_version_read_keeps_the_cache(self):
+        rooms = self.catalog.get_all_rooms()
+        self.assertTrue(rooms)
+
+        self.db.down = True
+        self.assertIs(self.catalog.get_all_rooms(), rooms)
+        self.assertEqual(self.catalog.get_version(), "v1")
+
+    def test_missing_version_keeps_the_cache(self):
+        rooms = self.catalog.get_all_rooms()
+        self.db.version = None
+        self.assertIs(self.catalog.get_all_rooms(), rooms)
+
+    def test_new_version_reloads(self):
+        rooms = self.catalog.get_all_rooms()
+        self.db.version = "v2"
+        self.assertIsNot(self.catalog.get_all_rooms(), rooms)
+        self.assertEqual(self.catalog.get_version(), "v2")
+
+    def test_sqlite_version_read_fails_loudly(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db = SQLiteDatabaseManager(os.path.join(folder, "game.db"))
+            try:
+                rooms = RoomCatalog(db).get_all_rooms()
+                with db._lock, db.connection:
+                    db.connection.execute("DROP TABLE catalog_meta")
+                with self.assertRaises(StorageError):
+                    db.get_catalog_version()
+                self.assertIs(RoomCatalog(db).get_all_rooms(), rooms)
+            finally:
+                db.close_connection()
+
+
+if __name__ == '__main__':
+    unittest.main()